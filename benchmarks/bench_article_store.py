@@ -0,0 +1,110 @@
+"""Disk footprint and read throughput: one file per article in saved_pages vs the packed pages.store.
+
+Pages are the saved scrapper pages or a synthetic corpus (--docs). Random reads fetch --reads
+random articles by name, the scan reads every article once; "gzip bytes" is what the server sends
+for a packed article without decompressing it. With --cold, the page cache of every file is dropped
+(posix_fadvise) before each measurement. All articles read from the store are checked against the
+files. Run from the repository root:
+
+    python -m benchmarks.bench_article_store
+    python -m benchmarks.bench_article_store --docs 100000 --cold
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.synthetic_corpus import write_corpus
+from common.article_store import ArticleStore, pack_pages, store_path
+
+
+def allocated_bytes(directory: str) -> int:
+    return sum(os.stat(os.path.join(directory, name)).st_blocks * 512 for name in os.listdir(directory))
+
+
+def drop_cache(directory: str):
+    for name in os.listdir(directory):
+        fd = os.open(os.path.join(directory, name), os.O_RDONLY)
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+
+
+def read_files(pages_dir: str, names: list[str]) -> int:
+    total = 0
+    for name in names:
+        with open(os.path.join(pages_dir, name), "rb") as file:
+            total += len(file.read())
+    return total
+
+
+def timed(read, prepare) -> tuple[float, int]:
+    prepare()
+    start = time.perf_counter()
+    total = read()
+    return time.perf_counter() - start, total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Packed article store benchmark")
+    parser.add_argument("--pages", default="scrapper/saved_pages")
+    parser.add_argument("--docs", type=int, default=0, help="use a synthetic corpus of this size instead")
+    parser.add_argument("--reads", type=int, default=2000)
+    parser.add_argument("--cold", action="store_true", help="drop the page cache before every measurement")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        pages_dir = os.path.join(work_dir, "saved_pages")
+        if args.docs:
+            write_corpus(work_dir, args.docs)
+        else:
+            os.makedirs(pages_dir)
+            for name in os.listdir(args.pages):
+                with open(os.path.join(args.pages, name), "rb") as source, \
+                        open(os.path.join(pages_dir, name), "wb") as target:
+                    target.write(source.read())
+
+        names = sorted(os.listdir(pages_dir))
+        start = time.perf_counter()
+        pack_pages(pages_dir)
+        pack_s = time.perf_counter() - start
+
+        store = ArticleStore(store_path(pages_dir))
+        for name, data in store.items():
+            with open(os.path.join(pages_dir, name), "rb") as file:
+                if file.read() != data:
+                    raise AssertionError(f"{name}: packed article differs from the file")
+
+        stats = store.stats()
+        files_mb = allocated_bytes(pages_dir) / 2 ** 20
+        store_mb = stats["disk_bytes"] / 2 ** 20
+        print(f"{len(names)} articles, {stats['raw_bytes'] / 2 ** 20:.1f} MB of HTML, packed in {pack_s:.2f} s")
+        print(f"{'layout':>12} {'files':>8} {'disk MB':>8}")
+        print(f"{'saved_pages':>12} {len(names):>8} {files_mb:>8.1f}")
+        print(f"{'pages.store':>12} {len(os.listdir(store.path)):>8} {store_mb:>8.1f}")
+
+        rng = random.Random(0)
+        sample = [rng.choice(names) for _ in range(args.reads)]
+
+        def prepare():
+            if args.cold:
+                drop_cache(pages_dir)
+                drop_cache(store.path)
+
+        runs = [
+            ("random", "files", lambda: read_files(pages_dir, sample), len(sample)),
+            ("random", "store", lambda: sum(len(store.get(name)) for name in sample), len(sample)),
+            ("random", "gzip bytes", lambda: sum(len(store.get_compressed(name)) for name in sample), len(sample)),
+            ("scan", "files", lambda: read_files(pages_dir, names), len(names)),
+            ("scan", "store", lambda: sum(len(data) for _, data in store.items()), len(names)),
+        ]
+        print(f"{'reads':>8} {'source':>10} {'articles/s':>11} {'MB/s':>8}")
+        for kind, source, read, count in runs:
+            seconds, total = timed(read, prepare)
+            print(f"{kind:>8} {source:>10} {count / seconds:>11.0f} {total / 2 ** 20 / seconds:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Queries per second of MatrixSearchEngine.top_batch over several block sizes vs one query at a time.
+
+Both paths start from the query text (vectorize_query) and stop at the top-k ids and scores. Every
+batch result is checked against top(): the same counts, scores equal up to float rounding and the same
+articles, except where neighbouring scores tie within that rounding. Run from the repository root:
+
+    python -m benchmarks.bench_batch --docs 100000 --queries 5000 --blocks 1 32 256 1024
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.synthetic_vectors import synthetic_queries, synthetic_vectors
+from common.query_cache import normalize_query
+from common.tfidf_model import TfIdfModel, write_model_from_vectors
+from vector_search.matrix_search import MatrixSearchEngine
+from vector_search.vector_search import vectorize_query
+
+TOLERANCE = 1e-9
+
+
+def check_same(expected, actual):
+    for number, ((expected_count, expected_top), (count, top)) in enumerate(zip(expected, actual)):
+        if expected_count != count or len(expected_top) != len(top):
+            raise AssertionError(f"query {number}: {count} matches instead of {expected_count}")
+        expected_scores = np.array([score for _, score in expected_top])
+        scores = np.array([score for _, score in top])
+        if not np.allclose(scores, expected_scores, rtol=0, atol=TOLERANCE):
+            raise AssertionError(f"query {number}: scores differ")
+        if expected_top:
+            # articles scoring clearly above the last one cannot depend on rounding
+            last = expected_scores[-1] + TOLERANCE
+            if {a for a, s in expected_top if s > last} != {a for a, s in top if s > last}:
+                raise AssertionError(f"query {number}: different articles")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch query scoring benchmark")
+    parser.add_argument("--docs", type=int, default=50_000)
+    parser.add_argument("--vocabulary", type=int, default=50_000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--blocks", type=int, nargs="+", default=[1, 32, 256, 1024])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        articles_vectors, idf = synthetic_vectors(args.docs, args.vocabulary)
+        model_file = os.path.join(work_dir, "model.bin")
+        write_model_from_vectors(model_file, articles_vectors, idf)
+        del articles_vectors
+        engine = MatrixSearchEngine.from_model(TfIdfModel(model_file))
+        queries = [" ".join(query) for query in synthetic_queries(idf, args.queries, max_terms=4)]
+
+        def vectorize(batch):
+            return [vectorize_query(normalize_query(query), engine.idf) for query in batch]
+
+        start = time.perf_counter()
+        expected = [engine.top(query_vector, args.top) for query_vector in vectorize(queries)]
+        single_seconds = time.perf_counter() - start
+
+        print(f"{args.docs} docs, {len(engine.idf)} terms, {len(queries)} queries, top {args.top}")
+        print(f"{'path':>12} {'seconds':>8} {'queries/s':>10} {'speedup':>8}")
+        print(f"{'per query':>12} {single_seconds:>8.2f} {len(queries) / single_seconds:>10.0f} {1:>7.1f}x")
+        for block_size in args.blocks:
+            start = time.perf_counter()
+            actual = list(engine.top_batch(vectorize(queries), args.top, block_size))
+            seconds = time.perf_counter() - start
+            check_same(expected, actual)
+            print(f"{f'block {block_size}':>12} {seconds:>8.2f} {len(queries) / seconds:>10.0f} "
+                  f"{single_seconds / seconds:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Memory and latency of set postings vs RoaringBitmap postings in searcher.process_rpn_sequence.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_bitmap --docs 100000 --density 0.01
+"""
+import argparse
+import statistics
+import time
+import tracemalloc
+
+from benchmarks.synthetic_index import mixed_queries, synthetic_index
+from inverted_index.indexer import to_bitmap_postings
+from inverted_index.searcher import collect_article_ids, process_rpn_sequence, process_tokens, tokenize_query
+
+
+def build(make):
+    tracemalloc.start()
+    index = make()
+    size_mb = tracemalloc.get_traced_memory()[0] / 2 ** 20
+    tracemalloc.stop()
+    return index, size_mb
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bitmap postings benchmark")
+    parser.add_argument("--docs", type=int, default=100_000)
+    parser.add_argument("--terms", type=int, default=5_000)
+    parser.add_argument("--density", type=float, default=0.01)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    set_index, set_mb = build(lambda: synthetic_index(args.docs, args.terms))
+    bitmap_index, bitmap_mb = build(lambda: to_bitmap_postings(synthetic_index(args.docs, args.terms), args.density))
+
+    bitmaps = sum(1 for postings in bitmap_index.values() if not isinstance(postings, set))
+    print(f"{args.docs} docs, {args.terms} terms, {bitmaps} postings stored as bitmaps")
+
+    plans = [process_tokens(tokenize_query(query)) for query in mixed_queries(set_index, args.queries)]
+
+    print(f"{'postings':>9} {'index MB':>9} {'p50 ms':>8} {'mean ms':>8}")
+    results = {}
+    for name, index, size_mb in (("set", set_index, set_mb), ("bitmap", bitmap_index, bitmap_mb)):
+        universe = collect_article_ids(index)
+        latencies = []
+        results[name] = []
+        for plan in plans:
+            start = time.perf_counter()
+            result = process_rpn_sequence(plan, index, universe)
+            latencies.append((time.perf_counter() - start) * 1000)
+            results[name].append(sorted(result))
+        print(f"{name:>9} {size_mb:>9.1f} {statistics.median(latencies):>8.2f} {statistics.mean(latencies):>8.2f}")
+
+    mismatches = sum(left != right for left, right in zip(results["set"], results["bitmap"]))
+    print(f"result mismatches: {mismatches}")
+
+
+if __name__ == "__main__":
+    main()
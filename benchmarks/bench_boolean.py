@@ -0,0 +1,59 @@
+"""Latency of mixed boolean queries: set algebra (searcher.boolean_search) vs QueryEngine.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_boolean --docs 100000 --terms 20000
+"""
+import argparse
+import contextlib
+import io
+import statistics
+import time
+
+from benchmarks.synthetic_index import mixed_queries, synthetic_index
+from inverted_index.query_engine import QueryEngine
+from inverted_index.searcher import boolean_search, collect_article_ids, engine_search
+
+
+def timed(search, queries: list[str]) -> list[float]:
+    latencies = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for query in queries:
+            start = time.perf_counter()
+            search(query)
+            latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Boolean query engine benchmark")
+    parser.add_argument("--docs", type=int, default=100_000)
+    parser.add_argument("--terms", type=int, default=20_000)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    index = synthetic_index(args.docs, args.terms)
+    queries = mixed_queries(index, args.queries)
+
+    start = time.perf_counter()
+    engine = QueryEngine(index)
+    print(f"{args.docs} docs, {args.terms} terms, QueryEngine load {time.perf_counter() - start:.2f} s")
+    # the NOT universe once per index, as QueryEngine.universe
+    all_docs = collect_article_ids(index)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        mismatches = sum(boolean_search(query, index, all_docs=all_docs) != engine_search(query, engine) for query in queries)
+    print(f"result mismatches: {mismatches}")
+
+    print(f"{'engine':>8} {'p50 ms':>8} {'p99 ms':>8} {'mean ms':>8}")
+    for name, search in (
+            ("sets", lambda query: boolean_search(query, index, all_docs=all_docs)),
+            ("sorted", lambda query: engine_search(query, engine)),
+    ):
+        latencies = sorted(timed(search, queries))
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        print(f"{name:>8} {statistics.median(latencies):>8.2f} {p99:>8.2f} {statistics.mean(latencies):>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Time per page and peak memory of the HTML cleaning path over scrapper/saved_pages.
+
+"bs4" is the previous path: remove_tags with two BeautifulSoup parses, then one more parse in
+lemmatize_page for the text and one in get_article_title for the title. "streaming" is
+common.html_cleaner.clean_html, which produces all three in one pass.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_cleaner
+"""
+import argparse
+import time
+import tracemalloc
+
+from bs4 import BeautifulSoup
+
+from common.article_store import page_names, read_page
+from common.html_cleaner import clean_html, DROPPED_TAGS
+
+
+def bs4_path(html: str):
+    soup = BeautifulSoup(html, "html.parser")
+    for tag in soup(list(DROPPED_TAGS)):
+        tag.decompose()
+    cleaned_html = str(BeautifulSoup(str(soup), "html.parser"))
+
+    text = BeautifulSoup(cleaned_html, "html.parser").get_text(separator=" ", strip=True)
+    soup = BeautifulSoup(cleaned_html, "html.parser")
+    title = soup.title.string.strip() if soup.title and soup.title.string else "Без заголовка"
+    return title, text, cleaned_html
+
+
+def streaming_path(html: str):
+    return clean_html(html)
+
+
+def measure(clean, pages: list[str]) -> tuple[float, float]:
+    start = time.perf_counter()
+    for html in pages:
+        clean(html)
+    per_page_ms = (time.perf_counter() - start) / len(pages) * 1000
+
+    tracemalloc.start()
+    for html in pages:
+        clean(html)
+    peak_mb = tracemalloc.get_traced_memory()[1] / 2 ** 20
+    tracemalloc.stop()
+
+    return per_page_ms, peak_mb
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTML cleaner benchmark")
+    parser.add_argument("--pages-dir", default="scrapper/saved_pages")
+    parser.add_argument("--limit", type=int, default=0, help="use only the first N pages")
+    args = parser.parse_args()
+
+    filenames = page_names(args.pages_dir)
+    if args.limit:
+        filenames = filenames[:args.limit]
+
+    pages = [read_page(args.pages_dir, filename) for filename in filenames]
+
+    print(f"{len(pages)} pages")
+    print(f"{'path':>10} {'ms/page':>8} {'peak MB':>8}")
+    for name, clean in (("bs4", bs4_path), ("streaming", streaming_path)):
+        per_page_ms, peak_mb = measure(clean, pages)
+        print(f"{name:>10} {per_page_ms:>8.2f} {peak_mb:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Crawl throughput of scrapper.start_scraping against the local stub server.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_crawler --latency 0.05 --concurrency 1 2 4 8 16
+"""
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+from benchmarks.stub_server import start_stub_server
+from common.article_store import page_names
+from scrapper import scrapper
+
+
+def run_crawl(base_url: str, workers: int, rate: float) -> tuple[int, float]:
+    scrapper.base_url_template = f"{base_url}/ru/hubs/{scrapper.hub}/articles/top/yearly/page{{}}"
+    scrapper.article_url_template = f"{base_url}/ru/articles/{{}}"
+
+    previous_cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as work_dir:
+        os.chdir(work_dir)
+        os.makedirs(scrapper.saved_pages_dir)
+        engine = scrapper.CrawlEngine(workers=workers, rate=rate, burst=workers)
+        try:
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                scrapper.start_scraping(engine)
+            elapsed = time.perf_counter() - start
+            saved = len(page_names(scrapper.saved_pages_dir))
+        finally:
+            engine.close()
+            os.chdir(previous_cwd)
+
+    return saved + scrapper.max_pages, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scrapper throughput benchmark")
+    parser.add_argument("--latency", type=float, default=0.05, help="stub response delay, seconds")
+    parser.add_argument("--fail-every", type=int, default=0, help="stub answers every N-th request with 429")
+    parser.add_argument("--rate", type=float, default=1000.0, help="per-host request rate limit")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    args = parser.parse_args()
+
+    server = start_stub_server(latency=args.latency, fail_every=args.fail_every)
+    try:
+        print(f"{'workers':>8} {'pages':>6} {'seconds':>8} {'pages/sec':>10}")
+        for workers in args.concurrency:
+            pages, elapsed = run_crawl(server.base_url, workers, args.rate)
+            print(f"{workers:>8} {pages:>6} {elapsed:>8.2f} {pages / elapsed:>10.1f}")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Load time, RSS and query latency of the CSV and the binary inverted index.
+
+Each format is measured in a fresh process. Run from the repository root:
+
+    python -m benchmarks.bench_index
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.memory import rss_mb
+from inverted_index.binary_index import BinaryIndex, write_binary_index
+from inverted_index.indexer import read_index_file
+
+
+def measure(index_format: str, path: str, terms: list[str]) -> tuple[float, float, float]:
+    rss_before = rss_mb()
+    start = time.perf_counter()
+    index = BinaryIndex(path) if index_format == "binary" else read_index_file(path)
+    load_ms = (time.perf_counter() - start) * 1000
+    rss_delta = rss_mb() - rss_before
+
+    start = time.perf_counter()
+    for left, right in zip(terms[::2], terms[1::2]):
+        index.get(left, set()) & index.get(right, set())
+    query_us = (time.perf_counter() - start) / (len(terms) // 2) * 1e6
+
+    return load_ms, rss_delta, query_us
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inverted index format benchmark")
+    parser.add_argument("--csv", default="inverted_index/inverted_index.csv")
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args()
+
+    index = read_index_file(args.csv)
+    terms = random.Random(0).choices(sorted(index), k=args.queries * 2)
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        binary_path = os.path.join(work_dir, "inverted_index.bin")
+        write_binary_index(index, binary_path)
+        del index
+
+        print(f"csv: {os.path.getsize(args.csv) / 2 ** 10:.0f} KB, "
+              f"binary: {os.path.getsize(binary_path) / 2 ** 10:.0f} KB")
+        print(f"{'format':>8} {'load ms':>8} {'RSS MB':>7} {'AND query us':>13}")
+
+        context = multiprocessing.get_context("spawn")
+        for index_format, path in (("csv", args.csv), ("binary", binary_path)):
+            with context.Pool(1) as pool:
+                load_ms, rss_delta, query_us = pool.apply(measure, (index_format, path, terms))
+            print(f"{index_format:>8} {load_ms:>8.1f} {rss_delta:>7.1f} {query_us:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Per-hit title lookup: parsing the saved page vs the articles.sqlite metadata store.
+
+Works on a copy of the saved pages, so the real store is not touched. Run from the repository root:
+
+    python -m benchmarks.bench_metadata --hits 10
+"""
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from common.article_metadata import backfill
+from vector_search.vector_search import describe_articles, get_article_title
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Article metadata lookup benchmark")
+    parser.add_argument("--pages", default="scrapper/saved_pages")
+    parser.add_argument("--index", default="scrapper/index.txt")
+    parser.add_argument("--hits", type=int, default=10, help="hits per result page")
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        pages_dir = os.path.join(work_dir, "saved_pages")
+        shutil.copytree(args.pages, pages_dir)
+        article_ids = sorted(os.listdir(pages_dir))
+        rng = random.Random(0)
+        result_pages = [rng.sample(article_ids, min(args.hits, len(article_ids))) for _ in range(args.queries)]
+
+        start = time.perf_counter()
+        for hits in result_pages:
+            for article_id in hits:
+                get_article_title(pages_dir, article_id)
+        parse_us = (time.perf_counter() - start) / (args.queries * args.hits) * 1e6
+
+        start = time.perf_counter()
+        added = backfill(pages_dir, args.index)
+        backfill_s = time.perf_counter() - start
+
+        for hits in result_pages:
+            expected = [get_article_title(pages_dir, article_id) for article_id in hits]
+            actual = [row["title"] for row in describe_articles(pages_dir, [(article_id, 1.0) for article_id in hits])]
+            if expected != actual:
+                raise AssertionError("metadata titles differ from the parsed pages")
+
+        start = time.perf_counter()
+        for hits in result_pages:
+            describe_articles(pages_dir, [(article_id, 1.0) for article_id in hits])
+        sqlite_us = (time.perf_counter() - start) / (args.queries * args.hits) * 1e6
+
+    print(f"backfill: {added} articles in {backfill_s:.2f} s")
+    print(f"{'lookup':>14} {'us / hit':>9}")
+    print(f"{'parse page':>14} {parse_us:>9.1f}")
+    print(f"{'sqlite':>14} {sqlite_us:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Startup time and resident memory of the text TF-IDF files vs the memory-mapped model file.
+
+Each load runs in a fresh spawned process so RSS is not shared between measurements.
+Run from the repository root:
+
+    python -m benchmarks.bench_model --docs 160 10000 50000
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+
+from benchmarks.memory import rss_mb
+from benchmarks.synthetic_vectors import synthetic_queries, synthetic_vectors
+from common.tfidf_model import TfIdfModel, convert_tf_idf_dir
+from vector_search.matrix_search import MatrixSearchEngine
+from vector_search.vector_search import preload_tf_idf_vectors
+
+
+def write_text_dir(tf_idf_dir: str, articles_vectors, idf):
+    os.makedirs(tf_idf_dir, exist_ok=True)
+    for article_id, vector in articles_vectors.items():
+        with open(os.path.join(tf_idf_dir, article_id), "w", encoding="utf-8") as file:
+            for term, weight in vector.items():
+                file.write(f"{term} {idf[term]:.6f} {weight:.6f}\n")
+
+
+def load_engine(kind: str, path: str) -> MatrixSearchEngine:
+    if kind == "text":
+        return MatrixSearchEngine.from_vectors(*preload_tf_idf_vectors(path))
+    return MatrixSearchEngine.from_model(TfIdfModel(path))
+
+
+def measure_load(kind: str, path: str, queries) -> tuple[float, float, list]:
+    """Runs in a child process: load time in ms, RSS growth in MB and the top results of the queries."""
+    before = rss_mb()
+    start = time.perf_counter()
+    engine = load_engine(kind, path)
+    load_ms = (time.perf_counter() - start) * 1000
+    results = [engine.top(query_vector, 10) for query_vector in queries]
+    return load_ms, rss_mb() - before, results
+
+
+def same_results(expected, actual) -> bool:
+    for (expected_count, expected_top), (count, top) in zip(expected, actual):
+        if expected_count != count:
+            return False
+        if any(abs(score - expected_score) > 1e-5
+               for (_, score), (_, expected_score) in zip(top, expected_top)):
+            return False
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TF-IDF model load benchmark")
+    parser.add_argument("--docs", type=int, nargs="+", default=[160, 10_000, 50_000])
+    parser.add_argument("--queries", type=int, default=20)
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    print(f"{'docs':>8} {'format':>7} {'size MB':>8} {'load ms':>9} {'RSS MB':>8}")
+    for docs in args.docs:
+        articles_vectors, idf = synthetic_vectors(docs)
+        queries = synthetic_queries(idf, args.queries)
+
+        with tempfile.TemporaryDirectory() as work_dir:
+            text_dir = os.path.join(work_dir, "lemmas")
+            model_file = os.path.join(work_dir, "model.bin")
+            write_text_dir(text_dir, articles_vectors, idf)
+            convert_tf_idf_dir(text_dir, model_file)
+            sizes = {
+                "text": sum(entry.stat().st_size for entry in os.scandir(text_dir)) / 2 ** 20,
+                "binary": os.path.getsize(model_file) / 2 ** 20,
+            }
+
+            outcomes = {}
+            for kind, path in (("text", text_dir), ("binary", model_file)):
+                with context.Pool(1) as pool:
+                    outcomes[kind] = pool.apply(measure_load, (kind, path, queries))
+
+        if not same_results(outcomes["text"][2], outcomes["binary"][2]):
+            raise AssertionError(f"model file results differ from the text files for {docs} docs")
+
+        for kind, (load_ms, memory, _) in outcomes.items():
+            print(f"{docs:>8} {kind:>7} {sizes[kind]:>8.1f} {load_ms:>9.1f} {memory:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Build time and memory of the "more like this" neighbour table as the corpus grows.
+
+For every corpus size the table is built exactly and with high-IDF candidate pruning (--max-df),
+each build in a fresh spawned process so its peak RSS is its own. The exact table is checked against
+a brute-force cosine of sample documents; the pruned one reports recall@k against the exact table.
+The time growth column is the exponent of build time over the previous corpus size (1 is linear,
+2 is quadratic). Run from the repository root:
+
+    python -m benchmarks.bench_neighbours --docs 5000 10000 20000 40000 --max-df 200
+"""
+import argparse
+import math
+import multiprocessing
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.memory import peak_rss_mb, rss_mb
+from benchmarks.synthetic_vectors import synthetic_vectors
+from common.tfidf_model import write_model_from_vectors
+from vector_search.neighbours import build_neighbours, load_documents, normalize_rows
+
+SAMPLE_DOCS = 50
+
+
+def measure_build(model_file: str, neighbours_count: int, max_df: float) -> tuple[float, float, np.ndarray, np.ndarray]:
+    """Runs in a child process: build seconds, peak RSS growth in MB, neighbour rows and scores."""
+    _, doc_term = load_documents(model_file, "")
+    before = rss_mb()
+    start = time.perf_counter()
+    rows, scores = build_neighbours(doc_term, neighbours_count, max_df)
+    return time.perf_counter() - start, peak_rss_mb() - before, rows, scores
+
+
+def check_exact(model_file: str, rows: np.ndarray, scores: np.ndarray):
+    _, doc_term = load_documents(model_file, "")
+    vectors = normalize_rows(doc_term)
+    for doc in np.random.default_rng(0).choice(vectors.shape[0], SAMPLE_DOCS, replace=False).tolist():
+        similarities = (vectors @ vectors[doc].T).toarray().ravel()
+        similarities[doc] = 0
+        found = rows[doc][rows[doc] >= 0]
+        expected = np.sort(similarities[similarities > 0])[::-1][:rows.shape[1]]
+        if len(found) != len(expected) or not np.allclose(scores[doc][:len(found)], expected, atol=1e-5):
+            raise AssertionError(f"document {doc}: neighbour scores differ from the brute-force cosine")
+        if not np.allclose(similarities[found], expected, atol=1e-5):
+            raise AssertionError(f"document {doc}: neighbours are not the most similar documents")
+
+
+def recall(exact: np.ndarray, pruned: np.ndarray) -> float:
+    found = total = 0
+    for exact_row, pruned_row in zip(exact, pruned):
+        expected = set(exact_row[exact_row >= 0].tolist())
+        found += len(expected & set(pruned_row.tolist()))
+        total += len(expected)
+    return found / total if total else 1.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Neighbour table build benchmark")
+    parser.add_argument("--docs", type=int, nargs="+", default=[5000, 10_000, 20_000])
+    parser.add_argument("--vocabulary", type=int, default=50_000)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--max-df", type=float, default=200, help="pruned builds: max documents of a candidate term")
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    previous = {}
+    print(f"{'docs':>8} {'build':>8} {'seconds':>8} {'growth':>7} {'peak MB':>8} {'recall':>7}")
+    for docs in args.docs:
+        with tempfile.TemporaryDirectory() as work_dir:
+            model_file = os.path.join(work_dir, "model.bin")
+            write_model_from_vectors(model_file, *synthetic_vectors(docs, args.vocabulary))
+
+            outcomes = {}
+            for kind, max_df in (("exact", None), ("pruned", args.max_df)):
+                with context.Pool(1) as pool:
+                    outcomes[kind] = pool.apply(measure_build, (model_file, args.top, max_df))
+            check_exact(model_file, outcomes["exact"][2], outcomes["exact"][3])
+
+        for kind, (seconds, memory, rows, _) in outcomes.items():
+            growth = ""
+            if kind in previous:
+                previous_docs, previous_seconds = previous[kind]
+                growth = f"{math.log(seconds / previous_seconds) / math.log(docs / previous_docs):.2f}"
+            previous[kind] = (docs, seconds)
+            kind_recall = recall(outcomes["exact"][2], rows)
+            print(f"{docs:>8} {kind:>8} {seconds:>8.2f} {growth:>7} {memory:>8.1f} {kind_recall:>7.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""Top-k latency of exhaustive scoring vs MaxScore-pruned postings for 1-5 term queries.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_postings --docs 100000
+"""
+import argparse
+import statistics
+import time
+
+from benchmarks.synthetic_vectors import synthetic_queries, synthetic_vectors
+from vector_search.matrix_search import MatrixSearchEngine
+from vector_search.postings_search import PostingsSearchEngine
+from vector_search.vector_search import rank_articles
+
+
+def mean_ms(search, queries) -> float:
+    latencies = []
+    for query_vector in queries:
+        start = time.perf_counter()
+        search(query_vector)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return statistics.mean(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MaxScore postings benchmark")
+    parser.add_argument("--docs", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=30)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    articles_vectors, idf = synthetic_vectors(args.docs)
+    matrix = MatrixSearchEngine.from_vectors(articles_vectors, idf)
+    postings = PostingsSearchEngine.from_vectors(articles_vectors, idf)
+
+    print(f"{args.docs} docs, top {args.top}, mean latency ms")
+    print(f"{'terms':>6} {'exhaustive':>11} {'matrix':>8} {'maxscore':>9} {'speedup':>8} {'match':>6}")
+    for terms in range(1, 6):
+        queries = synthetic_queries(idf, args.queries, max_terms=terms, seed=terms, min_terms=terms)
+
+        matches = 0
+        for query_vector in queries:
+            expected = rank_articles(query_vector, articles_vectors)
+            count, actual = postings.top(query_vector, args.top)
+            matches += count == len(expected) and [doc for doc, _ in actual] == [doc for doc, _ in expected[:args.top]]
+
+        exhaustive_ms = mean_ms(lambda q: rank_articles(q, articles_vectors)[:args.top], queries)
+        matrix_ms = mean_ms(lambda q: matrix.top(q, args.top), queries)
+        maxscore_ms = mean_ms(lambda q: postings.top(q, args.top), queries)
+        print(f"{terms:>6} {exhaustive_ms:>11.2f} {matrix_ms:>8.2f} {maxscore_ms:>9.2f} "
+              f"{exhaustive_ms / maxscore_ms:>7.0f}x {matches:>3}/{len(queries)}")
+
+
+if __name__ == "__main__":
+    main()
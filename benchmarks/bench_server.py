@@ -0,0 +1,106 @@
+"""Load test of demo/server.py: p50/p99 latency and QPS of /api/search by gunicorn worker count.
+
+Each worker count starts a fresh server process on a local port; queries are random 1-3 term
+combinations from tf_idf/lemmas, so most of them miss the result cache. Run from the repository root:
+
+    python -m benchmarks.bench_server --workers 1 2 4 --concurrency 16 --requests 2000
+"""
+import argparse
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def query_terms(tf_idf_dir: str, limit: int = 5000) -> list[str]:
+    terms = set()
+    for filename in sorted(os.listdir(tf_idf_dir)):
+        with open(os.path.join(tf_idf_dir, filename), "r", encoding="utf-8") as file:
+            terms.update(line.split(" ", 1)[0] for line in file if line.strip())
+        if len(terms) >= limit:
+            break
+    return sorted(terms)
+
+
+def start_server(workers: int, threads: int, port: int) -> subprocess.Popen:
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [REPO_ROOT, os.environ.get("PYTHONPATH")])))
+    process = subprocess.Popen(
+        [sys.executable, "server.py", "--workers", str(workers), "--threads", str(threads), "--port", str(port)],
+        cwd=os.path.join(REPO_ROOT, "demo"), env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            requests.get(f"http://127.0.0.1:{port}/", timeout=1)
+            return process
+        except requests.ConnectionError:
+            if process.poll() is not None:
+                break
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"server with {workers} workers did not start")
+
+
+def run_load(url: str, queries: list[str], concurrency: int) -> tuple[np.ndarray, float]:
+    local = threading.local()
+
+    def request(query: str) -> float:
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        session = local.session
+        start = time.perf_counter()
+        response = session.get(url, params={"q": query}, timeout=30)
+        response.raise_for_status()
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = list(executor.map(request, queries))
+    return np.array(latencies) * 1000, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Search server load test")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--threads", type=int, default=4, help="threads per worker")
+    parser.add_argument("--concurrency", type=int, default=16, help="concurrent client connections")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--tf-idf", default=os.path.join(REPO_ROOT, "tf_idf", "lemmas"))
+    args = parser.parse_args()
+
+    terms = query_terms(args.tf_idf)
+    rng = random.Random(0)
+    queries = [" ".join(rng.sample(terms, rng.randint(1, 3))) for _ in range(args.requests)]
+
+    print(f"{'workers':>8} {'p50 ms':>8} {'p99 ms':>8} {'QPS':>8}")
+    for workers in args.workers:
+        port = free_port()
+        process = start_server(workers, args.threads, port)
+        try:
+            url = f"http://127.0.0.1:{port}/api/search"
+            run_load(url, queries[:args.concurrency * 4], args.concurrency)
+            latencies, elapsed = run_load(url, queries, args.concurrency)
+        finally:
+            process.terminate()
+            process.wait()
+        p50, p99 = np.percentile(latencies, [50, 99])
+        print(f"{workers:>8} {p50:>8.1f} {p99:>8.1f} {len(queries) / elapsed:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
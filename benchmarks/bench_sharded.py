@@ -0,0 +1,105 @@
+"""Latency and throughput of ShardedSearchEngine across shard counts vs the unsharded engines.
+
+A synthetic corpus is written as model.bin and inverted_index.bin, split with common.shards and
+served by one process per shard. Latency is measured one query at a time, throughput with
+--clients threads issuing queries concurrently. Every top-k list (article ids and scores) and every
+boolean result is checked to be identical to MatrixSearchEngine / QueryEngine over the full files.
+Run from the repository root:
+
+    python -m benchmarks.bench_sharded --docs 200000 --shards 1 2 4 8
+"""
+import argparse
+import contextlib
+import io
+import os
+import statistics
+import tempfile
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.synthetic_index import mixed_queries
+from benchmarks.synthetic_vectors import synthetic_queries, synthetic_vectors
+from common.shards import write_shards
+from common.tfidf_model import TfIdfModel, write_model_from_vectors
+from inverted_index.binary_index import BinaryIndex, write_binary_index
+from inverted_index.indexer import document_number
+from inverted_index.query_engine import QueryEngine
+from inverted_index.searcher import parse_query
+from vector_search.matrix_search import MatrixSearchEngine
+from vector_search.sharded_search import ShardedSearchEngine
+
+
+def measure(search, queries: list, clients: int) -> tuple[list, float, float, float]:
+    """Results, p50 and p99 latency in ms of sequential queries, queries/s with concurrent clients."""
+    results, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        results.append(search(query))
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(clients) as executor:
+        list(executor.map(search, queries))
+    qps = len(queries) / (time.perf_counter() - start)
+    return results, statistics.median(latencies), statistics.quantiles(latencies, n=100)[98], qps
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sharded search benchmark")
+    parser.add_argument("--docs", type=int, default=100_000)
+    parser.add_argument("--vocabulary", type=int, default=50_000)
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--clients", type=int, default=8, help="concurrent query threads for throughput")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        articles_vectors, idf = synthetic_vectors(args.docs, args.vocabulary)
+        model_file = os.path.join(work_dir, "model.bin")
+        index_file = os.path.join(work_dir, "inverted_index.bin")
+        write_model_from_vectors(model_file, articles_vectors, idf)
+        index = defaultdict(set)
+        for article_id, vector in articles_vectors.items():
+            for term in vector:
+                index[term].add(document_number(article_id))
+        write_binary_index(index, index_file)
+
+        vector_queries = synthetic_queries(idf, args.queries, min_terms=1, max_terms=4)
+        with contextlib.redirect_stdout(io.StringIO()):
+            boolean_queries = [parse_query(query) for query in mixed_queries(index, args.queries)]
+        del articles_vectors, index
+
+        matrix = MatrixSearchEngine.from_model(TfIdfModel(model_file))
+        query_engine = QueryEngine(BinaryIndex(index_file))
+        engines = [("unsharded", lambda q: matrix.top(q, args.top), query_engine.search, None)]
+        for shards in args.shards:
+            shards_dir = os.path.join(work_dir, f"shards_{shards}")
+            start = time.perf_counter()
+            write_shards(model_file, index_file, os.path.join(work_dir, "positions.bin"), shards_dir, shards)
+            split_s = time.perf_counter() - start
+            engine = ShardedSearchEngine(shards_dir)
+            engines.append((f"{shards} shards", lambda q, e=engine: e.top(q, args.top), engine.search, engine))
+            print(f"{shards} shards written in {split_s:.2f} s")
+
+        print(f"{args.docs} docs, {len(idf)} terms, top {args.top}, {args.clients} clients, {os.cpu_count()} CPUs")
+        print(f"{'engine':>10} {'kind':>8} {'p50 ms':>8} {'p99 ms':>8} {'queries/s':>10}")
+        expected = {}
+        try:
+            for name, top, boolean, _ in engines:
+                for kind, search, queries in (("vector", top, vector_queries), ("boolean", boolean, boolean_queries)):
+                    results, p50, p99, qps = measure(search, queries, args.clients)
+                    if kind not in expected:
+                        expected[kind] = results
+                    elif results != expected[kind]:
+                        raise AssertionError(f"{name}: {kind} results differ from the unsharded engine")
+                    print(f"{name:>10} {kind:>8} {p50:>8.2f} {p99:>8.2f} {qps:>10.0f}")
+        finally:
+            for _, _, _, engine in engines:
+                if engine is not None:
+                    engine.close()
+
+
+if __name__ == "__main__":
+    main()
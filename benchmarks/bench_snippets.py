@@ -0,0 +1,86 @@
+"""Per-hit snippet latency: parsing the saved page and scanning its text vs the positional index.
+
+Positions are rebuilt from lemmatizer/lemmas and the page texts, so the benchmark runs without
+re-lemmatizing. Run from the repository root:
+
+    python -m benchmarks.bench_snippets --queries 200
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from common.article_store import read_page
+from common.html_cleaner import clean_html
+from inverted_index.indexer import document_number
+from inverted_index.positional_index import (
+    SNIPPET_BYTES, PositionalIndex, lemma_occurrences, write_positional_index, write_positions_file
+)
+from tf_idf.tf_idf import read_lemma_file
+
+
+def parsed_snippet(page_path: str, terms: list[str], lemmas: dict, window: int = SNIPPET_BYTES) -> str:
+    """What the search path would do without positions: parse the page and scan the whole text."""
+    pages_dir, filename = os.path.split(page_path)
+    text = clean_html(read_page(pages_dir, filename)).text
+    occurrences = lemma_occurrences(text, lemmas)
+    starts = sorted(start for term in terms for _, start, _ in occurrences.get(term, []))
+    data = text.encode("utf-8")
+    begin = max(0, starts[0] - window // 2) if starts else 0
+    return data[begin:begin + window].decode("utf-8", errors="ignore")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Snippet generation benchmark")
+    parser.add_argument("--pages", default="scrapper/saved_pages")
+    parser.add_argument("--lemmas", default="lemmatizer/lemmas")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--hits", type=int, default=10)
+    args = parser.parse_args()
+
+    filenames = sorted(os.listdir(args.lemmas))
+    lemmas = {filename: read_lemma_file(Path(args.lemmas) / filename) for filename in filenames}
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        positions_dir = os.path.join(work_dir, "positions")
+        os.makedirs(positions_dir)
+        for filename in filenames:
+            text = clean_html(read_page(args.pages, filename)).text
+            write_positions_file(os.path.join(positions_dir, filename), lemma_occurrences(text, lemmas[filename]))
+
+        index_file = os.path.join(work_dir, "positions.bin")
+        start = time.perf_counter()
+        write_positional_index(positions_dir, args.pages, index_file)
+        build_s = time.perf_counter() - start
+        size_kb = os.path.getsize(index_file) / 2 ** 10
+
+        rng = random.Random(0)
+        requests = []
+        for _ in range(args.queries):
+            hits = rng.sample(filenames, min(args.hits, len(filenames)))
+            terms = rng.sample(sorted(lemmas[hits[0]]), min(2, len(lemmas[hits[0]])))
+            requests.append((hits, terms))
+
+        index = PositionalIndex(index_file)
+        start = time.perf_counter()
+        for hits, terms in requests:
+            for filename in hits:
+                index.snippet(document_number(filename), terms)
+        positional_us = (time.perf_counter() - start) / (args.queries * args.hits) * 1e6
+
+        start = time.perf_counter()
+        for hits, terms in requests:
+            for filename in hits:
+                parsed_snippet(os.path.join(args.pages, filename), terms, lemmas[filename])
+        parsed_us = (time.perf_counter() - start) / (args.queries * args.hits) * 1e6
+
+    print(f"positions.bin: {size_kb:.0f} KB, built in {build_s:.2f} s")
+    print(f"{'snippet':>12} {'us / hit':>9}")
+    print(f"{'parse page':>12} {parsed_us:>9.1f}")
+    print(f"{'positional':>12} {positional_us:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Wall clock of the staged pipeline vs pipeline.stream_pipeline against the local stub server.
+
+The staged run is scrapper.start_scraping, then lemmatizer.start_lemmatizing with the same number
+of processes, then run_pipeline's indexer, positions and tf_idf stages, each waiting for the
+previous one.
+The streamed run crawls the same pages with the lemmatizer and the accumulator working while
+articles are still being fetched. Both runs start from an empty repository layout in a temporary
+directory; the inverted index, positions.bin, model.bin and TF-IDF files they write are checked
+to be identical. Run from the repository root:
+
+    python -m benchmarks.bench_stream_pipeline --latency 0.05 --pages 8 --workers 2
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.stub_server import start_stub_server
+from lemmatizer import lemmatizer
+from pipeline import run_pipeline
+from pipeline.manifest import Manifest
+from pipeline.stream_pipeline import run_stream
+from scrapper import scrapper
+
+LAYOUT_DIRS = ["scrapper/saved_pages", "lemmatizer", "inverted_index", "tf_idf", "pipeline"]
+
+COMPARED_FILES = [
+    run_pipeline.INDEX_FILE,
+    run_pipeline.BINARY_INDEX_FILE,
+    run_pipeline.POSITIONAL_INDEX_FILE,
+    run_pipeline.TF_IDF_MODEL_FILE,
+]
+COMPARED_DIRS = [run_pipeline.TF_IDF_TOKENS_DIR, run_pipeline.TF_IDF_LEMMAS_DIR]
+
+
+def make_layout(root: Path):
+    for directory in LAYOUT_DIRS:
+        (root / directory).mkdir(parents=True)
+
+
+def run_staged(root: Path, engine: scrapper.CrawlEngine, workers: int, tokenizer: str):
+    with run_pipeline.working_dir(root / "scrapper"):
+        scrapper.start_scraping(engine)
+    with run_pipeline.working_dir(root / "lemmatizer"):
+        for directory in ("tokens", "lemmas", "positions"):
+            os.makedirs(directory)
+        lemmatizer.start_lemmatizing(workers, tokenizer)
+    with run_pipeline.working_dir(root):
+        manifest = Manifest(run_pipeline.MANIFEST_FILE)
+        run_pipeline.run_indexer(manifest)
+        run_pipeline.run_positional_index(manifest)
+        run_pipeline.run_tf_idf(manifest)
+
+
+def check_same_outputs(staged: Path, streamed: Path):
+    for path in COMPARED_FILES:
+        if (staged / path).read_bytes() != (streamed / path).read_bytes():
+            raise AssertionError(f"{path} differs between the staged and the streamed run")
+    for directory in COMPARED_DIRS:
+        names = sorted(file.name for file in (staged / directory).iterdir())
+        if names != sorted(file.name for file in (streamed / directory).iterdir()):
+            raise AssertionError(f"{directory}: different documents")
+        for name in names:
+            if (staged / directory / name).read_bytes() != (streamed / directory / name).read_bytes():
+                raise AssertionError(f"{directory / name} differs between the staged and the streamed run")
+
+    state_file = run_pipeline.TF_IDF_STATE_FILE
+    if json.loads((staged / state_file).read_text()) != json.loads((streamed / state_file).read_text()):
+        raise AssertionError(f"{state_file} differs between the staged and the streamed run")
+
+    index_file = run_pipeline.SCRAPPER_INDEX_FILE
+    urls = [{line.split(": ")[1] for line in (root / index_file).read_text().splitlines()} for root in (staged, streamed)]
+    if urls[0] != urls[1]:
+        raise AssertionError(f"{index_file}: different articles saved")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Staged vs streamed pipeline benchmark")
+    parser.add_argument("--latency", type=float, default=0.05, help="stub response delay, seconds")
+    parser.add_argument("--pages", type=int, default=scrapper.max_pages, help="listing pages of 20 articles")
+    parser.add_argument("--concurrency", type=int, default=scrapper.concurrency, help="fetch threads")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="lemmatizer processes")
+    parser.add_argument("--tokenizer", choices=["nltk", "regex"], default="regex")
+    parser.add_argument("--queue-size", type=int, default=64)
+    args = parser.parse_args()
+
+    lemmatizer.ensure_nltk_data()
+    server = start_stub_server(latency=args.latency)
+    scrapper.base_url_template = f"{server.base_url}/ru/hubs/{scrapper.hub}/articles/top/yearly/page{{}}"
+    scrapper.article_url_template = f"{server.base_url}/ru/articles/{{}}"
+    scrapper.max_pages = args.pages
+
+    timings = {}
+    try:
+        with tempfile.TemporaryDirectory() as work_dir:
+            roots = {"staged": Path(work_dir) / "staged", "streamed": Path(work_dir) / "streamed"}
+            for mode, root in roots.items():
+                make_layout(root)
+                engine = scrapper.CrawlEngine(workers=args.concurrency, rate=1000.0, burst=args.concurrency)
+                try:
+                    start = time.perf_counter()
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        if mode == "staged":
+                            run_staged(root, engine, args.workers, args.tokenizer)
+                        else:
+                            run_stream(root, args.workers, args.tokenizer, queue_size=args.queue_size, engine=engine)
+                    timings[mode] = time.perf_counter() - start
+                finally:
+                    engine.close()
+
+            check_same_outputs(roots["staged"], roots["streamed"])
+            articles = len((roots["staged"] / run_pipeline.SCRAPPER_INDEX_FILE).read_text().splitlines())
+    finally:
+        server.shutdown()
+
+    print(f"{articles} articles, {args.latency * 1000:.0f} ms latency, "
+          f"{args.concurrency} fetch threads, {args.workers} lemmatizer processes")
+    print(f"{'run':>9} {'seconds':>8} {'articles/s':>11}")
+    for mode, seconds in timings.items():
+        print(f"{mode:>9} {seconds:>8.2f} {articles / seconds:>11.1f}")
+    print(f"speedup: {timings['staged'] / timings['streamed']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Full TF-IDF rebuild: the dict-based tf_idf functions vs the chunked NumPy builder.
+
+Both builds run in fresh spawned processes over the same token/lemma files; the written files
+are compared line by line (same terms in the same order, values within float tolerance).
+Run from the repository root:
+
+    python -m benchmarks.bench_tf_idf --docs 160 5000 20000
+    python -m benchmarks.bench_tf_idf --corpus lemmatizer
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from benchmarks.memory import peak_rss_mb
+from benchmarks.synthetic_index import term_name
+from tf_idf import tf_idf
+from tf_idf.builder import build_tf_idf
+
+# Values are written with 6 decimals, so a last-digit rounding difference is allowed.
+TOLERANCE = 2e-6
+
+
+def write_synthetic_corpus(token_dir: Path, lemma_dir: Path, docs: int, vocabulary: int = 50_000,
+                           tokens_per_doc: int = 300, seed: int = 0):
+    """Token and lemma files in the lemmatizer format; every three word forms share one lemma."""
+    rng = np.random.default_rng(seed)
+    forms = [term_name(rank) for rank in range(vocabulary)]
+    lemmas = ["l" + term_name(rank // 3) for rank in range(vocabulary)]
+    popularity = 1.0 / np.arange(1, vocabulary + 1) ** 1.1
+    popularity /= popularity.sum()
+
+    token_dir.mkdir(parents=True)
+    lemma_dir.mkdir(parents=True)
+    for number in range(docs):
+        length = max(10, int(rng.normal(tokens_per_doc, tokens_per_doc / 4)))
+        ids = rng.choice(vocabulary, size=length, p=popularity).tolist()
+        fname = f"article_{number}.txt"
+        token_dir.joinpath(fname).write_text('\n'.join(forms[i] for i in ids), encoding='utf-8')
+
+        lemma_forms = {}
+        for i in sorted(set(ids)):
+            lemma_forms.setdefault(lemmas[i], []).append(forms[i])
+        lemma_dir.joinpath(fname).write_text(
+            ''.join(f"{lemma} {' '.join(words)}\n" for lemma, words in lemma_forms.items()), encoding='utf-8'
+        )
+
+
+def run_dicts(token_dir: Path, lemma_dir: Path, output_token_dir: Path, output_lemma_dir: Path):
+    doc_token_counts, token_df = tf_idf.load_token_data(token_dir)
+    doc_lemma_tokens, lemma_doc_set = tf_idf.load_lemma_data(lemma_dir, doc_token_counts)
+    total_docs = len(doc_token_counts)
+    tf_idf.compute_and_write_tf_idf_tokens(doc_token_counts, token_df, total_docs, output_token_dir)
+    tf_idf.compute_and_write_tf_idf_lemmas(
+        doc_token_counts, doc_lemma_tokens, lemma_doc_set, total_docs, output_lemma_dir
+    )
+
+
+def measure(kind: str, token_dir: Path, lemma_dir: Path, output_dir: Path) -> tuple[float, float]:
+    """Runs in a child process: build time in seconds and peak RSS in MB."""
+    output_token_dir, output_lemma_dir = output_dir / "tokens", output_dir / "lemmas"
+    output_token_dir.mkdir(parents=True)
+    output_lemma_dir.mkdir(parents=True)
+
+    start = time.perf_counter()
+    if kind == "dicts":
+        run_dicts(token_dir, lemma_dir, output_token_dir, output_lemma_dir)
+    else:
+        build_tf_idf(token_dir, lemma_dir, output_token_dir, output_lemma_dir, output_dir / "model.bin")
+    return time.perf_counter() - start, peak_rss_mb()
+
+
+def compare_dirs(expected_dir: Path, actual_dir: Path):
+    expected_files = sorted(os.listdir(expected_dir))
+    if expected_files != sorted(os.listdir(actual_dir)):
+        raise AssertionError(f"{actual_dir} has a different set of files")
+    for fname in expected_files:
+        expected = expected_dir.joinpath(fname).read_text(encoding='utf-8').splitlines()
+        actual = actual_dir.joinpath(fname).read_text(encoding='utf-8').splitlines()
+        if len(expected) != len(actual):
+            raise AssertionError(f"{actual_dir / fname}: {len(actual)} terms instead of {len(expected)}")
+        for expected_line, actual_line in zip(expected, actual):
+            term, idf, weight = expected_line.split()
+            actual_term, actual_idf, actual_weight = actual_line.split()
+            if (term != actual_term or abs(float(idf) - float(actual_idf)) > TOLERANCE
+                    or abs(float(weight) - float(actual_weight)) > TOLERANCE):
+                raise AssertionError(f"{actual_dir / fname}: '{actual_line}' instead of '{expected_line}'")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TF-IDF build benchmark")
+    parser.add_argument("--docs", type=int, nargs="+", default=[160, 5_000, 20_000])
+    parser.add_argument("--corpus", help="directory with tokens/ and lemmas/ to use instead of a synthetic corpus")
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    print(f"{'docs':>8} {'build':>6} {'time s':>7} {'peak RSS MB':>12}")
+    for docs in ([None] if args.corpus else args.docs):
+        with tempfile.TemporaryDirectory() as work_dir:
+            work_dir = Path(work_dir)
+            if args.corpus:
+                token_dir, lemma_dir = Path(args.corpus) / "tokens", Path(args.corpus) / "lemmas"
+                docs = len(os.listdir(token_dir))
+            else:
+                token_dir, lemma_dir = work_dir / "tokens", work_dir / "lemmas"
+                write_synthetic_corpus(token_dir, lemma_dir, docs)
+
+            for kind in ("dicts", "numpy"):
+                with context.Pool(1) as pool:
+                    seconds, peak = pool.apply(measure, (kind, token_dir, lemma_dir, work_dir / kind))
+                print(f"{docs:>8} {kind:>6} {seconds:>7.2f} {peak:>12.1f}")
+
+            for subdir in ("tokens", "lemmas"):
+                compare_dirs(work_dir / "dicts" / subdir, work_dir / "numpy" / subdir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Startup and per-page tokenization time of lemmatizer.TextPipeline over scrapper/saved_pages.
+
+"legacy" rebuilds the stop-word sets on every page, as extract_tokens did before TextPipeline;
+"nltk" and "regex" are the two tokenizers of a pipeline created once.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_tokenize
+"""
+import argparse
+import os
+import time
+
+from nltk.corpus import stopwords
+
+from common.article_store import page_names
+from common.html_cleaner import load_page
+from lemmatizer.lemmatizer import TextPipeline, ensure_nltk_data
+
+
+def legacy_extract_tokens(pipeline: TextPipeline, text: str) -> set[str]:
+    pipeline.eng_stop_words = frozenset(stopwords.words('english'))
+    pipeline.rus_stop_words = frozenset(stopwords.words('russian'))
+    return pipeline.extract_tokens(text)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tokenization benchmark")
+    parser.add_argument("--pages-dir", default="scrapper/saved_pages")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    ensure_nltk_data()
+    print(f"nltk data check: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    texts = [
+        load_page(os.path.join(args.pages_dir, filename)).text.lower()
+        for filename in page_names(args.pages_dir)
+    ]
+    print(f"{len(texts)} pages")
+
+    print(f"{'tokenizer':>10} {'startup ms':>11} {'ms/page':>8} {'tokens':>8}")
+    for name in ("legacy", "nltk", "regex"):
+        start = time.perf_counter()
+        pipeline = TextPipeline(tokenizer="regex" if name == "regex" else "nltk")
+        startup_ms = (time.perf_counter() - start) * 1000
+
+        tokens_count = 0
+        start = time.perf_counter()
+        for text in texts:
+            if name == "legacy":
+                tokens_count += len(legacy_extract_tokens(pipeline, text))
+            else:
+                tokens_count += len(pipeline.extract_tokens(text))
+        per_page_ms = (time.perf_counter() - start) / len(texts) * 1000
+
+        print(f"{name:>10} {startup_ms:>11.1f} {per_page_ms:>8.2f} {tokens_count:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Query latency and memory of dict-based cosine search vs MatrixSearchEngine.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_vector --docs 160 10000 100000
+"""
+import argparse
+import statistics
+import time
+import tracemalloc
+
+from benchmarks.synthetic_vectors import synthetic_queries, synthetic_vectors
+from vector_search.matrix_search import MatrixSearchEngine
+from vector_search.vector_search import rank_articles
+
+
+def latencies_ms(search, queries) -> list[float]:
+    result = []
+    for query_vector in queries:
+        start = time.perf_counter()
+        search(query_vector)
+        result.append((time.perf_counter() - start) * 1000)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vector search engine benchmark")
+    parser.add_argument("--docs", type=int, nargs="+", default=[160, 10_000, 100_000])
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"{'docs':>8} {'engine':>7} {'p50 ms':>8} {'mean ms':>8} {'memory MB':>10}")
+    for docs in args.docs:
+        tracemalloc.start()
+        articles_vectors, idf = synthetic_vectors(docs)
+        dict_mb = tracemalloc.get_traced_memory()[0] / 2 ** 20
+        before = tracemalloc.get_traced_memory()[0]
+        engine = MatrixSearchEngine.from_vectors(articles_vectors, idf)
+        matrix_mb = (tracemalloc.get_traced_memory()[0] - before) / 2 ** 20
+        tracemalloc.stop()
+
+        queries = synthetic_queries(idf, args.queries)
+        for query_vector in queries[:10]:
+            expected = rank_articles(query_vector, articles_vectors)
+            count, actual = engine.top(query_vector, args.top)
+            if count != len(expected) or any(
+                    abs(score - expected_score) > 1e-9
+                    for (_, score), (_, expected_score) in zip(actual, expected)
+            ):
+                raise AssertionError(f"matrix scores differ from the reference for {query_vector}")
+
+        for name, search, memory in (
+                ("dict", lambda q: rank_articles(q, articles_vectors)[:args.top], dict_mb),
+                ("matrix", lambda q: engine.top(q, args.top), matrix_mb),
+        ):
+            latencies = latencies_ms(search, queries)
+            print(f"{docs:>8} {name:>7} {statistics.median(latencies):>8.2f} "
+                  f"{statistics.mean(latencies):>8.2f} {memory:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
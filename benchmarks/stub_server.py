@@ -0,0 +1,144 @@
+"""Local stub of the Habr hub used to exercise the scrapper without network access.
+
+Run from the repository root:
+
+    python -m benchmarks.stub_server --port 8081 --latency 0.05
+"""
+import argparse
+import hashlib
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LISTING_PATH = re.compile(r"^/ru/hubs/(?P<hub>[\w-]+)/articles/top/yearly/page(?P<page>\d+)/?$")
+ARTICLE_PATH = re.compile(r"^/ru/articles/(?P<article_id>\d+)/?$")
+
+FIRST_ARTICLE_ID = 900000
+
+WORDS = (
+    "kotlin coroutines flow корутины поток android compose multiplatform функция класс "
+    "интерфейс suspend scope channel dispatcher тестирование сборка gradle jvm"
+).split()
+
+
+def listing_html(page: int, articles_per_page: int) -> str:
+    start = FIRST_ARTICLE_ID + (page - 1) * articles_per_page
+    items = "".join(
+        f'<article class="tm-articles-list__item" id="{article_id}"><h2>Статья {article_id}</h2></article>'
+        for article_id in range(start, start + articles_per_page)
+    )
+    return (
+        "<!DOCTYPE html><html><head><title>Kotlin / Хабр</title>"
+        '<script src="/app.js"></script></head><body>'
+        f'<div class="tm-articles-list">{items}</div></body></html>'
+    )
+
+
+def article_html(article_id: int, paragraphs: int = 40) -> str:
+    body = "".join(
+        f"<p>{' '.join(WORDS[(article_id + i + j) % len(WORDS)] for j in range(30))}</p>"
+        for i in range(paragraphs)
+    )
+    return (
+        f"<!DOCTYPE html><html lang=\"ru\"><head><title>Статья {article_id} / Хабр</title>"
+        '<meta charset="utf-8"><link rel="stylesheet" href="/style.css">'
+        "<style>body { color: black; }</style></head><body>"
+        f"<script>window.__STATE__ = {{}};</script><div class=\"article\">{body}</div></body></html>"
+    )
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests_count += 1
+            request_number = server.requests_count
+
+        if server.latency:
+            threading.Event().wait(server.latency)
+
+        if server.fail_every and request_number % server.fail_every == 0:
+            self.send_body(server.fail_status, b"Temporary failure", {"Retry-After": "0"})
+            return
+
+        listing = LISTING_PATH.match(self.path)
+        article = ARTICLE_PATH.match(self.path)
+
+        if listing:
+            html = listing_html(int(listing.group("page")), server.articles_per_page)
+        elif article:
+            html = article_html(int(article.group("article_id")))
+        else:
+            self.send_body(404, b"Not Found")
+            return
+
+        body = html.encode("utf-8")
+        etag = f'"{hashlib.md5(body).hexdigest()}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_body(304, b"", {"ETag": etag})
+            return
+
+        self.send_body(200, body, {"Content-Type": "text/html; charset=utf-8", "ETag": etag})
+
+    def send_body(self, status: int, body: bytes, headers: dict = None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+            self,
+            address,
+            latency: float = 0.0,
+            fail_every: int = 0,
+            articles_per_page: int = 20,
+            fail_status: int = 429
+    ):
+        super().__init__(address, StubHandler)
+        self.latency = latency
+        self.fail_every = fail_every
+        self.fail_status = fail_status
+        self.articles_per_page = articles_per_page
+        self.requests_count = 0
+        self.lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+def start_stub_server(latency: float = 0.0, fail_every: int = 0, port: int = 0, fail_status: int = 429) -> StubServer:
+    """Starts the stub in a daemon thread; port 0 picks a free port."""
+    server = StubServer(("127.0.0.1", port), latency=latency, fail_every=fail_every, fail_status=fail_status)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stub of the Habr hub")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0.05, help="delay before each response, seconds")
+    parser.add_argument("--fail-every", type=int, default=0, help="answer every N-th request with --fail-status")
+    parser.add_argument("--fail-status", type=int, default=429, help="status of the failed responses, e.g. 503")
+    args = parser.parse_args()
+
+    server = StubServer(("127.0.0.1", args.port), latency=args.latency, fail_every=args.fail_every,
+                        fail_status=args.fail_status)
+    print(f"Stub server is listening on {server.base_url}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,378 @@
+"""End-to-end benchmark of the batch stages and both searches on a synthetic corpus.
+
+Stages run in order, each in a fresh spawned process over the files the previous stages wrote, so
+its peak RSS is its own:
+
+    clean              clean_html + extracted/ + articles.sqlite, the CPU part of scrapper.write_page
+    lemmatize          lemmatizer.lemmatize_page for every page
+    index              make_index + write_binary_index
+    positions          write_positional_index
+    tf_idf             build_tf_idf with model.bin
+    boolean            searcher.engine_search over QueryEngine(inverted_index.bin), the searcher's default
+    boolean_search     searcher.boolean_search over the set index, the reference boolean search
+    vector             MatrixSearchEngine.find_top_articles over model.bin
+    find_top_articles  vector_search.find_top_articles over tf_idf/lemmas, the reference vector search
+
+Time, throughput, peak RSS and the common.metrics spans of every stage go to a JSON report, which is
+compared with the baseline stored for the same corpus size. Run from the repository root:
+
+    python -m benchmarks.suite --docs 1000 --repeat 3 --output bench.json
+    python -m benchmarks.suite --docs 1000 --repeat 3 --update-baseline
+    python -m benchmarks.suite --docs 100000 --work-dir /tmp/bench --stages boolean vector
+
+Exits with status 1 if a stage is slower or uses more memory than the baseline allows.
+"""
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import re
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from benchmarks.memory import peak_rss_mb
+from benchmarks.synthetic_corpus import write_corpus
+from benchmarks.synthetic_index import mixed_queries
+
+STAGES = [
+    "clean", "lemmatize", "index", "positions", "tf_idf", "boolean", "boolean_search", "vector", "find_top_articles"
+]
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+# Relative slowdown or memory growth against the baseline that still passes.
+DEFAULT_TOLERANCE = 0.25
+# Stages shorter than this are dominated by noise and only compared on memory.
+MIN_COMPARED_SECONDS = 0.05
+
+
+class Layout:
+    """Paths of one benchmark run, laid out like the repository directories."""
+
+    def __init__(self, work_dir: str):
+        self.work_dir = Path(work_dir)
+        self.pages = self.work_dir / "saved_pages"
+        self.index_txt = self.work_dir / "index.txt"
+        self.lemmatizer = self.work_dir / "lemmatizer"
+        self.tokens = self.lemmatizer / "tokens"
+        self.lemmas = self.lemmatizer / "lemmas"
+        self.positions = self.lemmatizer / "positions"
+        self.binary_index = self.work_dir / "inverted_index.bin"
+        self.positional_index = self.work_dir / "positions.bin"
+        self.tf_idf_tokens = self.work_dir / "tf_idf" / "tokens"
+        self.tf_idf_lemmas = self.work_dir / "tf_idf" / "lemmas"
+        self.model = self.work_dir / "tf_idf" / "model.bin"
+
+
+def run_clean(layout: Layout, options: dict) -> dict:
+    from common.article_metadata import open_store, page_metadata, read_index_urls
+    from common.html_cleaner import clean_html, write_extracted
+    from common.metrics import metrics
+
+    urls = read_index_urls(str(layout.index_txt))
+    records = []
+    filenames = sorted(os.listdir(layout.pages))
+    for filename in filenames:
+        page_path = layout.pages / filename
+        with metrics.span("scrape.clean"):
+            page = clean_html(page_path.read_text(encoding="utf-8"))
+        with metrics.span("scrape.save"):
+            write_extracted(str(page_path), page)
+        records.append(page_metadata(filename, urls.get(filename, ""), page))
+    open_store(str(layout.pages)).put_many(records)
+    return {"items": len(filenames), "unit": "docs"}
+
+
+def run_lemmatize(layout: Layout, options: dict) -> dict:
+    from lemmatizer import lemmatizer
+
+    lemmatizer.ensure_nltk_data()
+    lemmatizer.init_pipeline(options["tokenizer"])
+    for directory in (layout.tokens, layout.lemmas, layout.positions):
+        directory.mkdir(parents=True, exist_ok=True)
+
+    filenames = sorted(os.listdir(layout.pages))
+    tokens = 0
+    with contextlib.redirect_stdout(io.StringIO()):
+        for filename in filenames:
+            tokens += lemmatizer.lemmatize_page(str(layout.pages / filename), str(layout.lemmatizer))
+    return {"items": len(filenames), "unit": "docs", "tokens": tokens}
+
+
+def run_index(layout: Layout, options: dict) -> dict:
+    from common.metrics import metrics
+    from inverted_index.binary_index import write_binary_index
+    from inverted_index.indexer import make_index
+
+    with metrics.span("index.build"):
+        index = make_index(str(layout.lemmas))
+    with metrics.span("index.write"):
+        write_binary_index(index, str(layout.binary_index))
+    return {"items": len(os.listdir(layout.lemmas)), "unit": "docs", "terms": len(index)}
+
+
+def run_positions(layout: Layout, options: dict) -> dict:
+    from inverted_index.positional_index import write_positional_index
+
+    write_positional_index(str(layout.positions), str(layout.pages), str(layout.positional_index))
+    return {"items": len(os.listdir(layout.positions)), "unit": "docs",
+            "size_mb": layout.positional_index.stat().st_size / 2 ** 20}
+
+
+def run_tf_idf(layout: Layout, options: dict) -> dict:
+    from tf_idf.builder import build_tf_idf
+
+    layout.tf_idf_tokens.mkdir(parents=True, exist_ok=True)
+    layout.tf_idf_lemmas.mkdir(parents=True, exist_ok=True)
+    result = build_tf_idf(layout.tokens, layout.lemmas, layout.tf_idf_tokens, layout.tf_idf_lemmas, layout.model)
+    return {"items": result["total_docs"], "unit": "docs", "terms": len(result["lemma_df"])}
+
+
+def frequent_terms(layout: Layout, limit: int, pattern: str = None) -> list[str]:
+    """Model vocabulary from the most to the least frequent lemma."""
+    from common.tfidf_model import TfIdfModel
+
+    model = TfIdfModel(str(layout.model))
+    regex = re.compile(pattern) if pattern else None
+    terms = [model.vocabulary[i] for i in np.argsort(model.idf, kind="stable").tolist()]
+    return [term for term in terms if regex is None or regex.fullmatch(term)][:limit]
+
+
+def latency_stats(latencies: list[float], load_seconds: float) -> dict:
+    """Query stages: throughput counts the queries only, index loading is reported apart."""
+    latencies = sorted(latencies)
+    return {
+        "load_seconds": load_seconds,
+        "busy_seconds": sum(latencies),
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+    }
+
+
+def run_boolean(layout: Layout, options: dict) -> dict:
+    from inverted_index.binary_index import BinaryIndex
+    from inverted_index.query_engine import QueryEngine
+    from inverted_index.searcher import engine_search
+
+    # the query parser only accepts Latin words
+    terms = frequent_terms(layout, 5000, r"[a-z]+")
+    queries = mixed_queries(dict.fromkeys(terms), options["queries"], seed=options["seed"])
+    start = time.perf_counter()
+    engine = QueryEngine(BinaryIndex(str(layout.binary_index)))
+    load_seconds = time.perf_counter() - start
+
+    latencies = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for query in queries:
+            start = time.perf_counter()
+            engine_search(query, engine)
+            latencies.append(time.perf_counter() - start)
+    return {"items": len(queries), "unit": "queries", **latency_stats(latencies, load_seconds)}
+
+
+def run_boolean_search(layout: Layout, options: dict) -> dict:
+    from inverted_index.binary_index import BinaryIndex
+    from inverted_index.searcher import boolean_search, collect_article_ids
+
+    terms = frequent_terms(layout, 5000, r"[a-z]+")
+    queries = mixed_queries(dict.fromkeys(terms), options["queries"], seed=options["seed"])
+    start = time.perf_counter()
+    # the same term -> set of documents dict that read_index_file builds from inverted_index.csv
+    index = dict(BinaryIndex(str(layout.binary_index)).items())
+    all_docs = collect_article_ids(index)
+    load_seconds = time.perf_counter() - start
+
+    latencies = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for query in queries:
+            start = time.perf_counter()
+            boolean_search(query, index, all_docs=all_docs)
+            latencies.append(time.perf_counter() - start)
+    return {"items": len(queries), "unit": "queries", **latency_stats(latencies, load_seconds)}
+
+
+def vector_queries(layout: Layout, options: dict) -> list[str]:
+    rng = np.random.default_rng(options["seed"])
+    terms = frequent_terms(layout, 5000)
+    return [" ".join(rng.choice(terms, size=rng.integers(1, 4), replace=False)) for _ in range(options["queries"])]
+
+
+def run_vector(layout: Layout, options: dict) -> dict:
+    from common.tfidf_model import TfIdfModel
+    from vector_search.matrix_search import MatrixSearchEngine
+
+    queries = vector_queries(layout, options)
+    start = time.perf_counter()
+    engine = MatrixSearchEngine.from_model(TfIdfModel(str(layout.model)))
+    load_seconds = time.perf_counter() - start
+
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        engine.find_top_articles(query, str(layout.pages), 10)
+        latencies.append(time.perf_counter() - start)
+    return {"items": len(queries), "unit": "queries", **latency_stats(latencies, load_seconds)}
+
+
+def run_find_top_articles(layout: Layout, options: dict) -> dict:
+    from vector_search.vector_search import find_top_articles, preload_tf_idf_vectors
+
+    queries = vector_queries(layout, options)
+    start = time.perf_counter()
+    articles_vectors, idf = preload_tf_idf_vectors(str(layout.tf_idf_lemmas))
+    load_seconds = time.perf_counter() - start
+
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        find_top_articles(query, articles_vectors, idf, str(layout.pages), 10)
+        latencies.append(time.perf_counter() - start)
+    return {"items": len(queries), "unit": "queries", **latency_stats(latencies, load_seconds)}
+
+
+STAGE_FUNCTIONS = {
+    "clean": run_clean,
+    "lemmatize": run_lemmatize,
+    "index": run_index,
+    "positions": run_positions,
+    "tf_idf": run_tf_idf,
+    "boolean": run_boolean,
+    "boolean_search": run_boolean_search,
+    "vector": run_vector,
+    "find_top_articles": run_find_top_articles,
+}
+
+
+def measure(stage: str, work_dir: str, options: dict) -> dict:
+    """Runs in a child process: the stage result plus wall time, throughput, peak RSS and metric spans."""
+    from common.metrics import metrics
+
+    start = time.perf_counter()
+    result = STAGE_FUNCTIONS[stage](Layout(work_dir), options)
+    seconds = time.perf_counter() - start
+    busy_seconds = result.get("busy_seconds", seconds)
+    result.update(
+        seconds=seconds,
+        throughput=result["items"] / busy_seconds if busy_seconds else 0.0,
+        peak_rss_mb=peak_rss_mb(),
+        spans=metrics.summary()["spans"],
+    )
+    return result
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Regressions of report against baseline: lower throughput or higher peak RSS beyond tolerance."""
+    regressions = []
+    for stage, result in report["stages"].items():
+        expected = baseline["stages"].get(stage)
+        if expected is None:
+            continue
+        if (expected["seconds"] >= MIN_COMPARED_SECONDS
+                and result["throughput"] < expected["throughput"] * (1 - tolerance)):
+            regressions.append(
+                f"{stage}: {result['throughput']:.1f} {result['unit']}/s, baseline {expected['throughput']:.1f}"
+            )
+        if result["peak_rss_mb"] > expected["peak_rss_mb"] * (1 + tolerance):
+            regressions.append(
+                f"{stage}: peak RSS {result['peak_rss_mb']:.0f} MB, baseline {expected['peak_rss_mb']:.0f} MB"
+            )
+    return regressions
+
+
+def load_baselines(path: str) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+def save_baseline(path: str, report: dict):
+    baselines = load_baselines(path)
+    baselines[str(report["docs"])] = report
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(baselines, file, ensure_ascii=False, indent=2)
+
+
+def run_suite(work_dir: str, docs: int, stages: list[str], options: dict) -> dict:
+    layout = Layout(work_dir)
+    if not layout.pages.exists():
+        start = time.perf_counter()
+        write_corpus(work_dir, docs, options["words"], seed=options["seed"])
+        print(f"corpus: {docs} articles generated in {time.perf_counter() - start:.1f} s")
+
+    report = {
+        "docs": docs,
+        "options": options,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "stages": {},
+    }
+    context = multiprocessing.get_context("spawn")
+    print(f"{'stage':>17} {'time s':>8} {'throughput':>16} {'peak RSS MB':>12}")
+    for stage in [stage for stage in STAGES if stage in stages]:
+        # every stage rewrites the same outputs, so a repeated run measures the same work again
+        results = []
+        for _ in range(options["repeat"]):
+            with context.Pool(1) as pool:
+                results.append(pool.apply(measure, (stage, work_dir, options)))
+        result = sorted(results, key=lambda r: r["throughput"])[len(results) // 2]
+        report["stages"][stage] = result
+        throughput = f"{result['throughput']:.1f} {result['unit']}/s"
+        print(f"{stage:>17} {result['seconds']:>8.2f} {throughput:>16} {result['peak_rss_mb']:>12.1f}")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end benchmark suite on a synthetic corpus")
+    parser.add_argument("--docs", type=int, default=1000, help="corpus size, 1k to 1M articles")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES)
+    parser.add_argument("--work-dir", help="keep the corpus and stage outputs here and reuse them on the next run")
+    parser.add_argument("--output", help="JSON report file")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="JSON file with baselines by corpus size")
+    parser.add_argument("--update-baseline", action="store_true", help="store this run as the baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--words", type=int, default=600, help="median words per article")
+    parser.add_argument("--tokenizer", choices=["nltk", "regex"], default="regex")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=1, help="runs per stage, the median by throughput is kept")
+    args = parser.parse_args()
+
+    options = {"queries": args.queries, "words": args.words, "tokenizer": args.tokenizer, "seed": args.seed,
+               "repeat": args.repeat}
+    with contextlib.ExitStack() as stack:
+        work_dir = args.work_dir or stack.enter_context(tempfile.TemporaryDirectory(prefix="bench_suite_"))
+        os.makedirs(work_dir, exist_ok=True)
+        report = run_suite(work_dir, args.docs, args.stages, options)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+
+    if args.update_baseline:
+        save_baseline(args.baseline, report)
+        print(f"baseline for {args.docs} docs saved to {args.baseline}")
+        return
+
+    baseline = load_baselines(args.baseline).get(str(args.docs))
+    if baseline is None:
+        print(f"no baseline for {args.docs} docs in {args.baseline}")
+        return
+    regressions = compare(report, baseline, args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    if regressions:
+        sys.exit(1)
+    print(f"no regressions against the baseline of {baseline['created_at']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""Synthetic Habr-like corpus in the scrapper output format: saved_pages/article_N.txt and index.txt.
+
+Words are pseudo-words built from Russian and Latin syllables with inflected endings, drawn from a
+Zipf distribution over the vocabulary, so lemmatizer, indexer and TF-IDF see realistic term
+frequencies at any scale. Run from the repository root:
+
+    python -m benchmarks.synthetic_corpus --docs 100000 --output /tmp/corpus
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+
+RUSSIAN_SYLLABLES = [
+    c + v for c in "бвгдзклмнпрстфхч" for v in "аеиоуя"
+]
+ENGLISH_SYLLABLES = [
+    c + v for c in "bcdfgklmnprtv" for v in "aeiou"
+]
+# Noun-like endings: pymorphy2 folds most of them back into one normal form.
+RUSSIAN_ENDINGS = ["", "а", "у", "ом", "е", "ы", "ов", "ами", "ах"]
+# No plural "s": the searcher lemmatizes query words with WordNet, index terms have to survive it.
+ENGLISH_ENDINGS = ["", "ing", "ed", "er"]
+
+PAGE_HEADER = """<!DOCTYPE html>
+
+<html lang="ru">
+<head>
+<title>{title} / Хабр</title>
+</head>
+<body>
+<div id="mount"><div id="app"><header class="tm-header"><a class="tm-header__logo" href="/ru/">Хабр</a>
+<a class="tm-header__become-author-btn" href="/ru/sandbox/start/">Как стать автором</a></header>
+<div class="tm-layout"><main class="tm-layout__container"><article class="tm-article-presenter__content">
+<h1 class="tm-title tm-title_h1"><span>{title}</span></h1>
+<div class="tm-article-body" id="post-content-body">
+"""
+PAGE_FOOTER = """</div></article></main></div>
+<footer class="tm-footer"><a href="/ru/docs/help/">Помощь</a> <a href="/ru/feedback/">Обратная связь</a></footer>
+</div></div>
+</body>
+</html>
+"""
+ARTICLE_URL_TEMPLATE = "https://habr.com/ru/articles/{}"
+
+
+def pseudo_word(rank: int, syllables: list[str]) -> str:
+    """Stem of 2-4 syllables, unique per rank."""
+    parts = []
+    number = rank
+    while True:
+        number, remainder = divmod(number, len(syllables))
+        parts.append(syllables[remainder])
+        if not number:
+            break
+    while len(parts) < 2:
+        parts.append(syllables[(rank * 7 + len(parts)) % len(syllables)])
+    return "".join(reversed(parts))
+
+
+class SyntheticVocabulary:
+    """Stems with Zipf popularity; a share of them are English, the rest Russian."""
+
+    def __init__(self, size: int = 50_000, english_share: float = 0.3, exponent: float = 1.07, seed: int = 0):
+        rng = np.random.default_rng(seed)
+        is_english = rng.random(size) < english_share
+        russian_rank = english_rank = 0
+        self.stems = []
+        self.endings = []
+        for english in is_english:
+            if english:
+                self.stems.append(pseudo_word(english_rank, ENGLISH_SYLLABLES))
+                self.endings.append(ENGLISH_ENDINGS)
+                english_rank += 1
+            else:
+                self.stems.append(pseudo_word(russian_rank, RUSSIAN_SYLLABLES))
+                self.endings.append(RUSSIAN_ENDINGS)
+                russian_rank += 1
+
+        popularity = 1.0 / np.arange(1, size + 1) ** exponent
+        self.cdf = np.cumsum(popularity / popularity.sum())
+
+    def sample(self, rng: np.random.Generator, count: int) -> list[str]:
+        ranks = np.minimum(np.searchsorted(self.cdf, rng.random(count)), len(self.stems) - 1)
+        ending_choices = rng.integers(0, 1 << 16, count)
+        return [
+            self.stems[rank] + self.endings[rank][choice % len(self.endings[rank])]
+            for rank, choice in zip(ranks.tolist(), ending_choices.tolist())
+        ]
+
+
+def synthetic_page(vocabulary: SyntheticVocabulary, rng: np.random.Generator, words_per_doc: int) -> str:
+    length = max(50, int(rng.lognormal(np.log(words_per_doc), 0.5)))
+    words = vocabulary.sample(rng, length)
+    title = " ".join(words[:rng.integers(3, 8)]).capitalize()
+
+    parts = [PAGE_HEADER.format(title=title)]
+    position = 0
+    while position < length:
+        paragraph = words[position:position + int(rng.integers(30, 120))]
+        position += len(paragraph)
+        if rng.random() < 0.1:
+            parts.append(f"<pre><code>{' '.join(paragraph)}</code></pre>\n")
+        else:
+            parts.append(f"<p>{' '.join(paragraph).capitalize()}.</p>\n")
+    parts.append(PAGE_FOOTER)
+    return "".join(parts)
+
+
+def write_corpus(
+        output_dir: str,
+        docs: int,
+        words_per_doc: int = 600,
+        vocabulary_size: int = 50_000,
+        english_share: float = 0.3,
+        seed: int = 0
+) -> str:
+    """Writes output_dir/saved_pages and output_dir/index.txt; returns the pages directory."""
+    pages_dir = os.path.join(output_dir, "saved_pages")
+    os.makedirs(pages_dir, exist_ok=True)
+    vocabulary = SyntheticVocabulary(vocabulary_size, english_share, seed=seed)
+    rng = np.random.default_rng(seed + 1)
+
+    with open(os.path.join(output_dir, "index.txt"), "w", encoding="utf-8") as index_file:
+        for number in range(1, docs + 1):
+            article_id = 100_000 + number
+            with open(os.path.join(pages_dir, f"article_{article_id}.txt"), "w", encoding="utf-8") as file:
+                file.write(synthetic_page(vocabulary, rng, words_per_doc))
+            index_file.write(f"{number}: {ARTICLE_URL_TEMPLATE.format(article_id)}\n")
+    return pages_dir
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Synthetic Habr-like corpus generator")
+    parser.add_argument("--docs", type=int, default=1000)
+    parser.add_argument("--output", required=True, help="directory for saved_pages/ and index.txt")
+    parser.add_argument("--words", type=int, default=600, help="median words per article")
+    parser.add_argument("--vocabulary", type=int, default=50_000)
+    parser.add_argument("--english-share", type=float, default=0.3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    write_corpus(args.output, args.docs, args.words, args.vocabulary, args.english_share, args.seed)
+    print(f"{args.docs} articles written to {args.output} in {time.perf_counter() - start:.1f} s")
@@ -0,0 +1,48 @@
+import random
+
+# No vowels or letters that would form "and"/"or"/"not" inside a term, and no trailing "s" that
+# WordNetLemmatizer would strip: generated terms survive searcher.tokenize_query unchanged.
+TERM_LETTERS = "bcfghjklmpqvwxz"
+
+
+def term_name(number: int) -> str:
+    letters = []
+    number += len(TERM_LETTERS)
+    while number:
+        number, remainder = divmod(number, len(TERM_LETTERS))
+        letters.append(TERM_LETTERS[remainder])
+    return "".join(reversed(letters))
+
+
+def synthetic_index(docs: int, terms: int, seed: int = 0) -> dict[str, set[int]]:
+    """Inverted index whose posting lengths follow a Zipf-like curve: term k is in ~docs / k**0.8 docs."""
+    rng = random.Random(seed)
+    index = {}
+    for rank in range(1, terms + 1):
+        length = max(1, min(docs, int(docs * 0.5 / rank ** 0.8)))
+        index[term_name(rank)] = set(rng.sample(range(1, docs + 1), length))
+    return index
+
+
+def mixed_queries(index: dict[str, set[int]], count: int, seed: int = 0) -> list[str]:
+    rng = random.Random(seed)
+    terms = list(index)
+    frequent = terms[:50]
+    templates = [
+        "{a} AND {b}",
+        "{a} AND {b} AND {c}",
+        "{a} OR {b}",
+        "{a} AND NOT {b}",
+        "NOT {a}",
+        "({a} OR {b}) AND {c}",
+        "{f} AND {a}",
+        "{f} AND {g} AND NOT {a}",
+    ]
+    queries = []
+    for _ in range(count):
+        template = rng.choice(templates)
+        queries.append(template.format(
+            a=rng.choice(terms), b=rng.choice(terms), c=rng.choice(terms),
+            f=rng.choice(frequent), g=rng.choice(frequent),
+        ))
+    return queries
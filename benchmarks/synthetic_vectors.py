@@ -0,0 +1,59 @@
+import math
+
+import numpy as np
+
+from benchmarks.synthetic_index import term_name
+
+
+def synthetic_vectors(
+        docs: int,
+        vocabulary: int = 20_000,
+        terms_per_doc: int = 80,
+        seed: int = 0
+) -> tuple[dict[str, dict[str, float]], dict[str, float]]:
+    """TF-IDF vectors shaped like preload_tf_idf_vectors output, with Zipf-distributed terms."""
+    rng = np.random.default_rng(seed)
+    terms = [term_name(rank) for rank in range(vocabulary)]
+
+    popularity = 1.0 / np.arange(1, vocabulary + 1) ** 1.1
+    popularity /= popularity.sum()
+
+    doc_terms = []
+    df = np.zeros(vocabulary, dtype=np.int64)
+    for _ in range(docs):
+        length = max(5, int(rng.normal(terms_per_doc, terms_per_doc / 4)))
+        ids = np.unique(rng.choice(vocabulary, size=length, p=popularity))
+        doc_terms.append(ids)
+        df[ids] += 1
+
+    idf = {terms[i]: math.log(docs / df[i]) for i in np.flatnonzero(df)}
+
+    articles_vectors = {}
+    for number, ids in enumerate(doc_terms):
+        counts = rng.integers(1, 6, size=len(ids))
+        total = counts.sum()
+        articles_vectors[f"article_{number}.txt"] = {
+            terms[i]: count / total * idf[terms[i]] for i, count in zip(ids.tolist(), counts.tolist())
+        }
+    return articles_vectors, idf
+
+
+def synthetic_queries(
+        idf: dict[str, float],
+        count: int,
+        max_terms: int = 3,
+        seed: int = 0,
+        min_terms: int = 1
+) -> list[dict[str, float]]:
+    """Query vectors of min_terms..max_terms terms drawn from the head and the middle of the vocabulary."""
+    rng = np.random.default_rng(seed)
+    terms = list(idf)
+    head = min(len(terms), 2000)
+    queries = []
+    for _ in range(count):
+        size = int(rng.integers(min_terms, max_terms + 1))
+        picked = set()
+        while len(picked) < size:
+            picked.add(terms[int(rng.integers(0, head))])
+        queries.append({term: idf[term] / len(picked) for term in picked})
+    return queries
@@ -0,0 +1,83 @@
+"""Memory-mappable file of named 1-D arrays, shared by model.bin, positions.bin and neighbours.bin.
+
+    header      8-byte magic and the length of the JSON meta
+    meta        JSON: the format's own fields plus the offset and length of every array
+    arrays      each one starting at a 64-byte aligned offset after the meta
+
+Readers map every array with np.memmap in place, nothing is parsed but the meta.
+"""
+import json
+import os
+import struct
+from contextlib import contextmanager
+from typing import Dict, Tuple
+
+import numpy as np
+
+HEADER = struct.Struct("<8sQ")
+ALIGNMENT = 64
+
+
+def aligned(size: int) -> int:
+    return -(-size // ALIGNMENT) * ALIGNMENT
+
+
+@contextmanager
+def atomic_output(path: str):
+    """Binary file written next to the target and renamed over it once complete: processes that
+    mapped the old file keep reading it, and nobody sees a half-written one."""
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    try:
+        with open(tmp_path, "wb") as out:
+            yield out
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def write_array_file(path: str, magic: bytes, meta: Dict, arrays: Dict, dtypes: Dict[str, type]):
+    """Writes the arrays named in dtypes, converted to their dtypes; meta gets an "arrays" entry."""
+    arrays = {name: np.ascontiguousarray(arrays[name], dtype=dtype) for name, dtype in dtypes.items()}
+    meta = dict(meta, arrays={})
+    offset = 0
+    for name, array in arrays.items():
+        meta["arrays"][name] = {"offset": offset, "length": array.size}
+        offset += aligned(array.nbytes)
+
+    meta_bytes = json.dumps(meta, ensure_ascii=False).encode("utf-8")
+    data_start = aligned(HEADER.size + len(meta_bytes))
+    with atomic_output(path) as out:
+        out.write(HEADER.pack(magic, len(meta_bytes)))
+        out.write(meta_bytes)
+        for name, array in arrays.items():
+            out.seek(data_start + meta["arrays"][name]["offset"])
+            out.write(array.tobytes())
+
+
+def read_array_file(path: str, magic: bytes, dtypes: Dict[str, type], kind: str) -> Tuple[Dict, Dict[str, np.ndarray]]:
+    """Meta and the arrays of a file written by write_array_file, every non-empty array an np.memmap."""
+    with open(path, "rb") as file:
+        file_magic, meta_length = HEADER.unpack(file.read(HEADER.size))
+        if file_magic != magic:
+            raise ValueError(f"{path} is not {kind}")
+        meta = json.loads(file.read(meta_length).decode("utf-8"))
+
+    data_start = aligned(HEADER.size + meta_length)
+    arrays = {}
+    for name, dtype in dtypes.items():
+        info = meta["arrays"][name]
+        if info["length"]:
+            arrays[name] = np.memmap(path, dtype=dtype, mode="r", offset=data_start + info["offset"],
+                                     shape=(info["length"],))
+        else:
+            arrays[name] = np.zeros(0, dtype=dtype)
+    return meta, arrays
+
+
+def has_magic(path: str, magic: bytes) -> bool:
+    try:
+        with open(path, "rb") as file:
+            return file.read(len(magic)) == magic
+    except OSError:
+        return False
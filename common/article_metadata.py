@@ -0,0 +1,173 @@
+"""Article metadata (title, URL, text length, fetch time, snippet) kept in SQLite next to saved_pages.
+
+Filled by scrapper.write_page; existing pages are backfilled from the repository root with:
+
+    python -m common.article_metadata --pages scrapper/saved_pages --index scrapper/index.txt
+"""
+import argparse
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+from common.article_store import page_names
+from common.html_cleaner import CleanedPage, load_page
+
+SNIPPET_LENGTH = 300
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS articles (
+    article_id TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    title TEXT NOT NULL,
+    length INTEGER NOT NULL,
+    fetched_at REAL NOT NULL,
+    snippet TEXT NOT NULL
+)
+"""
+
+# SQLite limits the number of bound parameters of one statement.
+LOOKUP_BATCH = 500
+
+
+class ArticleMetadata(NamedTuple):
+    article_id: str
+    url: str
+    title: str
+    length: int
+    fetched_at: float
+    snippet: str
+
+
+def metadata_path(pages_dir: str) -> str:
+    """saved_pages -> articles.sqlite next to the pages directory."""
+    return os.path.join(os.path.dirname(os.path.normpath(pages_dir)), "articles.sqlite")
+
+
+def make_snippet(text: str, length: int = SNIPPET_LENGTH) -> str:
+    if len(text) <= length:
+        return text
+    cut = text.rfind(" ", 0, length)
+    return text[:cut if cut > 0 else length] + "…"
+
+
+def page_metadata(article_id: str, url: str, page: CleanedPage, fetched_at: float = None) -> ArticleMetadata:
+    return ArticleMetadata(
+        article_id=article_id,
+        url=url,
+        title=page.title,
+        length=len(page.text),
+        fetched_at=time.time() if fetched_at is None else fetched_at,
+        snippet=make_snippet(page.text),
+    )
+
+
+class MetadataStore:
+    """Article metadata table; rows are always read from the database by primary key, so articles
+    rewritten by an update are visible to the server at once.
+
+    The connection is shared by the server threads, calls to it are serialized by a lock.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.connection = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self.connection.execute(SCHEMA)
+        self.connection.commit()
+        self.lock = threading.Lock()
+
+    def put_many(self, records: Iterable[ArticleMetadata]):
+        records = list(records)
+        with self.lock:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO articles VALUES (?, ?, ?, ?, ?, ?)", records
+            )
+            self.connection.commit()
+
+    def put(self, record: ArticleMetadata):
+        self.put_many([record])
+
+    def lookup(self, article_ids: List[str]) -> Dict[str, ArticleMetadata]:
+        """Metadata of the found articles, one query per LOOKUP_BATCH ids."""
+        unique_ids = list(dict.fromkeys(article_ids))
+        rows = {}
+        with self.lock:
+            for start in range(0, len(unique_ids), LOOKUP_BATCH):
+                batch = unique_ids[start:start + LOOKUP_BATCH]
+                placeholders = ", ".join("?" * len(batch))
+                for row in self.connection.execute(
+                        f"SELECT * FROM articles WHERE article_id IN ({placeholders})", batch):
+                    rows[row[0]] = ArticleMetadata(*row)
+        return rows
+
+    def get(self, article_id: str) -> Optional[ArticleMetadata]:
+        return self.lookup([article_id]).get(article_id)
+
+    def article_ids(self) -> set:
+        with self.lock:
+            return {row[0] for row in self.connection.execute("SELECT article_id FROM articles")}
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+
+stores: Dict[str, MetadataStore] = {}
+stores_lock = threading.Lock()
+
+
+def open_store(pages_dir: str, create: bool = True) -> Optional[MetadataStore]:
+    """Per-process MetadataStore of the pages directory; None if there is no database and create=False."""
+    path = os.path.abspath(metadata_path(pages_dir))
+    with stores_lock:
+        store = stores.get(path)
+        if store is None:
+            if not create and not os.path.exists(path):
+                return None
+            store = MetadataStore(path)
+            stores[path] = store
+        return store
+
+
+def read_index_urls(index_file: str) -> Dict[str, str]:
+    """index.txt -> {article_<id>.txt: url}."""
+    urls = {}
+    if os.path.exists(index_file):
+        with open(index_file, "r", encoding="utf-8") as file:
+            for line in file:
+                parts = line.strip().split(": ", 1)
+                if len(parts) == 2:
+                    urls[f"article_{parts[1].rstrip('/').rsplit('/', 1)[-1]}.txt"] = parts[1]
+    return urls
+
+
+def backfill(pages_dir: str, index_file: str, overwrite: bool = False) -> int:
+    """Fills in the metadata of already saved pages; the fetch time is the file's mtime
+    (the current time for pages from pages.store)."""
+    store = open_store(pages_dir)
+    urls = read_index_urls(index_file)
+    known = set() if overwrite else store.article_ids()
+
+    records = []
+    for filename in page_names(pages_dir):
+        if filename in known:
+            continue
+        page_path = os.path.join(pages_dir, filename)
+        fetched_at = os.path.getmtime(page_path) if os.path.exists(page_path) else None
+        records.append(page_metadata(filename, urls.get(filename, ""), load_page(page_path), fetched_at))
+
+    store.put_many(records)
+    return len(records)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fill in the metadata of saved articles")
+    parser.add_argument("--pages", default="scrapper/saved_pages")
+    parser.add_argument("--index", default="scrapper/index.txt")
+    parser.add_argument("--overwrite", action="store_true", help="rebuild the already known articles too")
+    args = parser.parse_args()
+
+    start_time = time.perf_counter()
+    added = backfill(args.pages, args.index, args.overwrite)
+    print(f"Добавлено {added} статей в {metadata_path(args.pages)} за {time.perf_counter() - start_time:.2f} сек.")
@@ -0,0 +1,430 @@
+"""Packed article store: append-only gzip segments plus an offset log, next to saved_pages.
+
+    scrapper/pages.store/segment_000000.gz   records appended one after another
+    scrapper/pages.store/index.tsv           name, segment, offset, length, size, sha1 per record
+
+Every record is a complete gzip member, so a segment is itself a valid .gz file and a record can be
+sent to an HTTP client as is with Content-Encoding: gzip. A rewritten article is appended again and
+the later index line wins; compact() drops the superseded records. Loose files in saved_pages are
+still read, page_names/read_page/page_digests see the union of both. Loose pages are packed with:
+
+    python -m common.article_store --pages scrapper/saved_pages [--remove]
+"""
+import argparse
+import hashlib
+import os
+import threading
+import time
+import zlib
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+INDEX_FILE = "index.tsv"
+SEGMENT_TEMPLATE = "segment_{:06d}.gz"
+# A new segment is started once the current one grows past this size.
+SEGMENT_BYTES = 256 * 2 ** 20
+COMPRESSION_LEVEL = 6
+# wbits for a gzip header and trailer around the deflate stream
+GZIP_WBITS = 16 + zlib.MAX_WBITS
+DELETED = -1
+
+
+class RecordLocation(NamedTuple):
+    segment: int
+    offset: int
+    length: int
+    size: int
+    sha1: str
+
+
+def index_line(name: str, location: RecordLocation) -> str:
+    return f"{name}\t{location.segment}\t{location.offset}\t{location.length}\t{location.size}\t{location.sha1}\n"
+
+
+def gzip_record(data: bytes, level: int = COMPRESSION_LEVEL) -> bytes:
+    compressor = zlib.compressobj(level, zlib.DEFLATED, GZIP_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+def gunzip_record(record: bytes) -> bytes:
+    return zlib.decompress(record, GZIP_WBITS)
+
+
+class ArticleStore:
+    """Random access by article name and sequential iteration over the packed records.
+
+    Reads use os.pread, so one store can be shared by the server threads and by forked workers.
+    Writes are serialized by a lock; a reader notices appended records by the size of index.tsv.
+    Descriptors of segments that are no longer referenced (after compact() here or in another process)
+    are retired under the lock and closed once no pread is in flight.
+    """
+
+    def __init__(self, path: str, create: bool = False):
+        self.path = path
+        if create:
+            os.makedirs(path, exist_ok=True)
+        elif not os.path.isdir(path):
+            raise FileNotFoundError(path)
+
+        self.lock = threading.Lock()
+        self.locations: Dict[str, RecordLocation] = {}
+        self.index_position = 0
+        self.index_identity = None
+        self.segment_fds: Dict[int, int] = {}
+        self.retired_fds: List[int] = []
+        self.active_reads = 0
+        self.refresh()
+
+    def index_path(self) -> str:
+        return os.path.join(self.path, INDEX_FILE)
+
+    def segment_path(self, segment: int) -> str:
+        return os.path.join(self.path, SEGMENT_TEMPLATE.format(segment))
+
+    def refresh(self):
+        """Reads the index lines appended since the last call; rereads everything after compact()."""
+        try:
+            stat = os.stat(self.index_path())
+        except FileNotFoundError:
+            return
+        with self.lock:
+            identity = (stat.st_dev, stat.st_ino)
+            reread = identity != self.index_identity or stat.st_size < self.index_position
+            if reread:
+                self.locations.clear()
+                self.index_position = 0
+                self.index_identity = identity
+            if stat.st_size > self.index_position:
+                self.read_index(stat.st_size)
+            if reread:
+                # compact() wrote new segment numbers, the old segments are gone
+                live = {location.segment for location in self.locations.values()}
+                self.retire_segments([segment for segment in self.segment_fds if segment not in live])
+
+    def read_index(self, end: int):
+        """Applies the index lines between index_position and end. Called under the lock."""
+        with open(self.index_path(), "rb") as file:
+            file.seek(self.index_position)
+            data = file.read(end - self.index_position)
+        # a line without its newline is still being written
+        complete = data[:data.rfind(b"\n") + 1]
+        for line in complete.decode("utf-8").splitlines():
+            name, segment, offset, length, size, sha1 = line.split("\t")
+            if int(segment) == DELETED:
+                self.locations.pop(name, None)
+            else:
+                self.locations[name] = RecordLocation(int(segment), int(offset), int(length), int(size), sha1)
+        self.index_position += len(complete)
+
+    def retire_segments(self, segments: List[int]):
+        """Takes the descriptors out of use; they are closed when the last pread on them returns.
+        Called under the lock."""
+        for segment in segments:
+            self.retired_fds.append(self.segment_fds.pop(segment))
+        self.close_retired()
+
+    def close_retired(self):
+        if self.active_reads == 0:
+            for fd in self.retired_fds:
+                os.close(fd)
+            self.retired_fds.clear()
+
+    def close_segments(self):
+        self.retire_segments(list(self.segment_fds))
+
+    def segment_fd(self, segment: int) -> int:
+        """Called under the lock."""
+        fd = self.segment_fds.get(segment)
+        if fd is None:
+            fd = self.segment_fds[segment] = os.open(self.segment_path(segment), os.O_RDONLY)
+        return fd
+
+    def location(self, name: str) -> Optional[RecordLocation]:
+        # one stat of index.tsv: rewritten articles and compaction by the writer are picked up at once
+        self.refresh()
+        return self.locations.get(name)
+
+    def get_compressed(self, name: str) -> Optional[bytes]:
+        """The gzip member of the article, ready to be sent with Content-Encoding: gzip."""
+        self.refresh()
+        with self.lock:
+            location = self.locations.get(name)
+            if location is None:
+                return None
+            fd = self.segment_fd(location.segment)
+            self.active_reads += 1
+        try:
+            # outside the lock: a retired descriptor is not closed until active_reads drops to zero
+            return os.pread(fd, location.length, location.offset)
+        finally:
+            with self.lock:
+                self.active_reads -= 1
+                self.close_retired()
+
+    def get(self, name: str) -> Optional[bytes]:
+        record = self.get_compressed(name)
+        return gunzip_record(record) if record is not None else None
+
+    def get_text(self, name: str) -> Optional[str]:
+        data = self.get(name)
+        return data.decode("utf-8") if data is not None else None
+
+    def digest(self, name: str) -> Optional[str]:
+        """SHA-1 of the uncompressed article, the same value pipeline.manifest.file_hash gives for a file."""
+        location = self.location(name)
+        return location.sha1 if location else None
+
+    def names(self) -> List[str]:
+        self.refresh()
+        return sorted(self.locations)
+
+    def digests(self) -> Dict[str, str]:
+        self.refresh()
+        return {name: location.sha1 for name, location in self.locations.items()}
+
+    def __contains__(self, name: str) -> bool:
+        return self.location(name) is not None
+
+    def __len__(self) -> int:
+        self.refresh()
+        return len(self.locations)
+
+    def items(self) -> Iterator[Tuple[str, bytes]]:
+        """Live records in the order they were written: one sequential pass over every segment.
+
+        Segments are opened by path, so the iteration must not overlap compact()."""
+        self.refresh()
+        ordered = sorted(self.locations.items(), key=lambda item: (item[1].segment, item[1].offset))
+        segment, file = None, None
+        try:
+            for name, location in ordered:
+                if location.segment != segment:
+                    if file is not None:
+                        file.close()
+                    segment, file = location.segment, open(self.segment_path(location.segment), "rb")
+                file.seek(location.offset)
+                yield name, gunzip_record(file.read(location.length))
+        finally:
+            if file is not None:
+                file.close()
+
+    def append_index(self, lines: List[str]):
+        with open(self.index_path(), "a", encoding="utf-8") as index:
+            index.write("".join(lines))
+        stat = os.stat(self.index_path())
+        self.index_identity = (stat.st_dev, stat.st_ino)
+        self.index_position = stat.st_size
+
+    def segments(self) -> List[int]:
+        return sorted(int(name[8:14]) for name in os.listdir(self.path) if name.startswith("segment_"))
+
+    def last_segment(self) -> int:
+        return max(self.segments(), default=0)
+
+    def put_many(self, records: List[Tuple[str, bytes]]):
+        """Appends the records to the last segment, then their index lines."""
+        self.refresh()
+        with self.lock:
+            segment = self.last_segment()
+            path = self.segment_path(segment)
+            offset = os.path.getsize(path) if os.path.exists(path) else 0
+            lines = []
+            out = open(path, "ab")
+            try:
+                for name, data in records:
+                    if offset >= SEGMENT_BYTES:
+                        out.close()
+                        segment, offset = segment + 1, 0
+                        out = open(self.segment_path(segment), "ab")
+                    record = gzip_record(data)
+                    out.write(record)
+                    location = RecordLocation(segment, offset, len(record), len(data), hashlib.sha1(data).hexdigest())
+                    lines.append(index_line(name, location))
+                    self.locations[name] = location
+                    offset += len(record)
+            finally:
+                out.close()
+            # the records are on disk before the index points to them
+            self.append_index(lines)
+
+    def put(self, name: str, data: bytes):
+        self.put_many([(name, data)])
+
+    def put_text(self, name: str, text: str):
+        self.put(name, text.encode("utf-8"))
+
+    def delete(self, name: str):
+        self.refresh()
+        with self.lock:
+            if self.locations.pop(name, None) is not None:
+                self.append_index([f"{name}\t{DELETED}\t0\t0\t0\t\n"])
+
+    def compact(self) -> int:
+        """Copies the live records into fresh segments and drops the old ones; returns bytes freed.
+
+        get()/get_compressed() in this process may run alongside: they hold the lock while picking a
+        descriptor, and the old descriptors are closed only after their reads return. items() and
+        readers in other processes may not: a location read just before os.replace points to a segment
+        that is removed here, so compact the store of a running server only when nothing else reads it."""
+        self.refresh()
+        with self.lock:
+            before = self.disk_bytes()
+            old_segments = self.segments()
+            segment, offset = self.last_segment() + 1, 0
+            out = open(self.segment_path(segment), "wb")
+            lines, locations = [], {}
+            for name, location in sorted(self.locations.items(), key=lambda item: (item[1].segment, item[1].offset)):
+                if offset >= SEGMENT_BYTES:
+                    out.close()
+                    segment, offset = segment + 1, 0
+                    out = open(self.segment_path(segment), "wb")
+                out.write(os.pread(self.segment_fd(location.segment), location.length, location.offset))
+                locations[name] = RecordLocation(segment, offset, *location[2:])
+                lines.append(index_line(name, locations[name]))
+                offset += location.length
+            out.close()
+
+            temp_index = f"{self.index_path()}.tmp{os.getpid()}"
+            with open(temp_index, "w", encoding="utf-8") as index:
+                index.write("".join(lines))
+            os.replace(temp_index, self.index_path())
+
+            self.close_segments()
+            for old in old_segments:
+                os.remove(self.segment_path(old))
+            self.locations = locations
+            stat = os.stat(self.index_path())
+            self.index_identity = (stat.st_dev, stat.st_ino)
+            self.index_position = stat.st_size
+            return before - self.disk_bytes()
+
+    def disk_bytes(self) -> int:
+        """Bytes allocated on disk by the segments and the index."""
+        return sum(os.stat(os.path.join(self.path, name)).st_blocks * 512 for name in os.listdir(self.path))
+
+    def stats(self) -> Dict[str, int]:
+        self.refresh()
+        return {
+            "articles": len(self.locations),
+            "raw_bytes": sum(location.size for location in self.locations.values()),
+            "compressed_bytes": sum(location.length for location in self.locations.values()),
+            "disk_bytes": self.disk_bytes(),
+        }
+
+    def close(self):
+        with self.lock:
+            self.close_segments()
+
+
+def store_path(pages_dir: str) -> str:
+    """saved_pages -> pages.store next to the pages directory."""
+    return os.path.join(os.path.dirname(os.path.normpath(pages_dir)), "pages.store")
+
+
+def extracted_store_path(pages_dir: str) -> str:
+    """saved_pages -> extracted.store: title and text of the packed pages (see html_cleaner)."""
+    return os.path.join(os.path.dirname(os.path.normpath(pages_dir)), "extracted.store")
+
+
+stores: Dict[str, ArticleStore] = {}
+stores_lock = threading.Lock()
+
+
+def open_article_store(path: str, create: bool = False) -> Optional[ArticleStore]:
+    """The ArticleStore shared by the process; None if the store does not exist and create=False."""
+    path = os.path.abspath(path)
+    with stores_lock:
+        store = stores.get(path)
+        if store is None:
+            if not create and not os.path.isdir(path):
+                return None
+            store = stores[path] = ArticleStore(path, create=create)
+        return store
+
+
+def loose_pages(pages_dir: str) -> List[str]:
+    return os.listdir(pages_dir) if os.path.isdir(pages_dir) else []
+
+
+def page_names(pages_dir: str) -> List[str]:
+    """Names of all articles: loose files in saved_pages and pages.store records."""
+    store = open_article_store(store_path(pages_dir))
+    names = set(loose_pages(pages_dir))
+    if store is not None:
+        names.update(store.names())
+    return sorted(names)
+
+
+def read_page(pages_dir: str, name: str) -> str:
+    """HTML of the article: from the loose file if there is one, otherwise from pages.store."""
+    page_path = os.path.join(pages_dir, name)
+    if os.path.exists(page_path):
+        with open(page_path, "r", encoding="utf-8") as file:
+            return file.read()
+    store = open_article_store(store_path(pages_dir))
+    text = store.get_text(name) if store is not None else None
+    if text is None:
+        raise FileNotFoundError(page_path)
+    return text
+
+
+def page_digests(pages_dir: str) -> Dict[str, str]:
+    """SHA-1 of every article, a loose file wins over its packed record as in read_page; packed
+    articles take it from the store index without decompressing."""
+    store = open_article_store(store_path(pages_dir))
+    digests = store.digests() if store is not None else {}
+    for name in loose_pages(pages_dir):
+        with open(os.path.join(pages_dir, name), "rb") as file:
+            digests[name] = hashlib.sha1(file.read()).hexdigest()
+    return digests
+
+
+def pack_pages(pages_dir: str, remove: bool = False, batch: int = 1000) -> int:
+    """Moves the loose saved_pages files (and extracted) into pages.store and extracted.store."""
+    pages_store = open_article_store(store_path(pages_dir), create=True)
+    extracted_store = open_article_store(extracted_store_path(pages_dir), create=True)
+    extracted_dir = os.path.join(os.path.dirname(os.path.normpath(pages_dir)), "extracted")
+
+    names = sorted(loose_pages(pages_dir))
+    for start in range(0, len(names), batch):
+        chunk = names[start:start + batch]
+        pages, extracted, packed_files = [], [], []
+        for name in chunk:
+            page_path = os.path.join(pages_dir, name)
+            with open(page_path, "rb") as file:
+                pages.append((name, file.read()))
+            packed_files.append(page_path)
+
+            extracted_file = os.path.join(extracted_dir, f"{os.path.splitext(name)[0]}.json")
+            if os.path.exists(extracted_file):
+                with open(extracted_file, "rb") as file:
+                    extracted.append((name, file.read()))
+                packed_files.append(extracted_file)
+
+        pages_store.put_many(pages)
+        if extracted:
+            extracted_store.put_many(extracted)
+        if remove:
+            for path in packed_files:
+                os.remove(path)
+    return len(names)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pack saved articles into pages.store")
+    parser.add_argument("--pages", default="scrapper/saved_pages")
+    parser.add_argument("--remove", action="store_true", help="remove the packed files")
+    parser.add_argument("--compact", action="store_true", help="drop superseded versions of articles")
+    args = parser.parse_args()
+
+    start_time = time.perf_counter()
+    packed = pack_pages(args.pages, args.remove)
+    print(f"Упаковано {packed} статей в {store_path(args.pages)} за {time.perf_counter() - start_time:.2f} сек.")
+    if args.compact:
+        for path in (store_path(args.pages), extracted_store_path(args.pages)):
+            freed = open_article_store(path, create=True).compact()
+            print(f"{path}: освобождено {freed / 2 ** 20:.1f} МБ")
+    stats = open_article_store(store_path(args.pages), create=True).stats()
+    print(
+        f"{stats['articles']} статей: {stats['raw_bytes'] / 2 ** 20:.1f} МБ HTML, "
+        f"{stats['disk_bytes'] / 2 ** 20:.1f} МБ на диске"
+    )
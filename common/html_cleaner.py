@@ -0,0 +1,170 @@
+import json
+import os
+from html import unescape
+from html.parser import HTMLParser
+from typing import NamedTuple
+
+from common.article_store import extracted_store_path, open_article_store, read_page
+
+DROPPED_TAGS = ("script", "style", "link", "meta")
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+
+NO_TITLE = "Без заголовка"
+
+
+class CleanedPage(NamedTuple):
+    title: str
+    text: str
+    html: str
+
+
+class StreamingCleaner(HTMLParser):
+    """One pass over the HTML: strips tags and collects the title, the text and the cleaned HTML."""
+
+    def __init__(self, dropped_tags=DROPPED_TAGS):
+        super().__init__(convert_charrefs=False)
+        self.dropped_tags = set(dropped_tags)
+        self.skip_depth = 0
+
+        self.html_parts = []
+        self.text_parts = []
+        self.text_run = []
+
+        self.title = None
+        self.title_parts = None
+
+    def handle_starttag(self, tag, attrs):
+        self.flush_text()
+        if self.skip_depth or tag in self.dropped_tags:
+            if tag not in VOID_TAGS:
+                self.skip_depth += 1
+            return
+
+        self.html_parts.append(self.get_starttag_text())
+        if tag == "title" and self.title is None and self.title_parts is None:
+            self.title_parts = []
+
+    def handle_startendtag(self, tag, attrs):
+        self.flush_text()
+        if not self.skip_depth and tag not in self.dropped_tags:
+            self.html_parts.append(self.get_starttag_text())
+
+    def handle_endtag(self, tag):
+        self.flush_text()
+        if self.skip_depth:
+            if tag not in VOID_TAGS:
+                self.skip_depth -= 1
+            return
+        if tag in self.dropped_tags:
+            return
+
+        self.html_parts.append(f"</{tag}>")
+        if tag == "title" and self.title_parts is not None and self.title is None:
+            self.title = "".join(self.title_parts).strip()
+
+    def handle_data(self, data):
+        if self.skip_depth:
+            return
+        self.html_parts.append(data)
+        self.add_text(data)
+
+    def handle_entityref(self, name):
+        if self.skip_depth:
+            return
+        self.html_parts.append(f"&{name};")
+        self.add_text(unescape(f"&{name};"))
+
+    def handle_charref(self, name):
+        if self.skip_depth:
+            return
+        self.html_parts.append(f"&#{name};")
+        self.add_text(unescape(f"&#{name};"))
+
+    def handle_comment(self, data):
+        self.flush_text()
+        if not self.skip_depth:
+            self.html_parts.append(f"<!--{data}-->")
+
+    def handle_decl(self, decl):
+        self.flush_text()
+        self.html_parts.append(f"<!{decl}>")
+
+    def handle_pi(self, data):
+        self.flush_text()
+        self.html_parts.append(f"<?{data}>")
+
+    def unknown_decl(self, data):
+        self.flush_text()
+        self.html_parts.append(f"<![{data}]>")
+
+    def add_text(self, text):
+        self.text_run.append(text)
+        if self.title_parts is not None and self.title is None:
+            self.title_parts.append(text)
+
+    def flush_text(self):
+        """Adjacent pieces of text between tags make up one string, as in BeautifulSoup."""
+        if not self.text_run:
+            return
+        text = "".join(self.text_run).strip()
+        if text:
+            self.text_parts.append(text)
+        self.text_run = []
+
+    def result(self) -> CleanedPage:
+        self.close()
+        self.flush_text()
+        return CleanedPage(
+            title=self.title or NO_TITLE,
+            text=" ".join(self.text_parts),
+            html="".join(self.html_parts),
+        )
+
+
+def clean_html(html: str, dropped_tags=DROPPED_TAGS) -> CleanedPage:
+    cleaner = StreamingCleaner(dropped_tags)
+    cleaner.feed(html)
+    return cleaner.result()
+
+
+def extracted_path(page_path: str) -> str:
+    """saved_pages/article_N.txt -> extracted/article_N.json next to the pages directory."""
+    pages_dir, filename = os.path.split(os.path.normpath(page_path))
+    stem = os.path.splitext(filename)[0]
+    return os.path.join(os.path.dirname(pages_dir), "extracted", f"{stem}.json")
+
+
+def write_extracted(page_path: str, page: CleanedPage, packed: bool = False):
+    """extracted/article_N.json or, for pages from pages.store, a record in extracted.store."""
+    data = {"title": page.title, "text": page.text}
+    if packed:
+        pages_dir, filename = os.path.split(os.path.normpath(page_path))
+        store = open_article_store(extracted_store_path(pages_dir), create=True)
+        store.put_text(filename, json.dumps(data, ensure_ascii=False))
+        return
+
+    path = extracted_path(page_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(data, file, ensure_ascii=False)
+
+
+def load_page(page_path: str) -> CleanedPage:
+    """Title and text of a page from extracted (the file or extracted.store), else one pass over the HTML.
+
+    The HTML is read from saved_pages or, when there is no file, from pages.store.
+    """
+    path = extracted_path(page_path)
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as file:
+            data = json.load(file)
+        return CleanedPage(title=data["title"], text=data["text"], html="")
+
+    pages_dir, filename = os.path.split(os.path.normpath(page_path))
+    store = open_article_store(extracted_store_path(pages_dir))
+    extracted = store.get(filename) if store is not None else None
+    if extracted is not None:
+        data = json.loads(extracted)
+        return CleanedPage(title=data["title"], text=data["text"], html="")
+
+    return clean_html(read_page(pages_dir, filename))
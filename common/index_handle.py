@@ -0,0 +1,139 @@
+import os
+import threading
+import time
+import weakref
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+Signature = Tuple[Tuple[str, int, int], ...]
+
+
+def source_signature(paths: List[str]) -> Signature:
+    """(path, mtime_ns, size) of every source file; a directory counts as its newest file and file count."""
+    signature = []
+    for path in paths:
+        if os.path.isdir(path):
+            newest = count = 0
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    newest = max(newest, entry.stat().st_mtime_ns)
+                    count += 1
+            signature.append((path, newest, count))
+        elif os.path.exists(path):
+            stat = os.stat(path)
+            signature.append((path, stat.st_mtime_ns, stat.st_size))
+        else:
+            signature.append((path, 0, -1))
+    return tuple(signature)
+
+
+class IndexVersion:
+    """One loaded generation of the search indexes.
+
+    Requests keep a reference to the version itself until they finish: retired versions are tracked by
+    weak references to it, so holding only version.index would report the version as released.
+    """
+
+    def __init__(self, number: int, index: Any, signature: Signature, load_seconds: float):
+        self.number = number
+        self.index = index
+        self.signature = signature
+        self.load_seconds = load_seconds
+        self.loaded_at = time.time()
+
+
+class IndexHandle:
+    """Versioned reference to the search indexes with background reload.
+
+    A request reads handle.current once and works with that version to the end. A reload builds the
+    new version on a background thread and swaps the reference under a lock, so requests never wait
+    for loading; the old version is freed once the last request holding it finishes. Retired
+    versions are tracked through weak references only, to report the ones still in use.
+    """
+
+    def __init__(self, loader: Callable[[], Any], sources: List[str], poll_interval: float = 2.0):
+        self.loader = loader
+        self.sources = sources
+        self.poll_interval = poll_interval
+
+        self.lock = threading.Lock()
+        self.reload_lock = threading.Lock()
+        self.retired: List[weakref.ref] = []
+        self.reloads = 0
+        self.failed_reloads = 0
+        self.last_error: Optional[str] = None
+        self.watcher: Optional[threading.Thread] = None
+        self.stopped = threading.Event()
+
+        self.current = self.load(1)
+
+    def load(self, number: int) -> IndexVersion:
+        signature = source_signature(self.sources)
+        start = time.perf_counter()
+        index = self.loader()
+        return IndexVersion(number, index, signature, time.perf_counter() - start)
+
+    def reload(self) -> bool:
+        """Loads a new version and swaps it in; False if another reload is running or loading failed."""
+        if not self.reload_lock.acquire(blocking=False):
+            return False
+        try:
+            try:
+                version = self.load(self.current.number + 1)
+            except Exception as e:
+                self.failed_reloads += 1
+                self.last_error = f"{type(e).__name__}: {e}"
+                return False
+
+            with self.lock:
+                previous, self.current = self.current, version
+                self.retired = [ref for ref in self.retired if ref() is not None]
+                self.retired.append(weakref.ref(previous))
+                self.reloads += 1
+                self.last_error = None
+            return True
+        finally:
+            self.reload_lock.release()
+
+    def reload_async(self) -> threading.Thread:
+        thread = threading.Thread(target=self.reload, name="index-reload", daemon=True)
+        thread.start()
+        return thread
+
+    def watch(self):
+        """Polls the sources and reloads once their signature has changed and stayed the same for one poll,
+        so files that are still being written are not picked up."""
+        pending = None
+        while not self.stopped.wait(self.poll_interval):
+            signature = source_signature(self.sources)
+            if signature == self.current.signature:
+                pending = None
+            elif signature == pending:
+                self.reload()
+                pending = None
+            else:
+                pending = signature
+
+    def start_watching(self):
+        if self.watcher is None or not self.watcher.is_alive():
+            self.stopped.clear()
+            self.watcher = threading.Thread(target=self.watch, name="index-watcher", daemon=True)
+            self.watcher.start()
+
+    def stop_watching(self):
+        self.stopped.set()
+
+    def status(self) -> Dict[str, Any]:
+        with self.lock:
+            current = self.current
+            retired_alive = [ref().number for ref in self.retired if ref() is not None]
+        return {
+            "version": current.number,
+            "loaded_at": current.loaded_at,
+            "reload_seconds": current.load_seconds,
+            "reloads": self.reloads,
+            "failed_reloads": self.failed_reloads,
+            "last_error": self.last_error,
+            "retired_versions_in_use": retired_alive,
+            "watching": self.watcher is not None and self.watcher.is_alive(),
+            "sources": {path: {"mtime_ns": mtime, "size": size} for path, mtime, size in current.signature},
+        }
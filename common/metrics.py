@@ -0,0 +1,141 @@
+"""Lightweight timings and counters for the batch stages and the search server.
+
+    with metrics.span("search.score"):
+        ...
+    metrics.count("scrape.pages_saved")
+
+Spans are measured with perf_counter_ns into fixed log-scale histograms. The registry renders
+Prometheus text (demo/server.py /metrics) and a JSON summary printed at the end of batch scripts.
+Process pools merge the workers' registries with drain()/merge().
+"""
+import bisect
+import contextlib
+import json
+import threading
+import time
+from typing import Dict, List
+
+# Upper bounds of the histogram buckets in seconds: 1-2.5-5 steps from 1 us to 100 s.
+BUCKETS = [m * 10.0 ** e for e in range(-6, 2) for m in (1, 2.5, 5)] + [100.0]
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+
+    def observe_ns(self, duration_ns: int):
+        self.counts[bisect.bisect_left(BUCKETS, duration_ns / 1e9)] += 1
+        self.count += 1
+        self.total_ns += duration_ns
+        self.max_ns = max(self.max_ns, duration_ns)
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-quantile, in seconds."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, bucket_count in zip(BUCKETS, self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                return bound
+        return self.max_ns / 1e9
+
+    def to_dict(self) -> dict:
+        return {"counts": self.counts, "count": self.count, "total_ns": self.total_ns, "max_ns": self.max_ns}
+
+    def merge(self, data: dict):
+        self.counts = [a + b for a, b in zip(self.counts, data["counts"])]
+        self.count += data["count"]
+        self.total_ns += data["total_ns"]
+        self.max_ns = max(self.max_ns, data["max_ns"])
+
+
+class Metrics:
+    def __init__(self):
+        self.histograms: Dict[str, Histogram] = {}
+        self.counters: Dict[str, int] = {}
+        self.lock = threading.Lock()
+
+    def observe_ns(self, name: str, duration_ns: int):
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe_ns(duration_ns)
+
+    @contextlib.contextmanager
+    def span(self, name: str):
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.observe_ns(name, time.perf_counter_ns() - start)
+
+    def count(self, name: str, value: int = 1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def drain(self) -> dict:
+        """Snapshot of everything recorded so far, then reset: a pool worker returns it with its result."""
+        with self.lock:
+            snapshot = {
+                "histograms": {name: histogram.to_dict() for name, histogram in self.histograms.items()},
+                "counters": dict(self.counters),
+            }
+            self.histograms.clear()
+            self.counters.clear()
+        return snapshot
+
+    def merge(self, snapshot: dict):
+        with self.lock:
+            for name, data in snapshot["histograms"].items():
+                self.histograms.setdefault(name, Histogram()).merge(data)
+            for name, value in snapshot["counters"].items():
+                self.counters[name] = self.counters.get(name, 0) + value
+
+    def summary(self) -> dict:
+        with self.lock:
+            spans = {
+                name: {
+                    "count": histogram.count,
+                    "total_ms": histogram.total_ns / 1e6,
+                    "mean_ms": histogram.total_ns / histogram.count / 1e6,
+                    "p50_ms": histogram.quantile(0.5) * 1000,
+                    "p99_ms": histogram.quantile(0.99) * 1000,
+                    "max_ms": histogram.max_ns / 1e6,
+                }
+                for name, histogram in sorted(self.histograms.items())
+            }
+            return {"spans": spans, "counters": dict(sorted(self.counters.items()))}
+
+    def summary_json(self) -> str:
+        return json.dumps(self.summary(), ensure_ascii=False, indent=2)
+
+    def render_prometheus(self, labels: Dict[str, str] = None) -> str:
+        extra = "".join(f',{key}="{value}"' for key, value in (labels or {}).items())
+        lines: List[str] = [
+            "# HELP stage_duration_seconds Duration of instrumented stages.",
+            "# TYPE stage_duration_seconds histogram",
+        ]
+        with self.lock:
+            for name, histogram in sorted(self.histograms.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(BUCKETS, histogram.counts):
+                    cumulative += bucket_count
+                    lines.append(f'stage_duration_seconds_bucket{{stage="{name}"{extra},le="{bound:g}"}} {cumulative}')
+                lines.append(f'stage_duration_seconds_bucket{{stage="{name}"{extra},le="+Inf"}} {histogram.count}')
+                lines.append(f'stage_duration_seconds_sum{{stage="{name}"{extra}}} {histogram.total_ns / 1e9:.9f}')
+                lines.append(f'stage_duration_seconds_count{{stage="{name}"{extra}}} {histogram.count}')
+
+            lines.append("# HELP events_total Counters of processed items and outcomes.")
+            lines.append("# TYPE events_total counter")
+            for name, value in sorted(self.counters.items()):
+                lines.append(f'events_total{{name="{name}"{extra}}} {value}')
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
@@ -0,0 +1,79 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Tuple
+
+
+class QueryCache:
+    """LRU cache with optional TTL and hit/miss/eviction counters.
+
+    A cache belongs to the one index or model it is filled from: whoever loads an index creates its
+    caches next to it, so a reloaded index starts with empty caches and requests still running on the
+    previous one keep filling the previous caches. Values are shared between requests and must be
+    immutable (tuples, see freeze_rows).
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, value = entry
+            if expires_at is not None and expires_at < time.monotonic():
+                del self.entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self.lock:
+            self.entries[key] = (expires_at, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self.entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+def freeze_rows(rows: List[Dict[str, Any]]) -> Tuple[Tuple[Tuple[str, Any], ...], ...]:
+    """Result rows as nested tuples for the cache."""
+    return tuple(tuple(row.items()) for row in rows)
+
+
+def thaw_rows(rows: Tuple[Tuple[Tuple[str, Any], ...], ...]) -> List[Dict[str, Any]]:
+    """Fresh result rows of a cached value: a caller changing them does not change the cache."""
+    return [dict(row) for row in rows]
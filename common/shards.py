@@ -0,0 +1,113 @@
+"""Document-partitioned shards of the search indexes, served by vector_search/sharded_search.py.
+
+    shards/manifest.json               shard directories and the first document number of each
+    shards/shard_00/model.bin          TF-IDF model rows of the shard's documents, global IDF
+    shards/shard_00/rows.npy           row of every shard document in the full model.bin
+    shards/shard_00/inverted_index.bin postings restricted to the shard's documents
+    shards/shard_00/positions.bin      positional index of the shard's documents, if there is one
+
+Documents are split into ranges of article numbers with the same number of documents each, so
+every structure is cut at the same boundaries. Written from the repository root with:
+
+    python -m common.shards --shards 4
+"""
+import argparse
+import json
+import os
+import time
+from bisect import bisect_left
+from typing import Dict, List
+
+import numpy as np
+
+from common.tfidf_model import TfIdfModel, write_model_rows
+from inverted_index.binary_index import BinaryIndex, write_binary_index
+from inverted_index.indexer import document_number, read_index_file
+from inverted_index.positional_index import load_positional_index, write_positional_slice
+
+MANIFEST_FILE = "manifest.json"
+MODEL_FILE = "model.bin"
+ROWS_FILE = "rows.npy"
+INDEX_FILE = "inverted_index.bin"
+POSITIONS_FILE = "positions.bin"
+
+
+def shard_starts(doc_numbers: List[int], shards: int) -> List[int]:
+    """First article number of every shard but the first one; shard i holds [starts[i-1], starts[i])."""
+    numbers = sorted(doc_numbers)
+    return [numbers[shard * len(numbers) // shards] for shard in range(1, shards)]
+
+
+def split_postings(postings: List[int], starts: List[int]) -> List[List[int]]:
+    bounds = [0] + [bisect_left(postings, start) for start in starts] + [len(postings)]
+    return [postings[bounds[shard]:bounds[shard + 1]] for shard in range(len(bounds) - 1)]
+
+
+def write_shards(model_file: str, index_file: str, positions_file: str, output_dir: str, shards: int) -> Dict:
+    """Cuts the model, the inverted index and the positional index into shards; returns the manifest."""
+    model = TfIdfModel(model_file)
+    doc_numbers = np.array([document_number(article_id) for article_id in model.article_ids], dtype=np.int64)
+    starts = shard_starts(doc_numbers.tolist(), shards)
+    shard_of_row = np.searchsorted(np.array(starts, dtype=np.int64), doc_numbers, side="right")
+
+    if index_file.endswith(".bin"):
+        index = BinaryIndex(index_file)
+        shard_indexes = [{} for _ in range(shards)]
+        for position, term in enumerate(index):
+            for shard, postings in enumerate(split_postings(index.postings_at(position), starts)):
+                if postings:
+                    shard_indexes[shard][term] = postings
+    else:
+        shard_indexes = [{} for _ in range(shards)]
+        for term, doc_ids in read_index_file(index_file).items():
+            for shard, postings in enumerate(split_postings(sorted(doc_ids), starts)):
+                if postings:
+                    shard_indexes[shard][term] = postings
+
+    positional_index = load_positional_index(positions_file)
+    manifest = {"starts": starts, "total_docs": len(model.article_ids), "shards": []}
+    for shard in range(shards):
+        shard_dir = os.path.join(output_dir, f"shard_{shard:02d}")
+        os.makedirs(shard_dir, exist_ok=True)
+
+        rows = np.flatnonzero(shard_of_row == shard)
+        write_model_rows(model, rows, os.path.join(shard_dir, MODEL_FILE))
+        np.save(os.path.join(shard_dir, ROWS_FILE), rows.astype(np.int64))
+        write_binary_index(shard_indexes[shard], os.path.join(shard_dir, INDEX_FILE))
+
+        shard_positions = os.path.join(shard_dir, POSITIONS_FILE)
+        if positional_index is not None:
+            first = bisect_left(positional_index.doc_numbers, starts[shard - 1]) if shard else 0
+            last = bisect_left(positional_index.doc_numbers, starts[shard]) if shard < len(starts) \
+                else len(positional_index.doc_numbers)
+            write_positional_slice(positional_index, first, last, shard_positions)
+        elif os.path.exists(shard_positions):
+            os.remove(shard_positions)
+
+        manifest["shards"].append({"dir": os.path.basename(shard_dir), "docs": len(rows)})
+
+    with open(os.path.join(output_dir, MANIFEST_FILE), "w", encoding="utf-8") as file:
+        json.dump(manifest, file, indent=1)
+    return manifest
+
+
+def shard_dirs(shards_dir: str) -> List[str]:
+    with open(os.path.join(shards_dir, MANIFEST_FILE), "r", encoding="utf-8") as file:
+        manifest = json.load(file)
+    return [os.path.join(shards_dir, shard["dir"]) for shard in manifest["shards"]]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Split the search indexes into document-partitioned shards")
+    parser.add_argument("--shards", type=int, default=os.cpu_count())
+    parser.add_argument("--model", default="tf_idf/model.bin")
+    parser.add_argument("--index", default="inverted_index/inverted_index.bin")
+    parser.add_argument("--positions", default="inverted_index/positions.bin")
+    parser.add_argument("--output", default="shards")
+    args = parser.parse_args()
+
+    start_time = time.perf_counter()
+    os.makedirs(args.output, exist_ok=True)
+    result = write_shards(args.model, args.index, args.positions, args.output, args.shards)
+    sizes = ", ".join(str(shard["docs"]) for shard in result["shards"])
+    print(f"{result['total_docs']} documents in {args.shards} shards ({sizes}) in {time.perf_counter() - start_time:.2f} s")
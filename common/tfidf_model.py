@@ -0,0 +1,156 @@
+import os
+from typing import Dict, List
+
+import numpy as np
+
+from common.array_file import has_magic, read_array_file, write_array_file
+
+MAGIC = b"TFIDFM01"
+
+# name -> dtype of every array stored in the model file
+ARRAYS = {
+    "idf": np.float32,
+    "doc_indptr": np.int32,
+    "doc_indices": np.int32,
+    "doc_data": np.float32,
+    "term_indptr": np.int32,
+    "term_indices": np.int32,
+    "term_data": np.float32,
+    "norms": np.float32,
+}
+
+
+def write_model(
+        path: str,
+        article_ids: List[str],
+        vocabulary: List[str],
+        idf: np.ndarray,
+        indptr: np.ndarray,
+        indices: np.ndarray,
+        data: np.ndarray
+):
+    """Writes a TF-IDF model: vocabulary, IDF array, float32 CSR weights and document norms.
+
+    The doc-major CSR is also stored transposed (term-major), so postings of a term can be read
+    from the mapped file without building anything at load.
+    """
+    data = np.asarray(data, dtype=np.float32)
+    indices = np.asarray(indices, dtype=np.int32)
+    indptr = np.asarray(indptr, dtype=np.int64)
+
+    rows = np.repeat(np.arange(len(article_ids), dtype=np.int32), np.diff(indptr))
+    order = np.lexsort((rows, indices))
+    term_indptr = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(indices, minlength=len(vocabulary)), out=term_indptr[1:])
+
+    squares = np.zeros(len(article_ids), dtype=np.float64)
+    np.add.at(squares, rows, data.astype(np.float64) ** 2)
+
+    arrays = {
+        "idf": idf,
+        "doc_indptr": indptr,
+        "doc_indices": indices,
+        "doc_data": data,
+        "term_indptr": term_indptr,
+        "term_indices": rows[order],
+        "term_data": data[order],
+        "norms": np.sqrt(squares),
+    }
+
+    write_array_file(path, MAGIC, {"article_ids": article_ids, "vocabulary": vocabulary}, arrays, ARRAYS)
+
+
+def write_model_from_vectors(path: str, articles_vectors: Dict[str, Dict[str, float]], idf: Dict[str, float]):
+    vocabulary = sorted(idf)
+    term_ids = {term: term_id for term_id, term in enumerate(vocabulary)}
+
+    indptr = [0]
+    indices = []
+    data = []
+    for vector in articles_vectors.values():
+        for term in sorted(vector, key=term_ids.get):
+            indices.append(term_ids[term])
+            data.append(vector[term])
+        indptr.append(len(indices))
+
+    write_model(
+        path,
+        list(articles_vectors),
+        vocabulary,
+        np.array([idf[term] for term in vocabulary]),
+        np.array(indptr),
+        np.array(indices),
+        np.array(data),
+    )
+
+
+def write_model_rows(model: "TfIdfModel", rows: np.ndarray, path: str):
+    """Writes the given rows of a model as a standalone model file.
+
+    The vocabulary is reduced to the terms of these documents; weights and IDF are copied unchanged,
+    so the slice scores its documents exactly like the full model does.
+    """
+    indptr = np.asarray(model.doc_indptr, dtype=np.int64)
+    lengths = indptr[1:][rows] - indptr[:-1][rows]
+    slice_indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=slice_indptr[1:])
+    gather = np.repeat(indptr[:-1][rows] - slice_indptr[:-1], lengths) + np.arange(slice_indptr[-1])
+
+    term_ids = np.asarray(model.doc_indices[gather])
+    terms = np.unique(term_ids)
+    write_model(
+        path,
+        [model.article_ids[row] for row in rows.tolist()],
+        [model.vocabulary[term_id] for term_id in terms.tolist()],
+        model.idf[terms],
+        slice_indptr,
+        np.searchsorted(terms, term_ids),
+        model.doc_data[gather],
+    )
+
+
+def convert_tf_idf_dir(tf_idf_dir: str, path: str):
+    """Packs a directory of "term idf tf-idf" text files into a model file."""
+    articles_vectors = {}
+    idf = {}
+    for filename in os.listdir(tf_idf_dir):
+        vector = {}
+        with open(os.path.join(tf_idf_dir, filename), "r", encoding="utf-8") as file:
+            for line in file:
+                term, idf_value, tf_idf_value = line.split()
+                vector[term] = float(tf_idf_value)
+                idf.setdefault(term, float(idf_value))
+        articles_vectors[filename] = vector
+
+    write_model_from_vectors(path, articles_vectors, idf)
+
+
+class TfIdfModel:
+    """Read-only view of a model file; all arrays are np.memmap over the file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        meta, arrays = read_array_file(path, MAGIC, ARRAYS, "a TF-IDF model file")
+        self.article_ids = meta["article_ids"]
+        self.vocabulary = meta["vocabulary"]
+        self.term_ids = {term: term_id for term_id, term in enumerate(self.vocabulary)}
+        for name, array in arrays.items():
+            setattr(self, name, array)
+
+    def idf_dict(self) -> Dict[str, float]:
+        return dict(zip(self.vocabulary, self.idf.tolist()))
+
+    def document_vector(self, doc: int) -> Dict[str, float]:
+        start, end = self.doc_indptr[doc], self.doc_indptr[doc + 1]
+        return {
+            self.vocabulary[term_id]: weight
+            for term_id, weight in zip(self.doc_indices[start:end].tolist(), self.doc_data[start:end].tolist())
+        }
+
+    def articles_vectors(self) -> Dict[str, Dict[str, float]]:
+        """Dict form expected by the reference vector_search functions."""
+        return {article_id: self.document_vector(doc) for doc, article_id in enumerate(self.article_ids)}
+
+
+def is_model_file(path: str) -> bool:
+    return has_magic(path, MAGIC)
@@ -1,10 +1,99 @@
+import argparse
+import cProfile
+import io
 import os
+import pstats
+import time
+from typing import Dict, NamedTuple, Optional
 
-from flask import Flask, render_template, request, Response, abort
-from vector_search.vector_search import find_top_articles, preload_tf_idf_vectors
+from flask import Flask, Response, g, render_template, request, jsonify, send_from_directory
+from common import article_metadata
+from common.article_store import gunzip_record, open_article_store, store_path
+from common.index_handle import IndexHandle
+from common.metrics import metrics
+from common.query_cache import QueryCache
+from common.tfidf_model import TfIdfModel, is_model_file
+from inverted_index.positional_index import PositionalIndex, load_positional_index
+from vector_search.matrix_search import MatrixSearchEngine
+from vector_search.neighbours import NeighbourTable, load_neighbour_table
+from vector_search.vector_search import (
+    QUERY_VECTOR_CACHE_SIZE, describe_articles, find_top_articles, preload_tf_idf_vectors
+)
 
 app = Flask("searching_server")
-articles_tf_idf_vectors, idf = preload_tf_idf_vectors("../tf_idf/lemmas")
+MODEL_FILE = "../tf_idf/model.bin"
+TF_IDF_DIR = "../tf_idf/lemmas"
+POSITIONS_FILE = "../inverted_index/positions.bin"
+NEIGHBOURS_FILE = "../tf_idf/neighbours.bin"
+PAGES_DIR = "../scrapper/saved_pages"
+ARTICLE_MAX_AGE = 3600
+API_MAX_RESULTS = 100
+RELOAD_POLL_SECONDS = 2.0
+PROFILE_STATS_LINES = 40
+SEARCH_CACHE_SIZE = 2048
+SEARCH_CACHE_TTL = 600
+
+
+class SearchIndex(NamedTuple):
+    """One loaded version of the indexes together with its caches, which are freed with it."""
+    engine: Optional[MatrixSearchEngine]
+    articles_vectors: Optional[Dict[str, Dict[str, float]]]
+    idf: Optional[Dict[str, float]]
+    positional_index: Optional[PositionalIndex]
+    neighbours: Optional[NeighbourTable]
+    result_cache: QueryCache
+    query_vector_cache: QueryCache
+
+
+def load_search_index() -> SearchIndex:
+    if is_model_file(MODEL_FILE):
+        engine = MatrixSearchEngine.from_model(TfIdfModel(MODEL_FILE))
+        articles_vectors = idf = None
+    else:
+        engine = None
+        articles_vectors, idf = preload_tf_idf_vectors(TF_IDF_DIR)
+    return SearchIndex(
+        engine, articles_vectors, idf, load_positional_index(POSITIONS_FILE), load_neighbour_table(NEIGHBOURS_FILE),
+        QueryCache(maxsize=SEARCH_CACHE_SIZE, ttl=SEARCH_CACHE_TTL), QueryCache(maxsize=QUERY_VECTOR_CACHE_SIZE),
+    )
+
+
+# Loaded at import, i.e. once in the master before the workers are forked (see serve()).
+# Rebuilt in the background when the model files change, see IndexHandle.
+index_handle = IndexHandle(
+    load_search_index, [MODEL_FILE, TF_IDF_DIR, POSITIONS_FILE, NEIGHBOURS_FILE], RELOAD_POLL_SECONDS
+)
+
+
+@app.before_request
+def start_request_timer():
+    g.request_start_ns = time.perf_counter_ns()
+
+
+@app.after_request
+def record_request_time(response):
+    if request.endpoint is not None:
+        metrics.observe_ns(f"http.{request.endpoint}", time.perf_counter_ns() - g.request_start_ns)
+        metrics.count(f"http.status_{response.status_code}")
+    return response
+
+
+def profile_requested() -> bool:
+    """?profile=1 returns pstats output instead of results; only if the server runs with --profile."""
+    return app.config.get("PROFILE", False) and request.args.get("profile") == "1"
+
+
+def profiled_search(query: str, articles_count: int) -> Response:
+    profiler = cProfile.Profile()
+    profiler.runcall(run_search, query, articles_count)
+    output = io.StringIO()
+    pstats.Stats(profiler, stream=output).sort_stats("cumulative").print_stats(PROFILE_STATS_LINES)
+    return Response(output.getvalue(), mimetype="text/plain")
+
+
+def requested_count() -> int:
+    """?n= clamped to 1..API_MAX_RESULTS."""
+    return max(1, min(request.args.get("n", 10, type=int), API_MAX_RESULTS))
 
 
 @app.route("/", methods=["GET"])
@@ -12,20 +101,42 @@ def index():
     return render_template("index.html")
 
 
+def run_search(query: str, articles_count: int = 10):
+    # the request holds the version itself (not just its index) until it returns, so a version swapped
+    # out meanwhile stays alive and is reported in /index/status as retired but still in use
+    version = index_handle.current
+    search_index = version.index
+    if search_index.engine is not None:
+        return search_index.engine.find_top_articles(
+            query=query,
+            pages_dir=PAGES_DIR,
+            articles_count=articles_count,
+            result_cache=search_index.result_cache,
+            positional_index=search_index.positional_index,
+            query_vector_cache=search_index.query_vector_cache
+        )
+    return find_top_articles(
+        query=query,
+        articles_vectors=search_index.articles_vectors,
+        idf=search_index.idf,
+        pages_dir=PAGES_DIR,
+        articles_count=articles_count,
+        result_cache=search_index.result_cache,
+        positional_index=search_index.positional_index,
+        query_vector_cache=search_index.query_vector_cache
+    )
+
+
 @app.route("/search", methods=["GET"])
 def search():
     query = request.args.get("q", str).strip()
 
     if not query:
         render_template("index.html")
+    if profile_requested():
+        return profiled_search(query, 10)
 
-    count, results, elapsed_time = find_top_articles(
-        query=query,
-        articles_vectors=articles_tf_idf_vectors,
-        idf=idf,
-        pages_dir="../scrapper/saved_pages",
-        articles_count=10
-    )
+    count, results, elapsed_time = run_search(query)
 
     return render_template(
         template_name_or_list="results.html",
@@ -36,17 +147,120 @@ def search():
     )
 
 
+@app.route("/api/search", methods=["GET"])
+def api_search():
+    query = request.args.get("q", "").strip()
+    if not query:
+        return jsonify(error="query parameter q is required"), 400
+
+    articles_count = requested_count()
+    if profile_requested():
+        return profiled_search(query, articles_count)
+    count, results, elapsed_time = run_search(query, articles_count)
+    return jsonify(query=query, count=count, elapsed_time=elapsed_time, results=results)
+
+
+@app.route("/related/<article_id>", methods=["GET"])
+def related_articles(article_id):
+    """Most similar articles from the precomputed neighbour table (vector_search/neighbours.py): one row
+    of the mapped table and one metadata lookup, nothing is scored per request."""
+    version = index_handle.current
+    neighbours = version.index.neighbours
+    if neighbours is None:
+        return jsonify(error="neighbour table is not built"), 404
+
+    related = neighbours.related(article_id, requested_count())
+    if related is None:
+        return jsonify(error=f"unknown article {article_id}"), 404
+    return jsonify(article_id=article_id, results=describe_articles(PAGES_DIR, related))
+
+
+@app.route("/index/status", methods=["GET"])
+def index_status():
+    return jsonify(index_handle.status())
+
+
+@app.route("/index/reload", methods=["POST"])
+def index_reload():
+    index_handle.reload_async()
+    return jsonify(index_handle.status()), 202
+
+
+@app.route("/cache/stats", methods=["GET"])
+def cache_stats():
+    search_index = index_handle.current.index
+    return jsonify(results=search_index.result_cache.stats(), query_vectors=search_index.query_vector_cache.stats())
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics_export():
+    """Prometheus text format; under gunicorn every worker keeps its own registry, hence the pid label."""
+    return Response(metrics.render_prometheus({"pid": str(os.getpid())}), mimetype="text/plain; version=0.0.4")
+
+
 @app.route('/articles/<filename>')
 def load_article(filename):
-    article_path = os.path.join('../scrapper/saved_pages', filename)
+    """Loose files are served with sendfile where the WSGI server supports it, packed articles as the
+    stored gzip bytes with Content-Encoding: gzip (decompressed only for clients without gzip);
+    both with ETag and max-age. A loose file wins over the packed record, as in read_page."""
+    store = open_article_store(store_path(PAGES_DIR))
+    loose = os.path.isfile(os.path.join(PAGES_DIR, os.path.basename(filename)))
+    record = store.get_compressed(filename) if store is not None and not loose else None
+    if record is None:
+        return send_from_directory(PAGES_DIR, filename, mimetype='text/html', max_age=ARTICLE_MAX_AGE)
+
+    digest = store.digest(filename)
+    if request.accept_encodings["gzip"]:
+        response = Response(record, mimetype='text/html')
+        response.headers["Content-Encoding"] = "gzip"
+        response.set_etag(f"{digest}-gzip")
+    else:
+        response = Response(gunzip_record(record), mimetype='text/html')
+        response.set_etag(digest)
+    response.vary.add("Accept-Encoding")
+    response.cache_control.public = True
+    response.cache_control.max_age = ARTICLE_MAX_AGE
+    return response.make_conditional(request)
+
 
-    if not os.path.exists(article_path):
-        abort(404)
+def serve(host: str, port: int, workers: int, threads: int):
+    """Pre-fork serving with gunicorn: the app (and the mmap'd model) is loaded once before fork."""
+    from gunicorn.app.base import BaseApplication
 
-    with open(article_path, 'r', encoding='utf-8') as f:
-        content = f.read()
+    def post_fork(server, worker):
+        # SQLite connections must not be shared with the master process
+        article_metadata.stores.clear()
+        # threads do not survive fork: every worker watches the model files itself
+        index_handle.start_watching()
+
+    class PreforkServer(BaseApplication):
+        def load_config(self):
+            self.cfg.set("bind", f"{host}:{port}")
+            self.cfg.set("workers", workers)
+            self.cfg.set("threads", threads)
+            self.cfg.set("worker_class", "gthread")
+            self.cfg.set("preload_app", True)
+            self.cfg.set("post_fork", post_fork)
+
+        def load(self):
+            return app
+
+    PreforkServer().run()
 
-    return Response(content, mimetype='text/html')
 
 if __name__ == "__main__":
-    app.run(debug=True, port=8080)
+    parser = argparse.ArgumentParser(description="Search demo server")
+    parser.add_argument("--workers", type=int, default=0, help="gunicorn worker processes, 0 for the debug server")
+    parser.add_argument("--threads", type=int, default=4, help="threads per worker")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--profile", action="store_true", help="allow ?profile=1 on search requests")
+    args = parser.parse_args()
+
+    app.config["PROFILE"] = args.profile
+
+    if args.workers:
+        serve(args.host, args.port, args.workers, args.threads)
+    else:
+        index_handle.start_watching()
+        app.run(debug=True, host=args.host, port=args.port)
@@ -0,0 +1,130 @@
+import mmap
+import struct
+from bisect import bisect_left
+from collections.abc import Mapping
+
+from common.array_file import atomic_output
+
+MAGIC = b"INVIDX01"
+HEADER = struct.Struct("<8sIQQQ")
+TERM_OFFSET = struct.Struct("<I")
+POSTING_OFFSET = struct.Struct("<Q")
+
+
+def encode_varint(value: int, out: bytearray):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def encode_postings(doc_ids) -> bytes:
+    """Sorted doc ids as varint-encoded gaps."""
+    out = bytearray()
+    previous = 0
+    for doc_id in sorted(doc_ids):
+        encode_varint(doc_id - previous, out)
+        previous = doc_id
+    return bytes(out)
+
+
+def decode_postings(buffer, start: int, end: int) -> list[int]:
+    doc_ids = []
+    value = shift = previous = 0
+    for position in range(start, end):
+        byte = buffer[position]
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+        previous += value
+        doc_ids.append(previous)
+        value = shift = 0
+    return doc_ids
+
+
+def write_binary_index(index_data: dict[str, set[int]], output_file: str):
+    """File layout: header, term offsets, posting offsets, terms blob, postings blob.
+
+    Terms are sorted by their UTF-8 bytes, so a lookup is a binary search over the term offsets.
+    """
+    terms = sorted(term.encode("utf-8") for term in index_data)
+
+    term_offsets = bytearray()
+    posting_offsets = bytearray()
+    terms_blob = bytearray()
+    postings_blob = bytearray()
+
+    for term in terms:
+        term_offsets += TERM_OFFSET.pack(len(terms_blob))
+        posting_offsets += POSTING_OFFSET.pack(len(postings_blob))
+        terms_blob += term
+        postings_blob += encode_postings(index_data[term.decode("utf-8")])
+    term_offsets += TERM_OFFSET.pack(len(terms_blob))
+    posting_offsets += POSTING_OFFSET.pack(len(postings_blob))
+
+    term_offsets_start = HEADER.size
+    posting_offsets_start = term_offsets_start + len(term_offsets)
+    terms_start = posting_offsets_start + len(posting_offsets)
+    postings_start = terms_start + len(terms_blob)
+
+    with atomic_output(output_file) as out:
+        out.write(HEADER.pack(MAGIC, len(terms), posting_offsets_start, terms_start, postings_start))
+        out.write(term_offsets)
+        out.write(posting_offsets)
+        out.write(terms_blob)
+        out.write(postings_blob)
+
+
+class BinaryIndex(Mapping):
+    """Read-only mmap view of a binary index; postings are decoded lazily on lookup."""
+
+    def __init__(self, file_name: str):
+        with open(file_name, "rb") as file:
+            self.mm = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, self.term_count, self.posting_offsets_start, self.terms_start, self.postings_start = \
+            HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{file_name} is not a binary inverted index")
+
+    def term_bytes(self, position: int) -> bytes:
+        start, end = struct.unpack_from("<II", self.mm, HEADER.size + position * TERM_OFFSET.size)
+        return self.mm[self.terms_start + start:self.terms_start + end]
+
+    def find(self, term: str) -> int:
+        key = term.encode("utf-8")
+        position = bisect_left(range(self.term_count), key, key=self.term_bytes)
+        if position < self.term_count and self.term_bytes(position) == key:
+            return position
+        return -1
+
+    def postings_at(self, position: int) -> list[int]:
+        start, end = struct.unpack_from(
+            "<QQ", self.mm, self.posting_offsets_start + position * POSTING_OFFSET.size
+        )
+        return decode_postings(self.mm, self.postings_start + start, self.postings_start + end)
+
+    def postings(self, term: str) -> list[int]:
+        """Sorted doc ids of the term, empty if the term is unknown."""
+        position = self.find(term)
+        return self.postings_at(position) if position >= 0 else []
+
+    def __getitem__(self, term: str) -> set[int]:
+        position = self.find(term)
+        if position < 0:
+            raise KeyError(term)
+        return set(self.postings_at(position))
+
+    def __contains__(self, term) -> bool:
+        return isinstance(term, str) and self.find(term) >= 0
+
+    def __iter__(self):
+        for position in range(self.term_count):
+            yield self.term_bytes(position).decode("utf-8")
+
+    def __len__(self) -> int:
+        return self.term_count
+
+    def close(self):
+        self.mm.close()
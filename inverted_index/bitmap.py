@@ -0,0 +1,179 @@
+import numpy as np
+
+ARRAY_LIMIT = 4096
+BITMAP_WORDS = 1024
+
+
+def array_to_bitmap(values: np.ndarray) -> np.ndarray:
+    words = np.zeros(BITMAP_WORDS, dtype=np.uint64)
+    np.bitwise_or.at(words, values >> 6, np.left_shift(np.uint64(1), (values & 63).astype(np.uint64)))
+    return words
+
+
+def bitmap_to_array(words: np.ndarray) -> np.ndarray:
+    bits = np.unpackbits(words.view(np.uint8), bitorder="little")
+    return np.flatnonzero(bits).astype(np.uint16)
+
+
+def bitmap_cardinality(words: np.ndarray) -> int:
+    return int(np.unpackbits(words.view(np.uint8)).sum())
+
+
+def is_bitmap(container: np.ndarray) -> bool:
+    return container.dtype == np.uint64
+
+
+def cardinality(container: np.ndarray) -> int:
+    return bitmap_cardinality(container) if is_bitmap(container) else len(container)
+
+
+def normalize(container: np.ndarray):
+    """Sparse containers are sorted uint16 arrays, dense ones 1024 x uint64 bitmaps; None if empty."""
+    if is_bitmap(container):
+        count = bitmap_cardinality(container)
+        if count == 0:
+            return None
+        return container if count > ARRAY_LIMIT else bitmap_to_array(container)
+    if len(container) == 0:
+        return None
+    return container if len(container) <= ARRAY_LIMIT else array_to_bitmap(container)
+
+
+def container_and(left: np.ndarray, right: np.ndarray):
+    if is_bitmap(left) and is_bitmap(right):
+        return normalize(left & right)
+    if is_bitmap(left):
+        left, right = right, left
+    if is_bitmap(right):
+        bits = (right[left >> 6] >> (left & 63).astype(np.uint64)) & np.uint64(1)
+        return normalize(left[bits.astype(bool)])
+    return normalize(np.intersect1d(left, right, assume_unique=True))
+
+
+def container_or(left: np.ndarray, right: np.ndarray):
+    if is_bitmap(left) or is_bitmap(right):
+        left = left if is_bitmap(left) else array_to_bitmap(left)
+        right = right if is_bitmap(right) else array_to_bitmap(right)
+        return normalize(left | right)
+    return normalize(np.union1d(left, right))
+
+
+def container_andnot(left: np.ndarray, right: np.ndarray):
+    if is_bitmap(left):
+        right = right if is_bitmap(right) else array_to_bitmap(right)
+        return normalize(left & ~right)
+    if is_bitmap(right):
+        bits = (right[left >> 6] >> (left & 63).astype(np.uint64)) & np.uint64(1)
+        return normalize(left[~bits.astype(bool)])
+    return normalize(np.setdiff1d(left, right, assume_unique=True))
+
+
+class RoaringBitmap:
+    """Compressed set of non-negative ints split into 2^16 chunks.
+
+    Each chunk holds either a sorted uint16 array (sparse) or a 65536-bit bitmap (dense), so
+    AND/OR/AND-NOT run as NumPy operations without per-element Python objects. Supports the set
+    operators used by searcher.resolve_operator and mixes with plain sets.
+    """
+
+    __slots__ = ("containers",)
+
+    def __init__(self, containers: dict = None):
+        self.containers = containers or {}
+
+    @classmethod
+    def from_iterable(cls, values) -> "RoaringBitmap":
+        values = np.unique(np.fromiter(values, dtype=np.int64))
+        if len(values) and values[0] < 0:
+            raise ValueError("RoaringBitmap holds only non-negative ints")
+
+        containers = {}
+        keys = values >> 16
+        boundaries = np.flatnonzero(np.diff(keys)) + 1
+        for chunk in np.split(values, boundaries):
+            if len(chunk):
+                containers[int(chunk[0] >> 16)] = normalize((chunk & 0xFFFF).astype(np.uint16))
+        return cls(containers)
+
+    @staticmethod
+    def coerce(other) -> "RoaringBitmap":
+        if isinstance(other, RoaringBitmap):
+            return other
+        if isinstance(other, (set, frozenset)):
+            return RoaringBitmap.from_iterable(other)
+        return NotImplemented
+
+    def combine(self, other, operation, keep_left: bool, keep_right: bool) -> "RoaringBitmap":
+        other = self.coerce(other)
+        if other is NotImplemented:
+            return other
+
+        containers = {}
+        for key in self.containers.keys() | other.containers.keys():
+            left = self.containers.get(key)
+            right = other.containers.get(key)
+            if left is not None and right is not None:
+                result = operation(left, right)
+            elif left is not None:
+                result = left if keep_left else None
+            else:
+                result = right if keep_right else None
+            if result is not None:
+                containers[key] = result
+        return RoaringBitmap(containers)
+
+    def __and__(self, other):
+        return self.combine(other, container_and, keep_left=False, keep_right=False)
+
+    def __or__(self, other):
+        return self.combine(other, container_or, keep_left=True, keep_right=True)
+
+    def __sub__(self, other):
+        return self.combine(other, container_andnot, keep_left=True, keep_right=False)
+
+    def __rand__(self, other):
+        return self & other
+
+    def __ror__(self, other):
+        return self | other
+
+    def __rsub__(self, other):
+        other = self.coerce(other)
+        return other if other is NotImplemented else other - self
+
+    def __len__(self) -> int:
+        return sum(cardinality(container) for container in self.containers.values())
+
+    def __bool__(self) -> bool:
+        return bool(self.containers)
+
+    def __iter__(self):
+        for key in sorted(self.containers):
+            yield from self.to_array(key).tolist()
+
+    def __contains__(self, value) -> bool:
+        container = self.containers.get(value >> 16)
+        if container is None:
+            return False
+        low = value & 0xFFFF
+        if is_bitmap(container):
+            return bool((int(container[low >> 6]) >> (low & 63)) & 1)
+        position = np.searchsorted(container, low)
+        return position < len(container) and container[position] == low
+
+    def __eq__(self, other) -> bool:
+        other = self.coerce(other)
+        if other is NotImplemented:
+            return other
+        return list(self) == list(other)
+
+    def to_array(self, key: int) -> np.ndarray:
+        container = self.containers[key]
+        low = bitmap_to_array(container) if is_bitmap(container) else container
+        return (np.int64(key) << 16) | low.astype(np.int64)
+
+    def nbytes(self) -> int:
+        return sum(container.nbytes for container in self.containers.values())
+
+    def __repr__(self) -> str:
+        return f"RoaringBitmap({len(self)} values, {len(self.containers)} containers)"
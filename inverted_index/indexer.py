@@ -1,20 +1,56 @@
+import argparse
+import os
 from pathlib import Path
 from collections import defaultdict
 
+from inverted_index.binary_index import write_binary_index
+from inverted_index.bitmap import RoaringBitmap
+from common.metrics import metrics
+
+
+def document_number(file_name: str) -> int:
+    name_parts = Path(file_name).stem.split("_")
+    return int(name_parts[-1])
+
+
+def add_document(index: dict[str, set[int]], file: Path):
+    file_number = document_number(file.name)
+
+    with file.open(encoding="utf-8") as f:
+        for line in f:
+            tokens = line.strip().split()
+            if tokens:
+                index[tokens[0]].add(file_number)
+
 
 def make_index(lemmas_path: str) -> dict[str, set[int]]:
     index = defaultdict(set[int])
     lemmas_dir = Path(lemmas_path)
 
     for file in lemmas_dir.iterdir():
-        name_parts = file.stem.split("_")
-        file_number = int(name_parts[-1])
-
-        with file.open(encoding="utf-8") as f:
-            for line in f:
-                tokens = line.strip().split()
-                if tokens:
-                    index[tokens[0]].add(file_number)
+        add_document(index, file)
+    return index
+
+
+def update_index(
+        index: dict[str, set[int]],
+        lemmas_path: str,
+        changed_files: set[str],
+        removed_files: set[str]
+) -> dict[str, set[int]]:
+    """Merges postings of new or changed lemma files into an existing index."""
+    stale = {document_number(name) for name in changed_files | removed_files}
+
+    for term in list(index):
+        postings = index[term]
+        if postings & stale:
+            postings -= stale
+            if not postings:
+                del index[term]
+
+    lemmas_dir = Path(lemmas_path)
+    for name in changed_files:
+        add_document(index, lemmas_dir / name)
     return index
 
 
@@ -26,7 +62,7 @@ def write_index_file(index_data: dict[str, set[int]], output_file: str):
             out.write(f"{term}, {ids_str}\n")
 
 
-def read_index_file(file_name: str) -> dict[str, set[int]]:
+def read_index_file(file_name: str, bitmap_density: float = None) -> dict[str, set[int]]:
     index = defaultdict(set[int])
     with open(file_name, "r", encoding="utf-8") as file:
         next(file)
@@ -35,14 +71,47 @@ def read_index_file(file_name: str) -> dict[str, set[int]]:
             lemma, article_ids = line.split(", ")
             articles_set = set(map(int, article_ids.split()))
             index[lemma] = articles_set
+
+    if bitmap_density is not None:
+        to_bitmap_postings(index, bitmap_density)
+    return index
+
+
+def to_bitmap_postings(index: dict[str, set[int]], bitmap_density: float) -> dict[str, set[int]]:
+    """Replaces postings found in at least bitmap_density of all documents with RoaringBitmap."""
+    all_docs = set()
+    for article_ids in index.values():
+        all_docs.update(article_ids)
+
+    min_length = max(1, bitmap_density * len(all_docs))
+    for term, article_ids in index.items():
+        if len(article_ids) >= min_length:
+            index[term] = RoaringBitmap.from_iterable(article_ids)
     return index
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Inverted index builder")
+    parser.add_argument("--format", choices=["binary", "csv"], default="binary")
+    parser.add_argument("--positions", dest="positions_dir", default="../lemmatizer/positions",
+                        help="lemmatizer positions for positions.bin (phrase queries and snippets)")
+    args = parser.parse_args()
+
     source_dir = "../lemmatizer/lemmas"
-    output_file = "inverted_index.csv"
-    index = make_index(source_dir)
-    write_index_file(index, output_file)
+    with metrics.span("index.build"):
+        index = make_index(source_dir)
+    with metrics.span("index.write"):
+        if args.format == "csv":
+            write_index_file(index, "inverted_index.csv")
+        else:
+            write_binary_index(index, "inverted_index.bin")
+
+    if os.path.isdir(args.positions_dir):
+        # positional_index imports document_number from this module
+        from inverted_index.positional_index import write_positional_index
+        with metrics.span("index.positions"):
+            write_positional_index(args.positions_dir, "../scrapper/saved_pages", "positions.bin")
+    print(metrics.summary_json())
 
 
 if __name__ == "__main__":
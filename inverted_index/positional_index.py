@@ -0,0 +1,289 @@
+import html
+import os
+import re
+from collections import defaultdict
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+from common.array_file import read_array_file, write_array_file
+from common.html_cleaner import load_page
+from inverted_index.indexer import document_number
+
+MAGIC = b"POSIDX01"
+
+# name -> dtype of every array stored in the positional index file
+ARRAYS = {
+    "text_offsets": np.int64,
+    "texts": np.uint8,
+    "term_indptr": np.int64,
+    "posting_docs": np.int32,
+    "posting_indptr": np.int64,
+    "positions": np.int32,
+    "starts": np.int32,
+    "ends": np.int32,
+}
+
+# Word split of the lemmatizer's regex tokenizer; every match counts as one position.
+word_regex = re.compile(r'[^\W\d_]+')
+
+# A phrase word without postings (a stopword): any word may stand at its position.
+PHRASE_GAP = "*"
+
+SNIPPET_BYTES = 240
+MAX_SNIPPET_HITS = 64
+
+Occurrence = Tuple[int, int, int]
+
+
+def lemma_occurrences(text: str, lemmas: Dict[str, set]) -> Dict[str, List[Occurrence]]:
+    """Occurrences of the page's lemmas: word number and UTF-8 byte offsets of the word in the text."""
+    lemma_of = {token: lemma for lemma, tokens in lemmas.items() for token in tokens}
+    occurrences = defaultdict(list)
+    byte_offset = char_offset = 0
+
+    for number, match in enumerate(word_regex.finditer(text)):
+        lemma = lemma_of.get(match.group().lower())
+        if lemma is None:
+            continue
+        start = byte_offset + len(text[char_offset:match.start()].encode("utf-8"))
+        end = start + len(match.group().encode("utf-8"))
+        byte_offset, char_offset = end, match.end()
+        occurrences[lemma].append((number, start, end))
+
+    return occurrences
+
+
+def write_positions_file(path: str, occurrences: Dict[str, List[Occurrence]]):
+    """Lemma occurrences of one page: "lemma position:start:end ..." with UTF-8 byte offsets into the text."""
+    with open(path, "w", encoding="utf-8") as file:
+        for lemma in sorted(occurrences):
+            entries = " ".join(f"{p}:{s}:{e}" for p, s, e in occurrences[lemma])
+            file.write(f"{lemma} {entries}\n")
+
+
+def read_positions_file(path: str) -> Dict[str, List[Occurrence]]:
+    occurrences = {}
+    with open(path, "r", encoding="utf-8") as file:
+        for line in file:
+            parts = line.split()
+            if parts:
+                occurrences[parts[0]] = [tuple(map(int, entry.split(":"))) for entry in parts[1:]]
+    return occurrences
+
+
+def write_positional_index(positions_dir: str, pages_dir: str, output_file: str):
+    """Packs the lemmatizer's positions files and the extracted page texts into one mmap-able file.
+
+    Postings are term-major and sorted by document; each posting points to the term's positions and
+    byte offsets inside the document text, which is stored in the same file.
+    """
+    filenames = sorted(os.listdir(positions_dir), key=document_number)
+    documents = (
+        (
+            filename,
+            load_page(os.path.join(pages_dir, filename)).text,
+            read_positions_file(os.path.join(positions_dir, filename)),
+        )
+        for filename in filenames
+    )
+    pack_positional_index(documents, output_file)
+
+
+def pack_positional_index(documents: Iterable[Tuple[str, str, Dict[str, List[Occurrence]]]], output_file: str):
+    """Writes the positional index of (filename, text, lemma occurrences) documents sorted by document number."""
+    doc_numbers = []
+    text_offsets = [0]
+    texts = bytearray()
+    term_postings: Dict[str, List[Tuple[int, List[Occurrence]]]] = {}
+    for doc, (filename, text, document_occurrences) in enumerate(documents):
+        doc_numbers.append(document_number(filename))
+        texts += text.encode("utf-8")
+        text_offsets.append(len(texts))
+        for lemma, occurrences in document_occurrences.items():
+            term_postings.setdefault(lemma, []).append((doc, occurrences))
+
+    vocabulary = sorted(term_postings)
+    term_indptr = [0]
+    posting_docs, posting_indptr = [], [0]
+    positions, starts, ends = [], [], []
+    for term in vocabulary:
+        for doc, occurrences in term_postings[term]:
+            posting_docs.append(doc)
+            for position, start, end in occurrences:
+                positions.append(position)
+                starts.append(start)
+                ends.append(end)
+            posting_indptr.append(len(positions))
+        term_indptr.append(len(posting_docs))
+
+    arrays = {
+        "text_offsets": text_offsets,
+        "texts": np.frombuffer(bytes(texts), dtype=np.uint8),
+        "term_indptr": term_indptr,
+        "posting_docs": posting_docs,
+        "posting_indptr": posting_indptr,
+        "positions": positions,
+        "starts": starts,
+        "ends": ends,
+    }
+
+    write_positional_arrays(output_file, doc_numbers, vocabulary, arrays)
+
+
+def write_positional_arrays(output_file: str, doc_numbers: List[int], vocabulary: List[str], arrays: Dict):
+    write_array_file(output_file, MAGIC, {"doc_numbers": doc_numbers, "vocabulary": vocabulary}, arrays, ARRAYS)
+
+
+class PositionalIndex:
+    """Read-only positional index: phrase matching and highlighted snippets without parsing HTML."""
+
+    def __init__(self, path: str):
+        self.path = path
+        meta, arrays = read_array_file(path, MAGIC, ARRAYS, "a positional index file")
+        self.doc_numbers = meta["doc_numbers"]
+        self.docs = {number: doc for doc, number in enumerate(self.doc_numbers)}
+        self.vocabulary = meta["vocabulary"]
+        self.term_ids = {term: term_id for term_id, term in enumerate(self.vocabulary)}
+        for name, array in arrays.items():
+            setattr(self, name, array)
+
+    def term_postings(self, term: str) -> Tuple[int, int]:
+        term_id = self.term_ids.get(term)
+        if term_id is None:
+            return 0, 0
+        return int(self.term_indptr[term_id]), int(self.term_indptr[term_id + 1])
+
+    def find_posting(self, term: str, doc: int) -> int:
+        start, end = self.term_postings(term)
+        docs = self.posting_docs[start:end]
+        i = int(np.searchsorted(docs, doc))
+        return start + i if i < len(docs) and docs[i] == doc else -1
+
+    def occurrences(self, term: str, doc: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Positions and byte offsets of a term in a document (internal doc number)."""
+        posting = self.find_posting(term, doc)
+        if posting < 0:
+            empty = np.zeros(0, dtype=np.int32)
+            return empty, empty, empty
+        start, end = self.posting_indptr[posting], self.posting_indptr[posting + 1]
+        return self.positions[start:end], self.starts[start:end], self.ends[start:end]
+
+    def phrase_docs(self, terms: List[str]) -> List[int]:
+        """Document numbers where the terms occur at consecutive positions.
+
+        PHRASE_GAP matches any word: stopwords have no postings, but their word numbers are counted.
+        Gaps only keep the distance between the other terms, at the ends of the phrase they match nothing.
+        """
+        offsets = [(offset, term) for offset, term in enumerate(terms) if term != PHRASE_GAP]
+        if not offsets:
+            return []
+        postings = [self.term_postings(term) for _, term in offsets]
+        candidates = None
+        for start, end in sorted(postings, key=lambda bounds: bounds[1] - bounds[0]):
+            docs = self.posting_docs[start:end]
+            candidates = docs if candidates is None else np.intersect1d(candidates, docs, assume_unique=True)
+            if len(candidates) == 0:
+                return []
+
+        first_offset, first_term = offsets[0]
+        result = []
+        for doc in candidates.tolist():
+            starts = self.occurrences(first_term, doc)[0] - first_offset
+            for offset, term in offsets[1:]:
+                starts = np.intersect1d(starts, self.occurrences(term, doc)[0] - offset)
+                if len(starts) == 0:
+                    break
+            if len(starts):
+                result.append(self.doc_numbers[doc])
+        return sorted(result)
+
+    def snippet(self, doc_number: int, terms: List[str], window: int = SNIPPET_BYTES) -> str:
+        """HTML snippet around the densest cluster of query terms, with the terms wrapped in <mark>.
+
+        Only the occurrences of the query terms and one window of the stored text are read.
+        """
+        doc = self.docs.get(doc_number)
+        if doc is None:
+            return ""
+        text_start, text_end = int(self.text_offsets[doc]), int(self.text_offsets[doc + 1])
+
+        hits = []
+        for term in dict.fromkeys(terms):
+            _, starts, ends = self.occurrences(term, doc)
+            hits.extend(zip(starts[:MAX_SNIPPET_HITS].tolist(), ends[:MAX_SNIPPET_HITS].tolist()))
+        hits.sort()
+
+        best_first, best_count = 0, 0
+        last = 0
+        for first in range(len(hits)):
+            while last < len(hits) and hits[last][1] - hits[first][0] <= window:
+                last += 1
+            if last - first > best_count:
+                best_first, best_count = first, last - first
+
+        if hits:
+            center = (hits[best_first][0] + hits[best_first + best_count - 1][1]) // 2
+            begin = max(0, center - window // 2)
+        else:
+            begin = 0
+        end = min(text_end - text_start, begin + window)
+        begin = max(0, end - window)
+
+        chunk = bytes(self.texts[text_start + begin:text_start + end])
+        inside = [(s - begin, e - begin) for s, e in hits if s >= begin and e <= end]
+        return highlight(chunk, inside, begin > 0, end < text_end - text_start)
+
+
+def write_positional_slice(index: PositionalIndex, first: int, last: int, output_file: str):
+    """Documents first..last-1 (internal numbers) of a positional index as a standalone index file."""
+    posting_terms = np.repeat(np.arange(len(index.vocabulary)), np.diff(index.term_indptr))
+    keep = (index.posting_docs >= first) & (index.posting_docs < last)
+    posting_lengths = np.diff(index.posting_indptr)
+    keep_positions = np.repeat(keep, posting_lengths)
+
+    term_counts = np.bincount(posting_terms[keep], minlength=len(index.vocabulary))
+    terms = np.flatnonzero(term_counts)
+    term_indptr = np.zeros(len(terms) + 1, dtype=np.int64)
+    np.cumsum(term_counts[terms], out=term_indptr[1:])
+    posting_indptr = np.zeros(int(keep.sum()) + 1, dtype=np.int64)
+    np.cumsum(posting_lengths[keep], out=posting_indptr[1:])
+
+    text_start, text_end = int(index.text_offsets[first]), int(index.text_offsets[last])
+    arrays = {
+        "text_offsets": np.asarray(index.text_offsets[first:last + 1]) - text_start,
+        "texts": index.texts[text_start:text_end],
+        "term_indptr": term_indptr,
+        "posting_docs": np.asarray(index.posting_docs[keep]) - first,
+        "posting_indptr": posting_indptr,
+        "positions": index.positions[keep_positions],
+        "starts": index.starts[keep_positions],
+        "ends": index.ends[keep_positions],
+    }
+    write_positional_arrays(output_file, index.doc_numbers[first:last], [index.vocabulary[t] for t in terms.tolist()],
+                            arrays)
+
+
+def highlight(chunk: bytes, hits: List[Tuple[int, int]], cut_left: bool, cut_right: bool) -> str:
+    parts = []
+    position = 0
+    if cut_left and b" " in chunk:
+        # skip the partial word or UTF-8 sequence at the window border, but never a hit
+        position = min(chunk.find(b" ") + 1, hits[0][0] if hits else len(chunk))
+    for start, end in hits:
+        if start < position:
+            continue
+        parts.append(html.escape(chunk[position:start].decode("utf-8", errors="ignore")))
+        parts.append(f"<mark>{html.escape(chunk[start:end].decode('utf-8', errors='ignore'))}</mark>")
+        position = end
+    tail = chunk[position:]
+    if cut_right and b" " in tail:
+        tail = tail[:tail.rfind(b" ")]
+    parts.append(html.escape(tail.decode("utf-8", errors="ignore")))
+    snippet = "".join(parts).strip()
+    return ("… " if cut_left else "") + snippet + (" …" if cut_right else "")
+
+
+def load_positional_index(path: str = "positions.bin"):
+    return PositionalIndex(path) if os.path.exists(path) else None
+
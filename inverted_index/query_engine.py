@@ -0,0 +1,143 @@
+from bisect import bisect_left
+from functools import cached_property
+from heapq import merge
+
+from inverted_index.positional_index import PHRASE_GAP
+
+OPERATORS = {"AND", "OR", "NOT"}
+
+
+def gallop(postings: list[int], target: int, low: int) -> int:
+    """Position of the first element >= target at or after low, found by exponential search."""
+    step = 1
+    high = low
+    while high < len(postings) and postings[high] < target:
+        low = high + 1
+        high += step
+        step *= 2
+    return bisect_left(postings, target, low, min(high, len(postings)))
+
+
+def intersect(short: list[int], long: list[int]) -> list[int]:
+    result = []
+    position = 0
+    for doc_id in short:
+        position = gallop(long, doc_id, position)
+        if position == len(long):
+            break
+        if long[position] == doc_id:
+            result.append(doc_id)
+    return result
+
+
+def difference(left: list[int], right: list[int]) -> list[int]:
+    """left AND NOT right."""
+    result = []
+    position = 0
+    for doc_id in left:
+        position = gallop(right, doc_id, position)
+        if position == len(right) or right[position] != doc_id:
+            result.append(doc_id)
+    return result
+
+
+def union(postings_lists: list[list[int]]) -> list[int]:
+    result = []
+    for doc_id in merge(*postings_lists):
+        if not result or result[-1] != doc_id:
+            result.append(doc_id)
+    return result
+
+
+def build_tree(rpn: list[str]):
+    """RPN -> tree of ("TERM", term), ("PHRASE", [terms]), ("NOT", node), ("AND"/"OR", [nodes]).
+
+    AND/OR chains are flattened; a '"quoted"' operand is a phrase of lemmas.
+    """
+    stack = []
+    for item in rpn:
+        if item == "NOT":
+            stack.append(("NOT", stack.pop()))
+        elif item in OPERATORS:
+            right = stack.pop()
+            left = stack.pop()
+            children = []
+            for node in (left, right):
+                children.extend(node[1] if node[0] == item else [node])
+            stack.append((item, children))
+        elif item.startswith('"'):
+            stack.append(("PHRASE", item.strip('"').split()))
+        else:
+            stack.append(("TERM", item))
+    return stack[-1] if stack else None
+
+
+class QueryEngine:
+    """Boolean search over sorted posting lists.
+
+    AND operands are intersected from the most selective one with galloping search, NOT inside an
+    AND is applied as AND-NOT, and the universe for a bare NOT is computed on the first one. Phrases are
+    matched by the positional index; without one they fall back to AND of their terms.
+    """
+
+    def __init__(self, index, positional_index=None):
+        self.index = index
+        self.positional_index = positional_index
+        if hasattr(index, "postings"):
+            self.sorted_postings = {}
+        else:
+            self.sorted_postings = {term: sorted(doc_ids) for term, doc_ids in index.items()}
+
+    @cached_property
+    def universe(self) -> list[int]:
+        """All documents of the index; binary postings decoded here are not kept in sorted_postings."""
+        if hasattr(self.index, "postings"):
+            return union([self.index.postings(term) for term in self.index])
+        return union(list(self.sorted_postings.values()))
+
+    def postings(self, term: str) -> list[int]:
+        if term in self.sorted_postings:
+            return self.sorted_postings[term]
+        if hasattr(self.index, "postings"):
+            postings = self.index.postings(term)
+            self.sorted_postings[term] = postings
+            return postings
+        return []
+
+    def evaluate(self, node) -> list[int]:
+        kind = node[0]
+        if kind == "TERM":
+            return self.postings(node[1])
+        if kind == "PHRASE":
+            if self.positional_index is not None:
+                return self.positional_index.phrase_docs(node[1])
+            return self.evaluate_and([("TERM", term) for term in node[1] if term != PHRASE_GAP])
+        if kind == "NOT":
+            return difference(self.universe, self.evaluate(node[1]))
+        if kind == "OR":
+            return union([self.evaluate(child) for child in node[1]])
+        return self.evaluate_and(node[1])
+
+    def evaluate_and(self, children) -> list[int]:
+        positive = [child for child in children if child[0] != "NOT"]
+        negative = [child[1] for child in children if child[0] == "NOT"]
+
+        operands = sorted((self.evaluate(child) for child in positive), key=len)
+        if operands:
+            result = operands[0]
+            for operand in operands[1:]:
+                if not result:
+                    return []
+                result = intersect(result, operand)
+        else:
+            result = self.universe
+
+        for child in negative:
+            if not result:
+                break
+            result = difference(result, self.evaluate(child))
+        return result
+
+    def search(self, rpn: list[str]) -> list[int]:
+        tree = build_tree(rpn)
+        return self.evaluate(tree) if tree else []
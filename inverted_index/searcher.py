@@ -1,20 +1,35 @@
+import argparse
+import os
 import re
 from collections import deque
+from functools import cache
 
+from nltk.corpus import stopwords
 from nltk.stem import WordNetLemmatizer
 
-from inverted_index.indexer import read_index_file
+from common.query_cache import QueryCache, normalize_query
+from inverted_index.binary_index import BinaryIndex
+from inverted_index.bitmap import RoaringBitmap
+from inverted_index.indexer import read_index_file, to_bitmap_postings
+from inverted_index.positional_index import PHRASE_GAP, load_positional_index
+from inverted_index.query_engine import QueryEngine
 
 lemmatizer = WordNetLemmatizer()
 
+plan_cache = QueryCache(maxsize=4096)
+
 
 def tokenize_query(query: str) -> list[str]:
-    regex = r'\(|\)|and|or|not|[a-zA-Z]+'
+    regex = r'"[^"]*"|\(|\)|and|or|not|[a-zA-Z]+'
     tokens = re.findall(regex, query, flags=re.IGNORECASE)
 
     parsed_tokens = []
     for token in tokens:
-        if token.upper() in ["AND", "OR", "NOT"]:
+        if token.startswith('"'):
+            words = [phrase_word(word.lower()) for word in re.findall(r'[a-zA-Z]+', token)]
+            if words:
+                parsed_tokens.append(phrase_operand(words))
+        elif token.upper() in ["AND", "OR", "NOT"]:
             parsed_tokens.append(token.upper())
         else:
             lemma = lemmatizer.lemmatize(token.lower())
@@ -23,6 +38,52 @@ def tokenize_query(query: str) -> list[str]:
     return parsed_tokens
 
 
+@cache
+def stop_words() -> frozenset[str]:
+    """The lemmatizer's English stopwords: they get no postings, so phrase_docs matches them as gaps."""
+    return frozenset(stopwords.words('english'))
+
+
+def phrase_word(word: str) -> str:
+    return PHRASE_GAP if word in stop_words() else lemmatizer.lemmatize(word)
+
+
+def phrase_operand(words: list[str]) -> str:
+    """Phrase of lemmas as one RPN operand: '"kotlin coroutine"'."""
+    return '"' + " ".join(words) + '"'
+
+
+def phrase_words(operand: str) -> list[str]:
+    return operand.strip('"').split()
+
+
+def is_phrase(operand: str) -> bool:
+    return operand.startswith('"')
+
+
+def phrase_postings(words: list[str], index: dict[str, set[int]], positional_index=None) -> set[int]:
+    """Documents containing the phrase; without a positional index, documents containing all its words."""
+    if positional_index is not None:
+        return set(positional_index.phrase_docs(words))
+    result = None
+    for word in words:
+        if word == PHRASE_GAP:
+            continue
+        postings = set(index.get(word, set()))
+        result = postings if result is None else result & postings
+    return result or set()
+
+
+def parse_query(query: str) -> list[str]:
+    """RPN plan of the query, memoized by the normalized query text."""
+    key = normalize_query(query)
+    plan = plan_cache.get(key)
+    if plan is None:
+        plan = tuple(process_tokens(tokenize_query(key)))
+        plan_cache.put(key, plan)
+    return list(plan)
+
+
 def process_tokens(input_sequence: list[str]) -> list[str]:
     priority = {"NOT": 3, "AND": 2, "OR": 1}
     output_queue = []
@@ -63,7 +124,12 @@ def resolve_operator(op: str, lhs: set[int], rhs: set[int] = None, full: set[int
         return set()
 
 
-def process_rpn_sequence(sequence: list[str], index: dict[str, set[int]], all_docs: set[int]) -> set[str]:
+def process_rpn_sequence(
+        sequence: list[str],
+        index: dict[str, set[int]],
+        all_docs: set[int] = None,
+        positional_index=None
+) -> set[str]:
     buffer = deque()
 
     for item in sequence:
@@ -76,32 +142,119 @@ def process_rpn_sequence(sequence: list[str], index: dict[str, set[int]], all_do
             operand = buffer.pop()
             result = resolve_operator("NOT", operand, full=all_docs)
             buffer.append(result)
+        elif is_phrase(item):
+            buffer.append(phrase_postings(phrase_words(item), index, positional_index))
         else:
             buffer.append(index.get(item, set()))
 
     return buffer[-1] if buffer else set()
 
 
-def boolean_search(query: str, inverted_index: dict[str, set[int]]) -> list[str]:
-    tokens = tokenize_query(query)
-    postfix = process_tokens(tokens)
+def boolean_search(
+        query: str,
+        inverted_index: dict[str, set[int]],
+        result_cache: QueryCache = None,
+        positional_index=None,
+        all_docs: set[int] = None
+) -> list[str]:
+    """all_docs is the universe of NOT; without it the universe is collected only for a plan with NOT."""
+    postfix = parse_query(query)
+
+    # result_cache must belong to this inverted_index
+    if result_cache is not None:
+        cached = result_cache.get(tuple(postfix))
+        if cached is not None:
+            return list(cached)
+
+    if all_docs is None and "NOT" in postfix:
+        all_docs = collect_article_ids(inverted_index)
+
+    result = sorted(process_rpn_sequence(postfix, inverted_index, all_docs, positional_index))
+    if result_cache is not None:
+        result_cache.put(tuple(postfix), tuple(result))
+    return result
+
+
+def collect_article_ids(inverted_index: dict[str, set[int]]) -> set[int]:
     article_ids = set()
+    bitmaps = []
 
     for index_article_ids in inverted_index.values():
-        article_ids.update(index_article_ids)
+        if isinstance(index_article_ids, RoaringBitmap):
+            bitmaps.append(index_article_ids)
+        else:
+            article_ids.update(index_article_ids)
+
+    if not bitmaps:
+        return article_ids
+
+    result = RoaringBitmap.from_iterable(article_ids)
+    for bitmap in bitmaps:
+        result = result | bitmap
+    return result
+
+
+def engine_search(query: str, engine: QueryEngine, result_cache: QueryCache = None) -> list[int]:
+    postfix = parse_query(query)
 
-    result = process_rpn_sequence(postfix, inverted_index, article_ids)
-    return sorted(result)
+    if result_cache is None:
+        return engine.search(postfix)
+
+    # result_cache must belong to this engine
+    cached = result_cache.get(tuple(postfix))
+    if cached is not None:
+        return list(cached)
+    result = engine.search(postfix)
+    result_cache.put(tuple(postfix), tuple(result))
+    return result
+
+
+def load_index(binary_file: str = "inverted_index.bin", csv_file: str = "inverted_index.csv"):
+    if os.path.exists(binary_file):
+        return BinaryIndex(binary_file)
+    return read_index_file(csv_file)
+
+
+def load_bitmap_index(
+        bitmap_density: float,
+        binary_file: str = "inverted_index.bin",
+        csv_file: str = "inverted_index.csv"
+) -> dict[str, set[int]]:
+    """Set postings with the dense ones as RoaringBitmap, from the same file load_index would read."""
+    if not os.path.exists(binary_file):
+        return read_index_file(csv_file, bitmap_density)
+    binary_index = BinaryIndex(binary_file)
+    try:
+        index = {term: set(binary_index.postings_at(position)) for position, term in enumerate(binary_index)}
+    finally:
+        binary_index.close()
+    return to_bitmap_postings(index, bitmap_density)
 
 
 def main():
-    inverted_index = read_index_file("inverted_index.csv")
+    parser = argparse.ArgumentParser(description="Boolean search over the inverted index")
+    parser.add_argument("--engine", choices=["sorted", "bitmap"], default="sorted")
+    parser.add_argument("--bitmap-density", type=float, default=0.05,
+                        help="share of documents above which postings are stored as bitmaps")
+    parser.add_argument("--cache-size", type=int, default=1024, help="query result cache size, 0 to disable")
+    args = parser.parse_args()
+
+    result_cache = QueryCache(maxsize=args.cache_size) if args.cache_size else None
+    positional_index = load_positional_index("positions.bin")
+
+    if args.engine == "bitmap":
+        inverted_index = load_bitmap_index(args.bitmap_density)
+        all_docs = collect_article_ids(inverted_index)
+        search = lambda query: boolean_search(query, inverted_index, result_cache, positional_index, all_docs)
+    else:
+        engine = QueryEngine(load_index(), positional_index)
+        search = lambda query: engine_search(query, engine, result_cache)
 
     while True:
         query = input("search query > ").strip()
 
         try:
-            result_articles = boolean_search(query, inverted_index)
+            result_articles = search(query)
             print(result_articles)
             print(f"\nFound {len(result_articles)} results\n")
         except Exception as e:
@@ -1,64 +1,194 @@
+import argparse
 import os
 import re
-from bs4 import BeautifulSoup
+import time
 import nltk
 from nltk.tokenize import word_tokenize
 from nltk.corpus import stopwords
 from nltk.stem import WordNetLemmatizer
-from collections import defaultdict
+from collections import defaultdict, OrderedDict
+from multiprocessing import Pool
 import pymorphy2
 
+from common.article_metadata import backfill
+from common.article_store import page_names
+from common.html_cleaner import load_page
+from common.metrics import metrics
+from inverted_index.positional_index import lemma_occurrences, write_positions_file
+
 eng_token_regex = re.compile(r'^[a-zA-Z]{2,}$')
 rus_token_regex = re.compile(r'^[а-яА-ЯёЁ]{2,}$')
+word_regex = re.compile(r'[^\W\d_]+')
 
-rus_lemmatizer = pymorphy2.MorphAnalyzer()
-eng_lemmatizer = WordNetLemmatizer()
+nltk_resources = {
+    'stopwords': 'corpora/stopwords',
+    'wordnet': 'corpora/wordnet',
+    'punkt_tab': 'tokenizers/punkt_tab',
+}
 
+lemma_cache_file = 'lemma_cache.tsv'
+lemma_cache_size = 200_000
 
-def lemmatize(tokens):
-    lemmas = defaultdict(set)
 
-    for token in tokens:
-        if eng_token_regex.match(token):
-            lemma = eng_lemmatizer.lemmatize(token)
-        elif rus_token_regex.match(token):
-            lemma = rus_lemmatizer.parse(token)[0].normal_form
-        else:
-            continue
+class LemmaCache:
+    """Ограниченный LRU-кэш token -> lemma с учётом новых записей для слияния между процессами."""
 
-        lemmas[lemma].add(token)
+    def __init__(self, maxsize=lemma_cache_size):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.new_entries = {}
+        self.hits = 0
+        self.misses = 0
 
-    return lemmas
+    def get(self, token):
+        lemma = self.entries.get(token)
+        if lemma is None:
+            self.misses += 1
+            return None
 
+        self.hits += 1
+        self.entries.move_to_end(token)
+        return lemma
 
-def extract_tokens(text):
-    eng_stop_words = set(stopwords.words('english'))
-    rus_stop_words = set(stopwords.words('russian'))
+    def put(self, token, lemma):
+        self.new_entries[token] = lemma
+        self.add(token, lemma)
 
-    tokenized_text = word_tokenize(text)
-    result_tokens = set()
+    def add(self, token, lemma):
+        self.entries[token] = lemma
+        self.entries.move_to_end(token)
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
 
-    for token in tokenized_text:
-        if eng_token_regex.fullmatch(token) and token not in eng_stop_words:
-            result_tokens.add(token)
-        elif rus_token_regex.fullmatch(token) and token not in rus_stop_words:
-            result_tokens.add(token)
+    def update(self, entries):
+        for token, lemma in entries.items():
+            self.add(token, lemma)
 
-    return result_tokens
+    def take_new_entries(self):
+        new_entries, self.new_entries = self.new_entries, {}
+        return new_entries
 
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def load(self, path):
+        if not os.path.exists(path):
+            return
+        with open(path, 'r', encoding='utf-8') as file:
+            for line in file:
+                parts = line.split()
+                if len(parts) == 2:
+                    self.add(parts[0], parts[1])
+
+    def save(self, path):
+        with open(path, 'w', encoding='utf-8') as file:
+            for token, lemma in self.entries.items():
+                file.write(f"{token} {lemma}\n")
+
+
+class TextPipeline:
+    """Токенизация и лемматизация: стоп-слова, регулярные выражения и анализаторы загружаются один раз.
+
+    tokenizer='nltk' использует word_tokenize, tokenizer='regex' - быстрый разбор на слова
+    регулярным выражением (дефисные слова в нём делятся на части).
+    """
+
+    def __init__(self, tokenizer='nltk', cache_entries=None):
+        self.tokenizer = tokenizer
+        self.eng_stop_words = frozenset(stopwords.words('english'))
+        self.rus_stop_words = frozenset(stopwords.words('russian'))
+
+        self.rus_lemmatizer = pymorphy2.MorphAnalyzer()
+        self.eng_lemmatizer = WordNetLemmatizer()
+
+        self.lemma_cache = LemmaCache()
+        if cache_entries:
+            self.lemma_cache.update(cache_entries)
+
+    def split_words(self, text):
+        if self.tokenizer == 'regex':
+            return word_regex.findall(text)
+        return word_tokenize(text)
+
+    def extract_tokens(self, text):
+        result_tokens = set()
+
+        for token in self.split_words(text):
+            if eng_token_regex.fullmatch(token) and token not in self.eng_stop_words:
+                result_tokens.add(token)
+            elif rus_token_regex.fullmatch(token) and token not in self.rus_stop_words:
+                result_tokens.add(token)
+
+        return result_tokens
+
+    def lemmatize(self, tokens):
+        lemmas = defaultdict(set)
+
+        for token in tokens:
+            lemma = self.lemma_cache.get(token)
+
+            if lemma is None:
+                if eng_token_regex.match(token):
+                    lemma = self.eng_lemmatizer.lemmatize(token)
+                elif rus_token_regex.match(token):
+                    lemma = self.rus_lemmatizer.parse(token)[0].normal_form
+                else:
+                    continue
+                self.lemma_cache.put(token, lemma)
+
+            lemmas[lemma].add(token)
+
+        return lemmas
+
+
+pipeline = None
+
+
+def ensure_nltk_data():
+    """Скачивает корпуса nltk, только если их ещё нет локально."""
+    for package, resource in nltk_resources.items():
+        try:
+            nltk.data.find(resource)
+        except LookupError:
+            nltk.download(package)
 
-def lemmatize_page(file_path):
-    filename = os.path.basename(file_path)
-    raw_html = open(file_path, 'r', encoding='utf-8').read()
 
-    soup = BeautifulSoup(raw_html, 'html.parser')
-    text = soup.get_text(separator=' ', strip=True)
+def init_pipeline(tokenizer='nltk', cache_entries=None):
+    """Создаёт TextPipeline; в режиме --workers вызывается один раз в каждом процессе."""
+    global pipeline
+    pipeline = TextPipeline(tokenizer, cache_entries)
 
-    tokens = extract_tokens(text.lower())
-    lemmas = lemmatize(tokens)
 
-    tokens_file = os.path.join('tokens', filename)
-    lemmas_file = os.path.join('lemmas', filename)
+def get_pipeline():
+    """TextPipeline процесса; без init_pipeline создаётся с настройками по умолчанию при первом вызове."""
+    if pipeline is None:
+        init_pipeline()
+    return pipeline
+
+
+def lemmatize(tokens):
+    return get_pipeline().lemmatize(tokens)
+
+
+def extract_tokens(text):
+    return get_pipeline().extract_tokens(text)
+
+
+def lemmatize_text(text):
+    """Токены и леммы (lemma -> множество словоформ) очищенного текста страницы."""
+    with metrics.span("lemmatize.tokenize"):
+        tokens = extract_tokens(text.lower())
+    with metrics.span("lemmatize.lemmatize"):
+        lemmas = lemmatize(tokens)
+    return tokens, lemmas
+
+
+def write_lemmatizer_files(output_dir, filename, tokens, lemmas, occurrences):
+    """Файлы tokens/, lemmas/ и positions/ одной страницы."""
+    tokens_file = os.path.join(output_dir, 'tokens', filename)
+    lemmas_file = os.path.join(output_dir, 'lemmas', filename)
+    positions_file = os.path.join(output_dir, 'positions', filename)
 
     with open(tokens_file, 'w', encoding='utf-8') as file:
         file.write('\n'.join(sorted(tokens)))
@@ -67,25 +197,95 @@ def lemmatize_page(file_path):
         for lemma, token_list in sorted(lemmas.items()):
             file.write(f"{lemma} {' '.join(sorted(token_list))}\n")
 
+    write_positions_file(positions_file, occurrences)
+
+
+def lemmatize_page(file_path, output_dir='.'):
+    filename = os.path.basename(file_path)
+    with metrics.span("lemmatize.load"):
+        text = load_page(file_path).text
+
+    tokens, lemmas = lemmatize_text(text)
+
+    with metrics.span("lemmatize.write"):
+        write_lemmatizer_files(output_dir, filename, tokens, lemmas, lemma_occurrences(text, lemmas))
+    metrics.count("lemmatize.pages")
+    metrics.count("lemmatize.tokens", len(tokens))
+
     print(f"[✓] {filename}: {len(tokens)} токенов, {len(lemmas)} лемм")
+    return len(tokens)
+
+
+def lemmatize_page_task(file_path):
+    """Задача для процесса-воркера: число токенов, статистика кэша, новые леммы и метрики для слияния."""
+    lemma_cache = get_pipeline().lemma_cache
+    hits, misses = lemma_cache.hits, lemma_cache.misses
+    try:
+        tokens_count = lemmatize_page(file_path)
+    except Exception as e:
+        print(f"[х] {os.path.basename(file_path)}: {str(e)}")
+        metrics.count("lemmatize.errors")
+        tokens_count = 0
+
+    return (
+        tokens_count,
+        lemma_cache.hits - hits,
+        lemma_cache.misses - misses,
+        lemma_cache.take_new_entries(),
+        metrics.drain(),
+    )
 
 
-def start_lemmatizing():
+def start_lemmatizing(workers=1, tokenizer='nltk'):
     saved_pages_path = '../scrapper/saved_pages'
+    file_paths = [os.path.join(saved_pages_path, filename) for filename in page_names(saved_pages_path)]
 
-    for filename in os.listdir(saved_pages_path):
-        try:
-            lemmatize_page(os.path.join(saved_pages_path, filename))
-        except Exception as e:
-            print(f"[х] {filename}: {str(e)}")
+    init_pipeline(tokenizer)
+    lemma_cache = get_pipeline().lemma_cache
+    lemma_cache.load(lemma_cache_file)
+
+    start_time = time.perf_counter()
+    tokens_count = hits = misses = 0
+
+    if workers > 1:
+        cache_entries = dict(lemma_cache.entries)
+        with Pool(workers, initializer=init_pipeline, initargs=(tokenizer, cache_entries)) as pool:
+            for page_tokens, page_hits, page_misses, new_entries, page_metrics in pool.imap_unordered(
+                    lemmatize_page_task, file_paths):
+                tokens_count += page_tokens
+                hits += page_hits
+                misses += page_misses
+                lemma_cache.update(new_entries)
+                metrics.merge(page_metrics)
+    else:
+        for file_path in file_paths:
+            page_tokens, _, _, _, page_metrics = lemmatize_page_task(file_path)
+            tokens_count += page_tokens
+            metrics.merge(page_metrics)
+        hits, misses = lemma_cache.hits, lemma_cache.misses
+
+    elapsed = time.perf_counter() - start_time
+    lemma_cache.save(lemma_cache_file)
+    backfill(saved_pages_path, '../scrapper/index.txt')
+
+    hit_rate = hits / (hits + misses) if hits + misses else 0.0
+    print(
+        f"Обработано {len(file_paths)} страниц, {tokens_count} токенов за {elapsed:.2f} сек. "
+        f"({tokens_count / elapsed if elapsed else 0:.0f} токенов/сек), попаданий в кэш лемм: {hit_rate:.1%}"
+    )
 
 
 if __name__ == "__main__":
-    nltk.download('stopwords')
-    nltk.download('wordnet')
-    nltk.download('punkt')
+    parser = argparse.ArgumentParser(description="Токенизация и лемматизация сохранённых страниц")
+    parser.add_argument("--workers", type=int, default=1, help="число процессов-воркеров")
+    parser.add_argument("--tokenizer", choices=["nltk", "regex"], default="nltk", help="способ разбиения текста на слова")
+    args = parser.parse_args()
+
+    ensure_nltk_data()
 
     os.makedirs('tokens', exist_ok=True)
     os.makedirs('lemmas', exist_ok=True)
+    os.makedirs('positions', exist_ok=True)
 
-    start_lemmatizing()
+    start_lemmatizing(args.workers, args.tokenizer)
+    print(metrics.summary_json())
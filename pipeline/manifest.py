@@ -0,0 +1,37 @@
+import hashlib
+import json
+from pathlib import Path
+
+
+def file_hash(*paths: Path) -> str:
+    digest = hashlib.sha1()
+    for path in paths:
+        digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+class Manifest:
+    """Per-stage content hashes of the documents each stage has already processed."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.stages = {}
+        if path.exists():
+            self.stages = json.loads(path.read_text(encoding="utf-8"))
+
+    def diff(self, stage: str, current: dict[str, str]) -> tuple[set[str], set[str]]:
+        """Returns (new or changed, removed) documents of the stage."""
+        known = self.stages.get(stage, {})
+        changed = {doc for doc, digest in current.items() if known.get(doc) != digest}
+        removed = set(known) - set(current)
+        return changed, removed
+
+    def commit(self, stage: str, current: dict[str, str]):
+        self.stages[stage] = dict(current)
+        self.path.write_text(json.dumps(self.stages, indent=1, sort_keys=True), encoding="utf-8")
+
+    def forget(self, *stages: str):
+        """Drops the stages: their next incremental run starts from scratch."""
+        for stage in stages:
+            self.stages.pop(stage, None)
+        self.path.write_text(json.dumps(self.stages, indent=1, sort_keys=True), encoding="utf-8")
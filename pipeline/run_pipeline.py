@@ -0,0 +1,192 @@
+"""Incremental run of scrapper -> lemmatizer -> indexer -> positions -> tf_idf.
+
+Each stage hashes its input documents and processes only the new or changed ones
+(see pipeline/manifest.json). Run from the repository root:
+
+    python -m pipeline.run_pipeline [--scrape] [--tokenizer regex]
+"""
+import argparse
+import contextlib
+import os
+from pathlib import Path
+
+from common.article_metadata import backfill
+from common.article_store import page_digests
+from common.metrics import metrics
+from common.tfidf_model import convert_tf_idf_dir
+from inverted_index.binary_index import write_binary_index
+from inverted_index.indexer import make_index, read_index_file, update_index, write_index_file
+from inverted_index.positional_index import write_positional_index
+from lemmatizer import lemmatizer
+from pipeline.manifest import Manifest, file_hash
+from tf_idf import tf_idf
+from tf_idf.builder import build_tf_idf
+
+PAGES_DIR = Path("scrapper/saved_pages")
+LEMMATIZER_DIR = Path("lemmatizer")
+TOKENS_DIR = LEMMATIZER_DIR / "tokens"
+LEMMAS_DIR = LEMMATIZER_DIR / "lemmas"
+POSITIONS_DIR = LEMMATIZER_DIR / "positions"
+SCRAPPER_INDEX_FILE = Path("scrapper/index.txt")
+INDEX_FILE = Path("inverted_index/inverted_index.csv")
+BINARY_INDEX_FILE = Path("inverted_index/inverted_index.bin")
+POSITIONAL_INDEX_FILE = Path("inverted_index/positions.bin")
+TF_IDF_TOKENS_DIR = Path("tf_idf/tokens")
+TF_IDF_LEMMAS_DIR = Path("tf_idf/lemmas")
+TF_IDF_STATE_FILE = Path("tf_idf/df_state.json")
+TF_IDF_MODEL_FILE = Path("tf_idf/model.bin")
+MANIFEST_FILE = Path("pipeline/manifest.json")
+
+
+@contextlib.contextmanager
+def working_dir(path: Path):
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+
+def hash_dir(directory: Path) -> dict[str, str]:
+    return {file.name: file_hash(file) for file in directory.iterdir()}
+
+
+def positions_digests(pages_dir: Path, positions_dir: Path) -> dict[str, str]:
+    """Document keys for positions.bin: its offsets depend on the page text, not only on the lemmas."""
+    pages = page_digests(str(pages_dir))
+    return {file.name: f"{pages.get(file.name, '')}:{file_hash(file)}" for file in positions_dir.iterdir()}
+
+
+def report(stage: str, changed: set[str], removed: set[str], total: int):
+    skipped = total - len(changed)
+    print(f"[{stage}] обработано {len(changed)}, удалено {len(removed)}, пропущено {skipped} документов")
+
+
+def run_scrapper(refresh: bool):
+    from scrapper import scrapper
+
+    with working_dir(Path("scrapper")):
+        os.makedirs(scrapper.saved_pages_dir, exist_ok=True)
+        scrapper.start_scraping(refresh=refresh)
+
+
+def run_lemmatizer(manifest: Manifest, tokenizer: str):
+    current = page_digests(str(PAGES_DIR))
+    changed, removed = manifest.diff("lemmatizer", current)
+
+    if changed:
+        lemmatizer.ensure_nltk_data()
+        lemmatizer.init_pipeline(tokenizer)
+        lemmatizer.get_pipeline().lemma_cache.load(LEMMATIZER_DIR / lemmatizer.lemma_cache_file)
+
+    TOKENS_DIR.mkdir(exist_ok=True)
+    LEMMAS_DIR.mkdir(exist_ok=True)
+    POSITIONS_DIR.mkdir(exist_ok=True)
+    for filename in sorted(changed):
+        lemmatizer.lemmatize_page(str(PAGES_DIR / filename), str(LEMMATIZER_DIR))
+    for filename in removed:
+        TOKENS_DIR.joinpath(filename).unlink(missing_ok=True)
+        LEMMAS_DIR.joinpath(filename).unlink(missing_ok=True)
+        POSITIONS_DIR.joinpath(filename).unlink(missing_ok=True)
+
+    if changed:
+        lemmatizer.get_pipeline().lemma_cache.save(LEMMATIZER_DIR / lemmatizer.lemma_cache_file)
+    backfill(str(PAGES_DIR), str(SCRAPPER_INDEX_FILE))
+
+    manifest.commit("lemmatizer", current)
+    report("lemmatizer", changed, removed, len(current))
+
+
+def run_indexer(manifest: Manifest):
+    current = hash_dir(LEMMAS_DIR)
+    changed, removed = manifest.diff("indexer", current)
+
+    index = None
+    if INDEX_FILE.exists() and "indexer" in manifest.stages:
+        if changed or removed:
+            index = update_index(read_index_file(str(INDEX_FILE)), str(LEMMAS_DIR), changed, removed)
+        elif not BINARY_INDEX_FILE.exists():
+            # without the .bin the searcher would silently fall back to the CSV
+            write_binary_index(read_index_file(str(INDEX_FILE)), str(BINARY_INDEX_FILE))
+    else:
+        index = make_index(str(LEMMAS_DIR))
+
+    if index is not None:
+        write_index_file(index, str(INDEX_FILE))
+        write_binary_index(index, str(BINARY_INDEX_FILE))
+
+    manifest.commit("indexer", current)
+    report("indexer", changed, removed, len(current))
+
+
+def run_positional_index(manifest: Manifest):
+    """Rebuilds positions.bin when the positions or the text of any page have changed: a re-fetched
+    page with the same lemmas still shifts the byte offsets of the highlights."""
+    if not POSITIONS_DIR.exists():
+        return
+    current = positions_digests(PAGES_DIR, POSITIONS_DIR)
+    changed, removed = manifest.diff("positions", current)
+
+    if changed or removed or not POSITIONAL_INDEX_FILE.exists():
+        write_positional_index(str(POSITIONS_DIR), str(PAGES_DIR), str(POSITIONAL_INDEX_FILE))
+
+    manifest.commit("positions", current)
+    report("positions", changed, removed, len(current))
+
+
+def run_tf_idf(manifest: Manifest):
+    current = {
+        file.name: file_hash(file, LEMMAS_DIR / file.name)
+        for file in TOKENS_DIR.iterdir()
+    }
+    changed, removed = manifest.diff("tf_idf", current)
+    TF_IDF_TOKENS_DIR.mkdir(parents=True, exist_ok=True)
+    TF_IDF_LEMMAS_DIR.mkdir(parents=True, exist_ok=True)
+
+    if not TF_IDF_STATE_FILE.exists() or "tf_idf" not in manifest.stages:
+        result = build_tf_idf(TOKENS_DIR, LEMMAS_DIR, TF_IDF_TOKENS_DIR, TF_IDF_LEMMAS_DIR, TF_IDF_MODEL_FILE)
+        total_docs = result["total_docs"]
+        tf_idf.save_df_state(TF_IDF_STATE_FILE, total_docs, result["token_df"], result["lemma_df"])
+        print(f"[tf_idf] полный пересчёт: {total_docs} документов")
+    elif changed or removed:
+        stats = tf_idf.update_tf_idf(
+            TOKENS_DIR, LEMMAS_DIR, changed, removed, TF_IDF_TOKENS_DIR, TF_IDF_LEMMAS_DIR, TF_IDF_STATE_FILE
+        )
+        print(
+            f"[tf_idf] изменился IDF у {stats['affected_terms']} термов, "
+            f"пересчитано {stats['recomputed']}, перезаписано {stats['rewritten']} документов"
+        )
+        convert_tf_idf_dir(str(TF_IDF_LEMMAS_DIR), str(TF_IDF_MODEL_FILE))
+    elif not TF_IDF_MODEL_FILE.exists():
+        convert_tf_idf_dir(str(TF_IDF_LEMMAS_DIR), str(TF_IDF_MODEL_FILE))
+
+    manifest.commit("tf_idf", current)
+    report("tf_idf", changed, removed, len(current))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incremental pipeline run")
+    parser.add_argument("--scrape", action="store_true", help="download new articles first")
+    parser.add_argument("--refresh", action="store_true", help="re-validate saved articles while scraping")
+    parser.add_argument("--tokenizer", choices=["nltk", "regex"], default="nltk")
+    args = parser.parse_args()
+
+    manifest = Manifest(MANIFEST_FILE)
+
+    if args.scrape:
+        with metrics.span("pipeline.scrapper"):
+            run_scrapper(args.refresh)
+    with metrics.span("pipeline.lemmatizer"):
+        run_lemmatizer(manifest, args.tokenizer)
+    with metrics.span("pipeline.indexer"):
+        run_indexer(manifest)
+    with metrics.span("pipeline.positions"):
+        run_positional_index(manifest)
+    with metrics.span("pipeline.tf_idf"):
+        run_tf_idf(manifest)
+    print(metrics.summary_json())
+
+
+if __name__ == "__main__":
+    main()
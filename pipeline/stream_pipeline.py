@@ -0,0 +1,375 @@
+"""Streaming run of scrapper -> lemmatizer -> indexer -> tf_idf.
+
+Pages flow through bounded queues instead of directories:
+
+    crawl threads -> fetched -> save thread -> texts -> lemmatizer processes -> accumulator
+
+The queues and the number of pages inside the lemmatizer pool are bounded, so a slow stage blocks
+the ones before it instead of buffering the corpus; network waits of the crawl overlap
+lemmatization. The accumulator keeps the inverted index and DF counts in memory, spills page texts
+and lemma positions to a temporary file and writes the same files as run_pipeline. Writing them
+is bounded like in run_pipeline, not by the queues: positions.bin is packed in memory from all
+page texts and positions, model.bin from the lemma weights of all pages. tokens/, lemmas/ and
+positions/ of the lemmatizer are written only with --keep-intermediate. Every run rebuilds the
+indexes from the saved and the new pages. Run from the repository root:
+
+    python -m pipeline.stream_pipeline [--tokenizer regex] [--workers 4] [--keep-intermediate]
+"""
+import argparse
+import os
+import pickle
+import queue
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from multiprocessing import Pool
+from pathlib import Path
+
+from common.article_metadata import backfill
+from common.article_store import page_digests, page_names
+from common.html_cleaner import load_page
+from common.metrics import metrics
+from inverted_index.binary_index import write_binary_index
+from inverted_index.indexer import document_number, write_index_file
+from inverted_index.positional_index import lemma_occurrences, pack_positional_index
+from lemmatizer import lemmatizer
+from pipeline.manifest import Manifest, file_hash
+from pipeline.run_pipeline import (
+    BINARY_INDEX_FILE, INDEX_FILE, LEMMAS_DIR, LEMMATIZER_DIR, MANIFEST_FILE, PAGES_DIR, POSITIONAL_INDEX_FILE,
+    POSITIONS_DIR, SCRAPPER_INDEX_FILE, TF_IDF_LEMMAS_DIR, TF_IDF_MODEL_FILE, TF_IDF_STATE_FILE, TF_IDF_TOKENS_DIR,
+    TOKENS_DIR, hash_dir, positions_digests, working_dir,
+)
+from scrapper import scrapper
+from tf_idf import tf_idf
+from tf_idf.builder import DEFAULT_CHUNK_SIZE, TfIdfBuilder
+
+# End of a queue.
+DONE = None
+
+# Pages waiting in each queue; pages inside the lemmatizer pool are limited to QUEUE_SIZE as well.
+QUEUE_SIZE = 64
+
+# How often a thread blocked on a queue or a semaphore checks the stop event, seconds.
+STOP_POLL = 0.1
+
+
+def put(items: queue.Queue, item, stop: threading.Event) -> bool:
+    """Queue.put that gives up once the run is stopped; False if the item was dropped."""
+    while not stop.is_set():
+        try:
+            items.put(item, timeout=STOP_POLL)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+def get(items: queue.Queue, stop: threading.Event):
+    """Queue.get that returns DONE once the run is stopped."""
+    while not stop.is_set():
+        try:
+            return items.get(timeout=STOP_POLL)
+        except queue.Empty:
+            pass
+    return DONE
+
+
+def acquire(slots: threading.Semaphore, stop: threading.Event) -> bool:
+    while not stop.is_set():
+        if slots.acquire(timeout=STOP_POLL):
+            return True
+    return False
+
+
+def drain(items: queue.Queue):
+    while True:
+        try:
+            items.get_nowait()
+        except queue.Empty:
+            return
+
+
+def crawl(engine: scrapper.CrawlEngine, visited: set, fetched: queue.Queue, max_in_flight: int,
+          stop: threading.Event):
+    """Listing pages, then the new articles; a fetch thread blocks while `fetched` is full."""
+    futures = []
+    try:
+        slots = threading.BoundedSemaphore(max_in_flight)
+
+        def fetch(article_id: str):
+            try:
+                if stop.is_set():
+                    return
+                html = engine.fetch(scrapper.article_url_template.format(article_id))
+                with metrics.span("stream.wait_fetched"):
+                    put(fetched, (article_id, html), stop)
+            finally:
+                slots.release()
+
+        for article_id in scrapper.find_new_articles(engine, visited):
+            if not acquire(slots, stop):
+                break
+            futures.append(engine.executor.submit(fetch, article_id))
+        for future in futures:
+            future.result()
+    finally:
+        if stop.is_set():
+            for future in futures:
+                future.cancel()
+        put(fetched, DONE, stop)
+
+
+def save_pages(existing: list, fetched: queue.Queue, texts: queue.Queue, last_index: int, stop: threading.Event):
+    """Texts of the already saved pages, then the fetched pages: cleaned, saved and passed on."""
+    try:
+        for filename in existing:
+            if not put(texts, (filename, load_page(os.path.join(scrapper.saved_pages_dir, filename)).text), stop):
+                return
+
+        while (item := get(fetched, stop)) is not DONE:
+            article_id, html = item
+            if html:
+                last_index += 1
+                page = scrapper.save_page(last_index, article_id, html)
+                with metrics.span("stream.wait_texts"):
+                    put(texts, (f"article_{article_id}.txt", page.text), stop)
+    except BaseException:
+        # the crawl must not block on a queue nobody reads
+        while get(fetched, stop) is not DONE:
+            pass
+        raise
+    finally:
+        put(texts, DONE, stop)
+
+
+def dispatch(texts: queue.Queue, pool, results: queue.Queue, slots: threading.Semaphore, in_flight: int,
+             stop: threading.Event, lemmatizer_dir: str = None):
+    """Hands the texts to the lemmatizer pool; the accumulator releases a slot per consumed result.
+
+    DONE is posted to `results` in any case, so the accumulator never waits for a dead dispatcher."""
+    try:
+        while (item := get(texts, stop)) is not DONE:
+            filename, text = item
+            if not acquire(slots, stop):
+                return
+            pool.apply_async(lemmatize_document_task, (filename, text, lemmatizer_dir),
+                             callback=results.put, error_callback=results.put)
+
+        # every slot is free again once the accumulator has taken the last result
+        for _ in range(in_flight):
+            if not acquire(slots, stop):
+                return
+    finally:
+        results.put(DONE)
+
+
+def lemmatize_document_task(filename: str, text: str, lemmatizer_dir: str = None):
+    """Pool task: text, tokens, lemmas and positions of a page, lemma cache statistics and metrics."""
+    lemma_cache = lemmatizer.get_pipeline().lemma_cache
+    hits, misses = lemma_cache.hits, lemma_cache.misses
+    try:
+        tokens, lemmas = lemmatizer.lemmatize_text(text)
+        occurrences = dict(lemma_occurrences(text, lemmas))
+        if lemmatizer_dir is not None:
+            with metrics.span("lemmatize.write"):
+                lemmatizer.write_lemmatizer_files(lemmatizer_dir, filename, tokens, lemmas, occurrences)
+        metrics.count("lemmatize.pages")
+        metrics.count("lemmatize.tokens", len(tokens))
+        document = (text, sorted(tokens), {lemma: len(forms) for lemma, forms in sorted(lemmas.items())}, occurrences)
+    except Exception as e:
+        print(f"[х] {filename}: {str(e)}")
+        metrics.count("lemmatize.errors")
+        document = None
+
+    return (
+        filename,
+        document,
+        lemma_cache.hits - hits,
+        lemma_cache.misses - misses,
+        lemma_cache.take_new_entries(),
+        metrics.drain(),
+    )
+
+
+class StreamAccumulator:
+    """Inverted index, TF-IDF counts and positions of the lemmatized pages, in arrival order.
+
+    Page texts and lemma occurrences are spilled to a temporary file as pages arrive and read back
+    only by write(); the inverted index and the lemma DF stay in memory.
+    """
+
+    def __init__(self, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        self.index = defaultdict(set)
+        self.tf_idf = TfIdfBuilder(chunk_size)
+        self.spill = tempfile.TemporaryFile(prefix="stream_positions_")
+        # (document number, offset of its record in spill)
+        self.documents = []
+
+    def add(self, filename: str, text: str, tokens: list, lemmas: dict, occurrences: dict):
+        """lemmas maps a lemma to its number of forms: every token counts once, as in the tokens/ files."""
+        number = document_number(filename)
+        for lemma in lemmas:
+            self.index[lemma].add(number)
+        self.tf_idf.add(filename, Counter(dict.fromkeys(tokens, 1)), lemmas)
+        self.documents.append((number, self.spill.tell()))
+        pickle.dump((filename, text, occurrences), self.spill, pickle.HIGHEST_PROTOCOL)
+
+    def spilled_documents(self):
+        """(filename, text, occurrences) of the spilled pages by document number, read one at a time."""
+        for _, offset in sorted(self.documents):
+            self.spill.seek(offset)
+            yield pickle.load(self.spill)
+
+    def write(self, root: Path) -> dict:
+        with metrics.span("index.write"):
+            write_index_file(self.index, str(root / INDEX_FILE))
+            write_binary_index(self.index, str(root / BINARY_INDEX_FILE))
+
+        (root / TF_IDF_TOKENS_DIR).mkdir(parents=True, exist_ok=True)
+        (root / TF_IDF_LEMMAS_DIR).mkdir(parents=True, exist_ok=True)
+        try:
+            with metrics.span("index.positions"):
+                pack_positional_index(self.spilled_documents(), str(root / POSITIONAL_INDEX_FILE))
+            result = self.tf_idf.finish(root / TF_IDF_TOKENS_DIR, root / TF_IDF_LEMMAS_DIR, root / TF_IDF_MODEL_FILE)
+        finally:
+            self.spill.close()
+            self.tf_idf.close()
+        tf_idf.save_df_state(root / TF_IDF_STATE_FILE, result["total_docs"], result["token_df"], result["lemma_df"])
+        return result
+
+
+def run_thread(errors: list, target, *args) -> threading.Thread:
+    def run():
+        try:
+            target(*args)
+        except BaseException as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+
+def run_stream(
+        root: Path = Path("."),
+        workers: int = os.cpu_count(),
+        tokenizer: str = "nltk",
+        keep_intermediate: bool = False,
+        queue_size: int = QUEUE_SIZE,
+        engine: scrapper.CrawlEngine = None
+) -> dict:
+    """Crawls new articles and rebuilds the inverted, positional and TF-IDF indexes under root in one pass."""
+    root = root.resolve()
+    start_time = time.perf_counter()
+    lemma_cache_path = root / LEMMATIZER_DIR / lemmatizer.lemma_cache_file
+    lemmatizer_dir = str(root / LEMMATIZER_DIR) if keep_intermediate else None
+    if keep_intermediate:
+        for directory in (TOKENS_DIR, LEMMAS_DIR, POSITIONS_DIR):
+            (root / directory).mkdir(parents=True, exist_ok=True)
+
+    lemmatizer.ensure_nltk_data()
+    lemmatizer.init_pipeline(tokenizer)
+    lemma_cache = lemmatizer.get_pipeline().lemma_cache
+    lemma_cache.load(lemma_cache_path)
+
+    fetched, texts, results = queue.Queue(queue_size), queue.Queue(queue_size), queue.Queue()
+    slots = threading.Semaphore(queue_size)
+    # set when the accumulator fails: the stages stop waiting on the queues and the crawl is cancelled
+    stop = threading.Event()
+    accumulator = StreamAccumulator()
+    pages = tokens_count = hits = misses = 0
+
+    # the pool is forked before the scrapper's working directory is entered
+    with Pool(workers, initializer=lemmatizer.init_pipeline, initargs=(tokenizer, dict(lemma_cache.entries))) as pool, \
+            working_dir(root / PAGES_DIR.parent):
+        os.makedirs(scrapper.saved_pages_dir, exist_ok=True)
+        own_engine = engine is None
+        if own_engine:
+            engine = scrapper.CrawlEngine(cache=scrapper.PageCache())
+
+        try:
+            existing = page_names(scrapper.saved_pages_dir)
+            visited, last_index = scrapper.load_visited_articles(scrapper.index_file_name)
+            errors = []
+            threads = [
+                run_thread(errors, crawl, engine, visited, fetched, engine.workers, stop),
+                run_thread(errors, save_pages, existing, fetched, texts, last_index, stop),
+                run_thread(errors, dispatch, texts, pool, results, slots, queue_size, stop, lemmatizer_dir),
+            ]
+
+            try:
+                while (result := results.get()) is not DONE:
+                    slots.release()
+                    if isinstance(result, BaseException):
+                        raise result
+                    filename, document, page_hits, page_misses, new_entries, page_metrics = result
+                    hits += page_hits
+                    misses += page_misses
+                    lemma_cache.update(new_entries)
+                    metrics.merge(page_metrics)
+                    if document is not None:
+                        text, tokens, lemmas, occurrences = document
+                        with metrics.span("stream.accumulate"):
+                            accumulator.add(filename, text, tokens, lemmas, occurrences)
+                        pages += 1
+                        tokens_count += len(tokens)
+            except BaseException:
+                stop.set()
+                # wake the threads blocked on a full queue; the rest notice the event within STOP_POLL
+                drain(fetched)
+                drain(texts)
+                raise
+
+            for thread in threads:
+                thread.join()
+            if errors:
+                raise errors[0]
+        finally:
+            if own_engine:
+                # after a failure the fetches still queued are cancelled instead of waited for
+                engine.close(wait=not stop.is_set())
+
+    result = accumulator.write(root)
+    lemma_cache.save(lemma_cache_path)
+    backfill(str(root / PAGES_DIR), str(root / SCRAPPER_INDEX_FILE))
+
+    manifest = Manifest(root / MANIFEST_FILE)
+    if keep_intermediate:
+        manifest.commit("lemmatizer", page_digests(str(root / PAGES_DIR)))
+        manifest.commit("indexer", hash_dir(root / LEMMAS_DIR))
+        manifest.commit("positions", positions_digests(root / PAGES_DIR, root / POSITIONS_DIR))
+        manifest.commit("tf_idf", {
+            file.name: file_hash(file, root / LEMMAS_DIR / file.name)
+            for file in (root / TOKENS_DIR).iterdir()
+        })
+    else:
+        # without tokens/ and lemmas/ the next incremental run has nothing to diff against
+        manifest.forget("lemmatizer", "indexer", "positions", "tf_idf")
+
+    elapsed = time.perf_counter() - start_time
+    hit_rate = hits / (hits + misses) if hits + misses else 0.0
+    print(
+        f"[stream] {pages} страниц ({pages - len(existing)} новых), {tokens_count} токенов, "
+        f"{len(accumulator.index)} лемм за {elapsed:.2f} сек., попаданий в кэш лемм: {hit_rate:.1%}"
+    )
+    return {"pages": pages, "new_pages": pages - len(existing), "tokens": tokens_count,
+            "total_docs": result["total_docs"], "seconds": elapsed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Streaming pipeline run: crawl, lemmatize and index in one pass")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="lemmatizer processes")
+    parser.add_argument("--tokenizer", choices=["nltk", "regex"], default="nltk")
+    parser.add_argument("--queue-size", type=int, default=QUEUE_SIZE, help="pages buffered between stages")
+    parser.add_argument("--keep-intermediate", action="store_true",
+                        help="also write lemmatizer/tokens, lemmas and positions (needed by run_pipeline)")
+    args = parser.parse_args()
+
+    with metrics.span("pipeline.stream"):
+        run_stream(Path("."), args.workers, args.tokenizer, args.keep_intermediate, args.queue_size)
+    print(metrics.summary_json())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,22 @@
+import argparse
+import hashlib
+import json
 import math
 import os
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
 import requests
+from requests.adapters import HTTPAdapter
 from bs4 import BeautifulSoup
 
+from common.article_metadata import open_store, page_metadata
+from common.article_store import extracted_store_path, open_article_store, store_path
+from common.html_cleaner import clean_html, extracted_path, write_extracted, DROPPED_TAGS
+from common.metrics import metrics
+
 # Настройки
 hub = "kotlin"
 base_url_template = f"https://habr.com/ru/hubs/{hub}/articles/top/yearly/page{{}}"
@@ -11,65 +24,306 @@ article_url_template = "https://habr.com/ru/articles/{}"
 
 saved_pages_dir = "saved_pages"
 
+# Страницы пишутся в сжатый pages.store рядом с saved_pages, а не отдельными файлами
+packed_store = True
+
 articles_per_page = 20
 required_articles_count = 160
 
 max_pages = math.ceil(required_articles_count / articles_per_page)
 
-# Задержка между запросами в секундах
-request_delay_seconds = 0.5
+# Количество одновременных запросов
+concurrency = 8
+
+# Ограничение частоты запросов к одному хосту (запросов в секунду и допустимый всплеск)
+requests_per_second = 2.0
+burst_size = 4
+
+# Повторы при ответах 429/5xx и ошибках соединения
+max_retries = 3
+backoff_seconds = 1.0
+retry_statuses = {429, 500, 502, 503, 504}
 
 # Файл индекса
 index_file_name = "index.txt"
 
+# Каталог HTTP-кэша с валидаторами ETag/Last-Modified
+http_cache_dir = "http_cache"
+
+
+class TokenBucket:
+    """Token bucket: не более rate запросов в секунду со всплеском до capacity."""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+
+                wait_seconds = (1 - self.tokens) / self.rate
+
+            time.sleep(wait_seconds)
+
+
+class HostRateLimiter:
+    """Отдельный token bucket на каждый хост."""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def acquire(self, url: str):
+        host = urlsplit(url).netloc
+        with self.lock:
+            bucket = self.buckets.get(host)
+            if bucket is None:
+                bucket = TokenBucket(self.rate, self.capacity)
+                self.buckets[host] = bucket
+        bucket.acquire()
+
+
+class PageCache:
+    """Дисковый кэш страниц по URL: тело ответа и валидаторы для условных запросов."""
+
+    def __init__(self, cache_dir: str = http_cache_dir):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self.lock = threading.Lock()
+
+    def paths(self, url: str):
+        key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, f"{key}.json"), os.path.join(self.cache_dir, f"{key}.html")
+
+    def validators(self, url: str) -> dict:
+        """Заголовки If-None-Match/If-Modified-Since для сохранённой версии страницы."""
+        meta_path, body_path = self.paths(url)
+        if not (os.path.exists(meta_path) and os.path.exists(body_path)):
+            return {}
+
+        with open(meta_path, "r", encoding="utf-8") as file:
+            meta = json.load(file)
+
+        headers = {}
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+        return headers
+
+    def load(self, url: str) -> str:
+        """Ответ 304: возвращает сохранённое тело страницы."""
+        body_path = self.paths(url)[1]
+        with open(body_path, "r", encoding="utf-8") as file:
+            html = file.read()
+
+        with self.lock:
+            self.hits += 1
+            self.bytes_saved += os.path.getsize(body_path)
+        return html
+
+    def store(self, url: str, response):
+        """Ответ 200: сохраняет тело и валидаторы, если сервер их прислал."""
+        with self.lock:
+            self.misses += 1
+
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if not etag and not last_modified:
+            return
+
+        meta_path, body_path = self.paths(url)
+        write_atomic(body_path, response.text)
+        write_atomic(meta_path, json.dumps({"url": url, "etag": etag, "last_modified": last_modified}))
+
+    def report(self) -> str:
+        return f"HTTP-кэш: попаданий {self.hits}, промахов {self.misses}, сэкономлено {self.bytes_saved} байт"
+
+
+def write_atomic(path: str, content: str):
+    tmp_path = f"{path}.tmp{threading.get_ident()}"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        file.write(content)
+    os.replace(tmp_path, path)
+
+
+class CrawlEngine:
+    """Параллельная загрузка страниц через общую keep-alive сессию."""
+
+    def __init__(
+            self,
+            workers: int = concurrency,
+            rate: float = requests_per_second,
+            burst: int = burst_size,
+            cache: PageCache = None
+    ):
+        self.workers = workers
+        self.rate_limiter = HostRateLimiter(rate, burst)
+        self.cache = cache
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+
+    def fetch(self, url: str):
+        """Загрузка страницы с повторами и экспоненциальной задержкой."""
+        return self.fetch_page(url)[0]
+
+    def fetch_page(self, url: str):
+        """Загрузка страницы; второй элемент результата True, если сервер ответил 304."""
+        with metrics.span("scrape.fetch"):
+            return self.fetch_with_retries(url)
+
+    def fetch_with_retries(self, url: str):
+        headers = self.cache.validators(url) if self.cache else {}
+
+        for attempt in range(max_retries + 1):
+            self.rate_limiter.acquire(url)
+            try:
+                response = self.session.get(url, headers=headers, timeout=10)
+            except requests.RequestException as e:
+                if attempt == max_retries:
+                    print(f"[x] Ошибка при скачивании {url}: {e}")
+                    return None, False
+                time.sleep(backoff_seconds * 2 ** attempt)
+                continue
+
+            if response.status_code in retry_statuses and attempt < max_retries:
+                time.sleep(retry_delay(response, attempt))
+                continue
+
+            if response.status_code == 304 and headers:
+                metrics.count("scrape.not_modified")
+                return self.cache.load(url), True
+
+            try:
+                response.raise_for_status()
+            except requests.HTTPError as e:
+                print(f"[x] Ошибка при скачивании {url}: {e}")
+                return None, False
 
-def start_scraping():
-    """Запуск синхронного сканирования и скачивания статей."""
+            if self.cache:
+                self.cache.store(url, response)
+            return response.text, False
+
+        return None, False
+
+    def fetch_all(self, urls: list):
+        """Параллельная загрузка, результаты возвращаются в порядке urls."""
+        return self.executor.map(self.fetch, urls)
+
+    def fetch_all_pages(self, urls: list):
+        """Как fetch_all, но с признаком ответа 304 для каждой страницы."""
+        return self.executor.map(self.fetch_page, urls)
+
+    def close(self, wait: bool = True):
+        """wait=False отменяет ещё не начатые загрузки и не ждёт текущие."""
+        self.executor.shutdown(wait=wait, cancel_futures=not wait)
+        self.session.close()
+
+
+def retry_delay(response, attempt: int) -> float:
+    """Задержка перед повтором: Retry-After, если сервер его прислал, иначе экспоненциальная."""
+    retry_after = response.headers.get("Retry-After")
+    if retry_after and retry_after.isdigit():
+        return float(retry_after)
+    return backoff_seconds * 2 ** attempt
+
+
+def start_scraping(engine: CrawlEngine = None, refresh: bool = False):
+    """Запуск параллельного сканирования и скачивания статей.
+
+    В режиме refresh уже сохранённые статьи перепроверяются условными запросами
+    и перезаписываются, только если сервер вернул новую версию.
+    """
     already_loaded_or_visited, last_index = load_visited_articles(index_file_name)
     visited_count = 0
     saved_count = 0
 
-    # Обход страниц /pageN/
-    for page_number in range(1, max_pages + 1):
-        page_url = base_url_template.format(page_number)
-        print(f"Сканируется {page_url}")
-
-        article_ids = extract_article_ids(page_url)
-        for article_id in article_ids:
-            article_url = article_url_template.format(article_id)
+    own_engine = engine is None
+    if own_engine:
+        engine = CrawlEngine(cache=PageCache())
 
-            if article_url in already_loaded_or_visited:
-                continue
+    try:
+        if refresh:
+            refresh_saved_articles(engine, already_loaded_or_visited)
 
-            article_html = get_page(article_url)
+        pending_ids = find_new_articles(engine, already_loaded_or_visited)
+        pending_urls = [article_url_template.format(article_id) for article_id in pending_ids]
+        for article_id, article_html in zip(pending_ids, engine.fetch_all(pending_urls)):
             visited_count += 1
 
-            already_loaded_or_visited.add(article_url)
-
             if article_html:
                 saved_count += 1
                 last_index += 1
                 save_page(last_index, article_id, article_html)
-
-            time.sleep(request_delay_seconds)
+    finally:
+        if own_engine:
+            engine.close()
 
     print(f"Загрузка завершена: посещено {visited_count} страниц, скачано {saved_count} статей. Всего статей в индексе: {last_index}")
+    if engine.cache:
+        print(engine.cache.report())
 
 
-def get_page(url: str):
-    """Загрузка страницы."""
-    try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        return response.text
-    except Exception as e:
-        print(f"[x] Ошибка при скачивании {url}: {e}")
-        return None
+def find_new_articles(engine: CrawlEngine, already_loaded_or_visited: set) -> list:
+    """Обходит страницы /pageN/ и возвращает ID ещё не скачанных статей, добавляя их URL в посещённые."""
+    page_urls = [base_url_template.format(page_number) for page_number in range(1, max_pages + 1)]
+    article_ids = []
+    for page_url, page_html in zip(page_urls, engine.fetch_all(page_urls)):
+        print(f"Сканируется {page_url}")
+        article_ids.extend(extract_article_ids(page_url, page_html))
+
+    pending_ids = []
+    for article_id in article_ids:
+        article_url = article_url_template.format(article_id)
+
+        if article_url in already_loaded_or_visited:
+            continue
+
+        already_loaded_or_visited.add(article_url)
+        pending_ids.append(article_id)
+    return pending_ids
+
+
+def refresh_saved_articles(engine: CrawlEngine, article_urls: set):
+    """Перепроверка сохранённых статей: 304 пропускается, новая версия перезаписывается."""
+    urls = sorted(article_urls)
+    unchanged_count = 0
+    updated_count = 0
+
+    for article_url, (article_html, not_modified) in zip(urls, engine.fetch_all_pages(urls)):
+        if not_modified:
+            unchanged_count += 1
+        elif article_html:
+            updated_count += 1
+            write_page(article_url.rstrip("/").rsplit("/", 1)[-1], article_html)
 
+    print(f"Перепроверка завершена: без изменений {unchanged_count}, обновлено {updated_count} статей")
 
-def extract_article_ids(page_url: str):
-    """Извлекает ID статей из списка статей на странице."""
-    html = get_page(page_url)
+
+def extract_article_ids(page_url: str, html: str = None):
+    """Извлекает ID статей из списка статей на странице; неудачно загруженный список считается пустым."""
     if not html:
         return []
 
@@ -90,26 +344,49 @@ def extract_article_ids(page_url: str):
 
 def remove_tags(text: str, tags: list) -> str:
     """Очищение HTML от выбранных тегов"""
-    soup = BeautifulSoup(text, "html.parser")
-    for tag in soup(tags):
-        tag.decompose()
-    return str(BeautifulSoup(str(soup), 'html.parser'))
+    return clean_html(text, tags).html
 
 
 def save_page(index: int, article_id: str, html: str):
-    """Сохраняет страницу и обновляет index.txt."""
-    file_name = f"article_{article_id}.txt"
-    file_path = os.path.join(saved_pages_dir, file_name)
-
-    cleaned_html = remove_tags(html, ["script", "style", "link", "meta"])
-
-    with open(file_path, "w", encoding="utf-8") as page_file:
-        page_file.write(cleaned_html)
+    """Сохраняет страницу и обновляет index.txt; возвращает очищенную страницу."""
+    page = write_page(article_id, html)
 
     with open(index_file_name, "a", encoding="utf-8") as file:
         file.write(f"{index}: {article_url_template.format(article_id)}\n")
 
     print(f"[✓] Статья {article_id} сохранена.")
+    return page
+
+
+def write_page(article_id: str, html: str):
+    """Сохраняет очищенную страницу в pages.store (или saved_pages), заголовок и текст в extracted,
+    метаданные в articles.sqlite. Возвращает очищенную страницу."""
+    file_name = f"article_{article_id}.txt"
+    file_path = os.path.join(saved_pages_dir, file_name)
+
+    with metrics.span("scrape.clean"):
+        page = clean_html(html, DROPPED_TAGS)
+
+    with metrics.span("scrape.save"):
+        if packed_store:
+            open_article_store(store_path(saved_pages_dir), create=True).put_text(file_name, page.html)
+            # старая версия статьи отдельными файлами больше не должна читаться
+            for stale_path in (file_path, extracted_path(file_path)):
+                if os.path.exists(stale_path):
+                    os.remove(stale_path)
+        else:
+            with open(file_path, "w", encoding="utf-8") as page_file:
+                page_file.write(page.html)
+            # файл и так читается раньше pages.store, но упакованная версия не должна всплыть после его удаления
+            for stale_store in (store_path(saved_pages_dir), extracted_store_path(saved_pages_dir)):
+                store = open_article_store(stale_store)
+                if store is not None:
+                    store.delete(file_name)
+
+        write_extracted(file_path, page, packed=packed_store)
+        open_store(saved_pages_dir).put(page_metadata(file_name, article_url_template.format(article_id), page))
+    metrics.count("scrape.pages_saved")
+    return page
 
 
 def load_visited_articles(index_file: str):
@@ -127,5 +404,14 @@ def load_visited_articles(index_file: str):
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Скачивание статей хаба Habr")
+    parser.add_argument("--refresh", action="store_true", help="перепроверить уже сохранённые статьи")
+    parser.add_argument("--loose-files", action="store_true",
+                        help="сохранять страницы отдельными файлами в saved_pages вместо pages.store")
+    args = parser.parse_args()
+
+    packed_store = not args.loose_files
+
     os.makedirs(saved_pages_dir, exist_ok=True)
-    start_scraping()
+    start_scraping(refresh=args.refresh)
+    print(metrics.summary_json())
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# repository modules are imported from its root, as with python -m run from the root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,85 @@
+"""CrawlEngine against the local stub server: retries of 429/5xx answers and resuming from index.txt."""
+import contextlib
+import io
+import os
+
+import pytest
+
+from benchmarks.stub_server import start_stub_server
+from common.article_store import page_names
+from scrapper import scrapper
+
+PAGES = 2
+ARTICLES = PAGES * 20
+
+
+@pytest.fixture
+def crawl_dir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs(scrapper.saved_pages_dir)
+    monkeypatch.setattr(scrapper, "max_pages", PAGES)
+    monkeypatch.setattr(scrapper, "backoff_seconds", 0)
+    return tmp_path
+
+
+def crawl(monkeypatch, server):
+    monkeypatch.setattr(scrapper, "base_url_template",
+                        f"{server.base_url}/ru/hubs/{scrapper.hub}/articles/top/yearly/page{{}}")
+    monkeypatch.setattr(scrapper, "article_url_template", f"{server.base_url}/ru/articles/{{}}")
+    # one thread: the failed responses (every third) fall on different URLs, so no URL runs out of retries
+    engine = scrapper.CrawlEngine(workers=1, rate=1000.0, burst=1)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            scrapper.start_scraping(engine)
+    finally:
+        engine.close()
+
+
+def index_lines() -> list:
+    if not os.path.exists(scrapper.index_file_name):
+        return []
+    with open(scrapper.index_file_name, "r", encoding="utf-8") as file:
+        return file.read().splitlines()
+
+
+@pytest.mark.parametrize("fail_status", [429, 503])
+def test_failed_responses_are_retried(crawl_dir, monkeypatch, fail_status):
+    server = start_stub_server(fail_every=3, fail_status=fail_status)
+    try:
+        crawl(monkeypatch, server)
+    finally:
+        server.shutdown()
+
+    assert len(page_names(scrapper.saved_pages_dir)) == ARTICLES
+    assert len(index_lines()) == ARTICLES
+    # every third request failed and was repeated
+    assert server.requests_count > PAGES + ARTICLES
+
+
+def test_crawl_resumes_from_index(crawl_dir, monkeypatch):
+    server = start_stub_server()
+    try:
+        crawl(monkeypatch, server)
+        first_lines = index_lines()
+        first_requests = server.requests_count
+
+        crawl(monkeypatch, server)
+    finally:
+        server.shutdown()
+
+    assert len(first_lines) == ARTICLES
+    # the second run only reads the listings: every article is already in index.txt
+    assert server.requests_count - first_requests == PAGES
+    assert index_lines() == first_lines
+
+
+def test_failed_listing_is_empty(crawl_dir, monkeypatch):
+    server = start_stub_server(fail_every=1, fail_status=503)
+    try:
+        crawl(monkeypatch, server)
+    finally:
+        server.shutdown()
+
+    # only the engine's throttled attempts, no unthrottled fallback request
+    assert server.requests_count == PAGES * (scrapper.max_retries + 1)
+    assert index_lines() == []
@@ -0,0 +1,49 @@
+"""Phrase matching over positions.bin, including phrases with stopwords that have no postings."""
+import pytest
+
+from inverted_index.positional_index import PHRASE_GAP, PositionalIndex, lemma_occurrences, pack_positional_index
+
+STOP_WORDS = {"of", "the", "a", "in"}
+
+TEXTS = {
+    "article_1.txt": "Kotlin is the state of the art in coroutines",
+    "article_2.txt": "The state of art is a matter of taste",
+    "article_3.txt": "Art of the state: state art",
+    "article_4.txt": "Coroutines in Kotlin",
+}
+
+
+def page_lemmas(text: str) -> dict:
+    """Lemmas as the lemmatizer writes them: stopwords dropped, every word its own lemma."""
+    lemmas = {}
+    for word in text.replace(":", "").split():
+        if word.lower() not in STOP_WORDS:
+            lemmas.setdefault(word.lower(), set()).add(word.lower())
+    return lemmas
+
+
+@pytest.fixture(scope="module")
+def positional_index(tmp_path_factory):
+    path = tmp_path_factory.mktemp("positions") / "positions.bin"
+    documents = [(name, text, lemma_occurrences(text, page_lemmas(text))) for name, text in TEXTS.items()]
+    pack_positional_index(documents, str(path))
+    return PositionalIndex(str(path))
+
+
+@pytest.mark.parametrize("terms, expected", [
+    (["state", "art"], [3]),
+    (["kotlin", "is"], [1]),
+    (["coroutines", "in", "kotlin"], []),
+    (["coroutines", PHRASE_GAP, "kotlin"], [4]),
+    # "state of the art"
+    (["state", PHRASE_GAP, PHRASE_GAP, "art"], [1]),
+    # "state of art": "state state art" in article 3 matches as well
+    (["state", PHRASE_GAP, "art"], [2, 3]),
+    # "art of the state"
+    (["art", PHRASE_GAP, PHRASE_GAP, "state"], [3]),
+    ([PHRASE_GAP, "state", PHRASE_GAP], [1, 2, 3]),
+    ([PHRASE_GAP, PHRASE_GAP], []),
+    (["state", "unknown"], []),
+])
+def test_phrase_docs(positional_index, terms, expected):
+    assert positional_index.phrase_docs(terms) == expected
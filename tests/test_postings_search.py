@@ -0,0 +1,76 @@
+"""MaxScore top-k of PostingsSearchEngine against the exhaustive scorers: same ids, scores and tie order."""
+import itertools
+import random
+
+import pytest
+
+from vector_search.matrix_search import MatrixSearchEngine
+from vector_search.postings_search import PostingsSearchEngine
+from vector_search.vector_search import rank_articles
+
+# Different summation order of the cosine, the ranking itself must be identical.
+TOLERANCE = 1e-12
+
+TERMS = [f"term{number}" for number in range(12)]
+
+
+def synthetic_corpus(seed: int = 7, docs: int = 40) -> dict:
+    """Random sparse vectors; every fifth article is a copy of the previous one, so some scores tie exactly."""
+    rng = random.Random(seed)
+    vectors = {}
+    for number in range(docs):
+        if number % 5 == 4:
+            vector = dict(vectors[f"article_{number - 1}.txt"])
+        else:
+            terms = rng.sample(TERMS, rng.randint(1, 6))
+            vector = {term: rng.uniform(0.01, 1.0) for term in terms}
+        vectors[f"article_{number}.txt"] = vector
+    return vectors
+
+
+def queries(seed: int = 11) -> list:
+    """1 to 5 term queries; "missing" is not in the corpus."""
+    rng = random.Random(seed)
+    result = []
+    for length in range(1, 6):
+        for _ in range(8):
+            terms = rng.sample(TERMS + ["missing"], length)
+            result.append({term: rng.uniform(0.1, 2.0) for term in terms})
+    return result
+
+
+CORPUS = synthetic_corpus()
+IDF = {term: 1.0 for term in TERMS}
+
+
+@pytest.fixture(scope="module")
+def engines():
+    return PostingsSearchEngine.from_vectors(CORPUS, IDF), MatrixSearchEngine.from_vectors(CORPUS, IDF)
+
+
+def assert_same_top(expected_count, expected_top, count, top):
+    assert count == expected_count
+    assert [article_id for article_id, _ in top] == [article_id for article_id, _ in expected_top]
+    for (_, expected_score), (_, score) in zip(expected_top, top):
+        assert score == pytest.approx(expected_score, rel=TOLERANCE, abs=TOLERANCE)
+
+
+@pytest.mark.parametrize("query_number, articles_count", list(itertools.product(range(len(queries())), [1, 3, 10, 100])))
+def test_postings_top_matches_exhaustive(engines, query_number, articles_count):
+    postings_engine, matrix_engine = engines
+    query_vector = queries()[query_number]
+
+    ranked = rank_articles(query_vector, CORPUS)
+    postings_count, postings_top = postings_engine.top(query_vector, articles_count)
+    assert_same_top(len(ranked), ranked[:articles_count], postings_count, postings_top)
+
+    matrix_count, matrix_top = matrix_engine.top(query_vector, articles_count)
+    assert_same_top(matrix_count, matrix_top, postings_count, postings_top)
+
+
+def test_ties_keep_article_order(engines):
+    postings_engine, _ = engines
+    query_vector = dict(CORPUS["article_3.txt"])
+    _, top = postings_engine.top(query_vector, 2)
+    assert [article_id for article_id, _ in top] == ["article_3.txt", "article_4.txt"]
+    assert top[0][1] == top[1][1]
@@ -0,0 +1,75 @@
+"""Scatter-gather top-k over 1, 2 and N shards against MatrixSearchEngine on the unsharded model."""
+import random
+
+import pytest
+
+from common.shards import write_shards
+from common.tfidf_model import TfIdfModel, write_model_from_vectors
+from inverted_index.binary_index import write_binary_index
+from inverted_index.indexer import document_number
+from vector_search.matrix_search import MatrixSearchEngine
+from vector_search.sharded_search import ShardedSearchEngine
+
+DOCS = 60
+TERMS = [f"term{number}" for number in range(15)]
+
+
+def synthetic_corpus(seed: int = 3) -> dict:
+    """Articles in shuffled number order; every fourth one copies an earlier article, so scores tie
+    across shards and the order of the ties comes from the rows of the full model."""
+    rng = random.Random(seed)
+    numbers = rng.sample(range(1000, 9000), DOCS)
+    vectors = {}
+    for position, number in enumerate(numbers):
+        if position % 4 == 3:
+            vector = dict(rng.choice(list(vectors.values())))
+        else:
+            vector = {term: rng.uniform(0.01, 1.0) for term in rng.sample(TERMS, rng.randint(1, 5))}
+        vectors[f"article_{number}.txt"] = vector
+    return vectors
+
+
+def queries(seed: int = 5) -> list:
+    rng = random.Random(seed)
+    return [
+        {term: rng.uniform(0.1, 2.0) for term in rng.sample(TERMS, length)}
+        for length in range(1, 5) for _ in range(6)
+    ]
+
+
+@pytest.fixture(scope="module")
+def model_files(tmp_path_factory):
+    work_dir = tmp_path_factory.mktemp("model")
+    vectors = synthetic_corpus()
+    model_file, index_file = work_dir / "model.bin", work_dir / "inverted_index.bin"
+    write_model_from_vectors(str(model_file), vectors, {term: 1.0 for term in TERMS})
+
+    index = {}
+    for article_id, vector in vectors.items():
+        for term in vector:
+            index.setdefault(term, set()).add(document_number(article_id))
+    write_binary_index(index, str(index_file))
+    return work_dir, model_file, index_file
+
+
+@pytest.mark.parametrize("shards", [1, 2, 7])
+def test_sharded_top_matches_unsharded(model_files, shards):
+    work_dir, model_file, index_file = model_files
+    model = TfIdfModel(str(model_file))
+    engine = MatrixSearchEngine.from_model(model)
+    rows = {article_id: row for row, article_id in enumerate(model.article_ids)}
+
+    shards_dir = work_dir / f"shards_{shards}"
+    write_shards(str(model_file), str(index_file), str(work_dir / "positions.bin"), str(shards_dir), shards)
+    sharded = ShardedSearchEngine(str(shards_dir))
+    try:
+        for query_vector in queries():
+            for articles_count in (1, 5, DOCS):
+                expected_count, expected_rows, expected_scores = engine.top_rows(query_vector, articles_count)
+                count, top = sharded.top(query_vector, articles_count)
+
+                assert count == expected_count
+                assert [rows[article_id] for article_id, _ in top] == expected_rows.tolist()
+                assert [score for _, score in top] == expected_scores.tolist()
+    finally:
+        sharded.close()
@@ -0,0 +1,121 @@
+"""The chunked NumPy builder writes the same IDF and TF-IDF as compute_and_write_tf_idf_*."""
+from pathlib import Path
+
+import pytest
+
+from benchmarks.bench_tf_idf import write_synthetic_corpus
+from common.tfidf_model import TfIdfModel
+from tf_idf import tf_idf
+from tf_idf.builder import build_tf_idf
+
+# Both builds write values with 6 decimals, a last-digit rounding difference is allowed.
+TOLERANCE = 2e-6
+
+DOCUMENTS = {
+    "article_1.txt": (
+        ["kotlin", "kotlin", "корутины", "корутина", "flow"],
+        {"kotlin": ["kotlin"], "корутина": ["корутины", "корутина"], "flow": ["flow"]},
+    ),
+    "article_2.txt": (
+        ["kotlin", "java", "java", "сборка"],
+        {"kotlin": ["kotlin"], "java": ["java"], "сборка": ["сборка"], "gradle": ["gradle"]},
+    ),
+    "article_3.txt": (
+        ["flow", "корутины", "channel", "channel", "channel"],
+        {"flow": ["flow"], "корутина": ["корутины"], "channel": ["channel"]},
+    ),
+    "article_4.txt": (
+        ["сборки", "сборка", "gradle", "kotlin"],
+        {"сборка": ["сборки", "сборка"], "gradle": ["gradle"], "kotlin": ["kotlin"]},
+    ),
+    "article_5.txt": ([], {}),
+}
+
+
+def write_corpus(token_dir: Path, lemma_dir: Path):
+    token_dir.mkdir()
+    lemma_dir.mkdir()
+    for fname, (tokens, lemmas) in DOCUMENTS.items():
+        token_dir.joinpath(fname).write_text("\n".join(tokens), encoding="utf-8")
+        lemma_dir.joinpath(fname).write_text(
+            "".join(f"{lemma} {' '.join(forms)}\n" for lemma, forms in lemmas.items()), encoding="utf-8"
+        )
+
+
+def build_reference(token_dir: Path, lemma_dir: Path, output_dir: Path):
+    output_token_dir, output_lemma_dir = output_dir / "tokens", output_dir / "lemmas"
+    output_token_dir.mkdir(parents=True)
+    output_lemma_dir.mkdir(parents=True)
+
+    doc_token_counts, token_df = tf_idf.load_token_data(token_dir)
+    doc_lemma_tokens, lemma_doc_set = tf_idf.load_lemma_data(lemma_dir, doc_token_counts)
+    total_docs = len(doc_token_counts)
+    tf_idf.compute_and_write_tf_idf_tokens(doc_token_counts, token_df, total_docs, output_token_dir)
+    tf_idf.compute_and_write_tf_idf_lemmas(
+        doc_token_counts, doc_lemma_tokens, lemma_doc_set, total_docs, output_lemma_dir
+    )
+    return token_df, {lemma: len(docs) for lemma, docs in lemma_doc_set.items()}
+
+
+def build_chunked(token_dir: Path, lemma_dir: Path, output_dir: Path, chunk_size: int):
+    output_token_dir, output_lemma_dir = output_dir / "tokens", output_dir / "lemmas"
+    output_token_dir.mkdir(parents=True)
+    output_lemma_dir.mkdir(parents=True)
+    return build_tf_idf(token_dir, lemma_dir, output_token_dir, output_lemma_dir, output_dir / "model.bin",
+                        chunk_size)
+
+
+def read_weights(output_dir: Path) -> dict:
+    """file name -> term -> (idf, tf-idf)"""
+    weights = {}
+    for file in output_dir.iterdir():
+        weights[file.name] = {}
+        for line in file.read_text(encoding="utf-8").splitlines():
+            term, idf, tf_idf_value = line.split()
+            weights[file.name][term] = (float(idf), float(tf_idf_value))
+    return weights
+
+
+def assert_same_weights(expected_dir: Path, actual_dir: Path):
+    expected, actual = read_weights(expected_dir), read_weights(actual_dir)
+    assert actual.keys() == expected.keys()
+    for fname, expected_terms in expected.items():
+        assert actual[fname].keys() == expected_terms.keys(), fname
+        for term, (idf, tf_idf_value) in expected_terms.items():
+            assert actual[fname][term][0] == pytest.approx(idf, abs=TOLERANCE), (fname, term)
+            assert actual[fname][term][1] == pytest.approx(tf_idf_value, abs=TOLERANCE), (fname, term)
+
+
+@pytest.mark.parametrize("chunk_size", [1000, 2, 1])
+def test_builder_matches_reference(tmp_path, chunk_size):
+    token_dir, lemma_dir = tmp_path / "tokens", tmp_path / "lemmas"
+    write_corpus(token_dir, lemma_dir)
+
+    token_df, lemma_df = build_reference(token_dir, lemma_dir, tmp_path / "reference")
+    result = build_chunked(token_dir, lemma_dir, tmp_path / "chunked", chunk_size)
+
+    assert result["total_docs"] == len(DOCUMENTS)
+    assert result["token_df"] == token_df
+    assert result["lemma_df"] == lemma_df
+    for kind in ("tokens", "lemmas"):
+        assert_same_weights(tmp_path / "reference" / kind, tmp_path / "chunked" / kind)
+
+
+def test_model_matches_lemma_files(tmp_path):
+    token_dir, lemma_dir = tmp_path / "tokens", tmp_path / "lemmas"
+    write_synthetic_corpus(token_dir, lemma_dir, docs=60, vocabulary=500, tokens_per_doc=40)
+
+    build_reference(token_dir, lemma_dir, tmp_path / "reference")
+    build_chunked(token_dir, lemma_dir, tmp_path / "chunked", chunk_size=7)
+    for kind in ("tokens", "lemmas"):
+        assert_same_weights(tmp_path / "reference" / kind, tmp_path / "chunked" / kind)
+
+    expected = read_weights(tmp_path / "reference" / "lemmas")
+    model = TfIdfModel(str(tmp_path / "chunked" / "model.bin"))
+    model_idf = model.idf_dict()
+    assert sorted(model.article_ids) == sorted(expected)
+    for fname, vector in model.articles_vectors().items():
+        assert vector.keys() == expected[fname].keys(), fname
+        for term, weight in vector.items():
+            assert weight == pytest.approx(expected[fname][term][1], abs=1e-5), (fname, term)
+            assert model_idf[term] == pytest.approx(expected[fname][term][0], abs=TOLERANCE)
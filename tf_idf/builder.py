@@ -0,0 +1,244 @@
+import os
+import tempfile
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from common.metrics import metrics
+from common.tfidf_model import write_model
+
+# Documents per chunk: while reading, term ids and counts of one chunk are held in memory and the rest
+# are spilled. Writing model.bin is not bounded by it, see TfIdfBuilder.finish.
+DEFAULT_CHUNK_SIZE = 1000
+
+
+class TermIds:
+    """Interns terms to consecutive integer ids and keeps their document frequencies."""
+
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+        self.terms: List[str] = []
+        self.df = np.zeros(0, dtype=np.int64)
+
+    def intern(self, terms) -> np.ndarray:
+        ids = self.ids
+        for term in terms:
+            if term not in ids:
+                ids[term] = len(self.terms)
+                self.terms.append(term)
+        return np.fromiter((ids[term] for term in terms), dtype=np.int32, count=len(terms))
+
+    def count_documents(self, ids: np.ndarray):
+        """ids are the concatenated, per-document unique term ids of a chunk."""
+        if len(self.df) < len(self.terms):
+            self.df = np.concatenate([self.df, np.zeros(len(self.terms) - len(self.df), dtype=np.int64)])
+        self.df += np.bincount(ids, minlength=len(self.df))
+
+    def df_dict(self) -> Dict[str, int]:
+        return dict(zip(self.terms, self.df.tolist()))
+
+
+def read_document(token_file: Path, lemma_file: Path):
+    """Token counts of a document and the summed counts of each lemma's forms, in file order."""
+    with token_file.open('r', encoding='utf-8') as f:
+        tokens = Counter(line.strip() for line in f if line.strip())
+
+    lemmas = {}
+    if lemma_file.exists():
+        with lemma_file.open('r', encoding='utf-8') as f:
+            for line in f:
+                parts = line.split()
+                if parts:
+                    lemmas[parts[0]] = lemmas.get(parts[0], 0) + sum(tokens.get(t, 0) for t in parts[1:])
+    return tokens, {lemma: freq for lemma, freq in lemmas.items() if freq}
+
+
+def pack_chunk(documents, token_ids: TermIds, lemma_ids: TermIds) -> Dict[str, np.ndarray]:
+    totals = []
+    token_parts, token_counts, lemma_parts, lemma_counts = [], [], [], []
+    for tokens, lemmas in documents:
+        totals.append(sum(tokens.values()))
+        token_parts.append(token_ids.intern(list(tokens)))
+        token_counts.append(np.fromiter(tokens.values(), dtype=np.int32, count=len(tokens)))
+        lemma_parts.append(lemma_ids.intern(list(lemmas)))
+        lemma_counts.append(np.fromiter(lemmas.values(), dtype=np.int32, count=len(lemmas)))
+
+    def indptr(parts):
+        offsets = np.zeros(len(parts) + 1, dtype=np.int64)
+        np.cumsum([len(part) for part in parts], out=offsets[1:])
+        return offsets
+
+    def concat(parts, dtype):
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=dtype)
+
+    return {
+        "totals": np.array(totals, dtype=np.int64),
+        "token_indptr": indptr(token_parts),
+        "token_ids": concat(token_parts, np.int32),
+        "token_counts": concat(token_counts, np.int32),
+        "lemma_indptr": indptr(lemma_parts),
+        "lemma_ids": concat(lemma_parts, np.int32),
+        "lemma_counts": concat(lemma_counts, np.int32),
+    }
+
+
+def tf_idf_weights(totals: np.ndarray, indptr: np.ndarray, ids: np.ndarray, counts: np.ndarray,
+                   idf: np.ndarray) -> np.ndarray:
+    doc_totals = np.repeat(totals, np.diff(indptr))
+    return counts / doc_totals * idf[ids]
+
+
+def write_documents(output_dir: Path, filenames: List[str], indptr: np.ndarray, ids: np.ndarray,
+                    weights: np.ndarray, terms: List[str], idf: np.ndarray):
+    idf_values = idf[ids].tolist()
+    ids = ids.tolist()
+    weights = weights.tolist()
+    for doc, fname in enumerate(filenames):
+        start, end = indptr[doc], indptr[doc + 1]
+        lines = [
+            f"{terms[term_id]} {term_idf:.6f} {weight:.6f}\n"
+            for term_id, term_idf, weight in zip(ids[start:end], idf_values[start:end], weights[start:end])
+        ]
+        output_dir.joinpath(fname).write_text(''.join(lines), encoding='utf-8')
+
+
+def sorted_vocabulary_csr(terms: List[str], indptr: np.ndarray, ids: np.ndarray):
+    """Renumbers term ids in the sorted order of the terms and sorts ids within every document."""
+    order = sorted(range(len(terms)), key=terms.__getitem__)
+    rank = np.empty(len(terms), dtype=np.int32)
+    rank[order] = np.arange(len(terms), dtype=np.int32)
+    indices = rank[ids]
+    rows = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+    within_rows = np.lexsort((indices, rows))
+    return [terms[i] for i in order], order, indices[within_rows], within_rows
+
+
+def sorted_rows(filenames: List[str], indptr: np.ndarray):
+    """Row order of the filenames sorted by name: the new filenames, indptr and gather index of the values."""
+    order = sorted(range(len(filenames)), key=filenames.__getitem__)
+    lengths = np.diff(indptr)[order]
+    new_indptr = np.zeros(len(order) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=new_indptr[1:])
+    gather = np.repeat(indptr[:-1][order] - new_indptr[:-1], lengths) + np.arange(new_indptr[-1])
+    return [filenames[i] for i in order], new_indptr, gather
+
+
+class TfIdfBuilder:
+    """Accumulates DF and term counts of documents added one at a time, in any order.
+
+    Every chunk_size documents are packed into integer ids and spilled to a temporary file;
+    finish() computes IDF and writes the TF-IDF files and model.bin. Model rows are ordered by
+    filename, so the result equals build_tf_idf over the same documents.
+    """
+
+    def __init__(self, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        self.token_ids, self.lemma_ids = TermIds(), TermIds()
+        self.spill_dir = tempfile.TemporaryDirectory(prefix="tf_idf_")
+        self.chunk_files = []
+        self.pending_names, self.pending_documents = [], []
+        self.total_docs = 0
+
+    def add(self, filename: str, tokens: Counter, lemmas: Dict[str, int]):
+        """tokens are the token counts of the document, lemmas the summed counts of each lemma's forms."""
+        self.pending_names.append(filename)
+        self.pending_documents.append((tokens, lemmas))
+        self.total_docs += 1
+        if len(self.pending_documents) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if not self.pending_documents:
+            return
+        with metrics.span("tf_idf.pack"):
+            chunk = pack_chunk(self.pending_documents, self.token_ids, self.lemma_ids)
+            self.token_ids.count_documents(chunk["token_ids"])
+            self.lemma_ids.count_documents(chunk["lemma_ids"])
+            chunk_file = os.path.join(self.spill_dir.name, f"chunk_{len(self.chunk_files)}.npz")
+            np.savez(chunk_file, **chunk)
+        self.chunk_files.append((chunk_file, self.pending_names))
+        self.pending_names, self.pending_documents = [], []
+
+    def finish(self, output_token_dir: Path, output_lemma_dir: Path, model_file: Optional[Path] = None) -> Dict:
+        """Writes the TF-IDF files one spilled chunk at a time.
+
+        With a model_file the lemma CSR of every document is gathered for write_model, which sorts and
+        transposes it as a whole: peak memory is then O(lemma nonzeros of the corpus), several dozen
+        bytes per (document, lemma) pair, not one chunk.
+        """
+        self.flush()
+        total_docs, token_ids, lemma_ids = self.total_docs, self.token_ids, self.lemma_ids
+        token_idf = np.log(total_docs / token_ids.df) if total_docs else np.zeros(0)
+        lemma_idf = np.log(total_docs / lemma_ids.df) if total_docs else np.zeros(0)
+
+        filenames = []
+        lemma_indptr = [np.zeros(1, dtype=np.int64)]
+        lemma_indices, lemma_data = [], []
+        for chunk_file, names in self.chunk_files:
+            with metrics.span("tf_idf.write"), np.load(chunk_file) as chunk:
+                totals = chunk["totals"]
+                token_indptr, token_chunk_ids = chunk["token_indptr"], chunk["token_ids"]
+                token_weights = tf_idf_weights(totals, token_indptr, token_chunk_ids, chunk["token_counts"], token_idf)
+                write_documents(output_token_dir, names, token_indptr, token_chunk_ids, token_weights,
+                                token_ids.terms, token_idf)
+
+                indptr, ids = chunk["lemma_indptr"], chunk["lemma_ids"]
+                weights = tf_idf_weights(totals, indptr, ids, chunk["lemma_counts"], lemma_idf)
+                write_documents(output_lemma_dir, names, indptr, ids, weights, lemma_ids.terms, lemma_idf)
+
+            if model_file is not None:
+                filenames.extend(names)
+                lemma_indptr.append(indptr[1:] + lemma_indptr[-1][-1])
+                lemma_indices.append(ids)
+                lemma_data.append(weights.astype(np.float32))
+
+        if model_file is not None:
+            with metrics.span("tf_idf.model"):
+                indptr = np.concatenate(lemma_indptr)
+                ids = np.concatenate(lemma_indices) if lemma_indices else np.zeros(0, dtype=np.int32)
+                data = np.concatenate(lemma_data) if lemma_data else np.zeros(0, dtype=np.float32)
+                if filenames != sorted(filenames):
+                    filenames, indptr, gather = sorted_rows(filenames, indptr)
+                    ids, data = ids[gather], data[gather]
+                vocabulary, order, indices, within_rows = sorted_vocabulary_csr(lemma_ids.terms, indptr, ids)
+                write_model(str(model_file), filenames, vocabulary, lemma_idf[order], indptr, indices,
+                            data[within_rows])
+        metrics.count("tf_idf.documents", total_docs)
+
+        return {
+            "total_docs": total_docs,
+            "token_df": token_ids.df_dict(),
+            "lemma_df": lemma_ids.df_dict(),
+        }
+
+    def close(self):
+        self.spill_dir.cleanup()
+
+
+def build_tf_idf(
+    token_dir: Path,
+    lemma_dir: Path,
+    output_token_dir: Path,
+    output_lemma_dir: Path,
+    model_file: Optional[Path] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> Dict:
+    """Full TF-IDF rebuild in one streaming pass over the lemmatizer output.
+
+    Terms and lemmas are interned to integer ids and DF is accumulated in NumPy arrays per chunk of
+    documents; a chunk's ids and counts are spilled to a temporary file, so reading holds one chunk
+    in memory. A second pass over the spilled chunks computes TF-IDF as array operations and writes
+    the same files as compute_and_write_tf_idf_*. With a model_file the lemma weights go to model.bin,
+    and that step holds the CSR of the whole corpus (see TfIdfBuilder.finish).
+    """
+    builder = TfIdfBuilder(chunk_size)
+    try:
+        for fname in sorted(file.name for file in token_dir.iterdir()):
+            with metrics.span("tf_idf.read"):
+                tokens, lemmas = read_document(token_dir / fname, lemma_dir / fname)
+            builder.add(fname, tokens, lemmas)
+        return builder.finish(output_token_dir, output_lemma_dir, model_file)
+    finally:
+        builder.close()
@@ -1,3 +1,4 @@
+import json
 import math
 from pathlib import Path
 from collections import defaultdict, Counter
@@ -43,6 +44,36 @@ def load_lemma_data(
     return doc_lemma_tokens, lemma_doc_set
 
 
+def tf_idf_token_lines(tokens: Counter[str], token_df: Dict[str, int], total_docs: int) -> str:
+    lines = []
+    total = sum(tokens.values())
+    for token, freq in tokens.items():
+        tf = freq / total
+        idf = math.log(total_docs / token_df[token])
+        tf_idf = tf * idf
+        lines.append(f"{token} {idf:.6f} {tf_idf:.6f}\n")
+    return ''.join(lines)
+
+
+def tf_idf_lemma_lines(
+    tokens: Counter[str],
+    lemma_tokens: Dict[str, List[str]],
+    lemma_df: Dict[str, int],
+    total_docs: int
+) -> str:
+    lines = []
+    total = sum(tokens.values())
+    for lemma, forms in lemma_tokens.items():
+        freq = sum(tokens.get(t, 0) for t in forms)
+        if freq == 0:
+            continue
+        tf = freq / total
+        idf = math.log(total_docs / lemma_df[lemma])
+        tf_idf = tf * idf
+        lines.append(f"{lemma} {idf:.6f} {tf_idf:.6f}\n")
+    return ''.join(lines)
+
+
 def compute_and_write_tf_idf_tokens(
     doc_token_counts: Dict[str, Counter[str]],
     token_df: Dict[str, int],
@@ -50,14 +81,7 @@ def compute_and_write_tf_idf_tokens(
     output_dir: Path
 ) -> None:
     for fname, tokens in doc_token_counts.items():
-        lines = []
-        total = sum(tokens.values())
-        for token, freq in tokens.items():
-            tf = freq / total
-            idf = math.log(total_docs / token_df[token])
-            tf_idf = tf * idf
-            lines.append(f"{token} {idf:.6f} {tf_idf:.6f}\n")
-        output_dir.joinpath(fname).write_text(''.join(lines), encoding='utf-8')
+        output_dir.joinpath(fname).write_text(tf_idf_token_lines(tokens, token_df, total_docs), encoding='utf-8')
 
 
 def compute_and_write_tf_idf_lemmas(
@@ -67,34 +91,131 @@ def compute_and_write_tf_idf_lemmas(
     total_docs: int,
     output_dir: Path
 ) -> None:
+    lemma_df = {lemma: len(docs) for lemma, docs in lemma_doc_set.items()}
     for fname, tokens in doc_token_counts.items():
-        lines = []
-        total = sum(tokens.values())
-        for lemma, forms in doc_lemma_tokens[fname].items():
-            freq = sum(tokens.get(t, 0) for t in forms)
-            if freq == 0:
-                continue
-            tf = freq / total
-            idf = math.log(total_docs / len(lemma_doc_set[lemma]))
-            tf_idf = tf * idf
-            lines.append(f"{lemma} {idf:.6f} {tf_idf:.6f}\n")
-        output_dir.joinpath(fname).write_text(''.join(lines), encoding='utf-8')
+        lines = tf_idf_lemma_lines(tokens, doc_lemma_tokens[fname], lemma_df, total_docs)
+        output_dir.joinpath(fname).write_text(lines, encoding='utf-8')
+
+
+def read_token_file(file: Path) -> Counter[str]:
+    with file.open('r', encoding='utf-8') as f:
+        return Counter(line.strip() for line in f if line.strip())
+
+
+def read_lemma_file(file: Path) -> Dict[str, List[str]]:
+    lemma_map = defaultdict(list)
+    with file.open('r', encoding='utf-8') as f:
+        for line in f:
+            parts = line.strip().split()
+            if parts:
+                lemma_map[parts[0]].extend(parts[1:])
+    return lemma_map
+
+
+def read_output_terms(file: Path) -> Set[str]:
+    if not file.exists():
+        return set()
+    with file.open('r', encoding='utf-8') as f:
+        return {line.split(' ', 1)[0] for line in f if line.strip()}
+
+
+def write_if_changed(file: Path, content: str) -> bool:
+    if file.exists() and file.read_text(encoding='utf-8') == content:
+        return False
+    file.write_text(content, encoding='utf-8')
+    return True
+
+
+def save_df_state(state_file: Path, total_docs: int, token_df: Dict[str, int], lemma_df: Dict[str, int]) -> None:
+    state = {"total_docs": total_docs, "token_df": token_df, "lemma_df": lemma_df}
+    state_file.write_text(json.dumps(state, ensure_ascii=False), encoding='utf-8')
+
+
+def update_tf_idf(
+    token_dir: Path,
+    lemma_dir: Path,
+    changed_docs: Set[str],
+    removed_docs: Set[str],
+    output_token_dir: Path,
+    output_lemma_dir: Path,
+    state_file: Path
+) -> Dict[str, int]:
+    """Recomputes TF-IDF of the affected documents only.
+
+    DF is updated from the old (previous results) and the new terms of the changed documents.
+    A document is recomputed if it changed or contains a term whose IDF changed; its file is
+    rewritten only if the content differs.
+    """
+    state = json.loads(state_file.read_text(encoding='utf-8'))
+    token_df = defaultdict(int, state["token_df"])
+    lemma_df = defaultdict(int, state["lemma_df"])
+
+    for fname in changed_docs | removed_docs:
+        for token in read_output_terms(output_token_dir / fname):
+            token_df[token] -= 1
+        for lemma in read_output_terms(output_lemma_dir / fname):
+            lemma_df[lemma] -= 1
+
+    doc_tokens = {fname: read_token_file(token_dir / fname) for fname in changed_docs}
+    doc_lemmas = {fname: read_lemma_file(lemma_dir / fname) for fname in changed_docs}
+    for fname in changed_docs:
+        for token in doc_tokens[fname]:
+            token_df[token] += 1
+        for lemma, forms in doc_lemmas[fname].items():
+            if any(t in doc_tokens[fname] for t in forms):
+                lemma_df[lemma] += 1
+
+    affected_tokens = {t for t, df in token_df.items() if df != state["token_df"].get(t, 0)}
+    affected_lemmas = {t for t, df in lemma_df.items() if df != state["lemma_df"].get(t, 0)}
+    token_df = {t: df for t, df in token_df.items() if df > 0}
+    lemma_df = {t: df for t, df in lemma_df.items() if df > 0}
+
+    for fname in removed_docs:
+        output_token_dir.joinpath(fname).unlink(missing_ok=True)
+        output_lemma_dir.joinpath(fname).unlink(missing_ok=True)
+
+    total_docs = len({file.name for file in token_dir.iterdir()})
+    recompute = set(changed_docs)
+    for file in token_dir.iterdir():
+        if file.name in recompute:
+            continue
+        if total_docs != state["total_docs"]:
+            recompute.add(file.name)
+        elif read_output_terms(output_token_dir / file.name) & affected_tokens:
+            recompute.add(file.name)
+        elif read_output_terms(output_lemma_dir / file.name) & affected_lemmas:
+            recompute.add(file.name)
+
+    rewritten = 0
+    for fname in recompute:
+        tokens = doc_tokens.get(fname) or read_token_file(token_dir / fname)
+        lemmas = doc_lemmas.get(fname) or read_lemma_file(lemma_dir / fname)
+        token_lines = tf_idf_token_lines(tokens, token_df, total_docs)
+        lemma_lines = tf_idf_lemma_lines(tokens, lemmas, lemma_df, total_docs)
+        token_changed = write_if_changed(output_token_dir / fname, token_lines)
+        lemma_changed = write_if_changed(output_lemma_dir / fname, lemma_lines)
+        rewritten += token_changed or lemma_changed
+
+    save_df_state(state_file, total_docs, token_df, lemma_df)
+    return {"recomputed": len(recompute), "rewritten": rewritten, "affected_terms": len(affected_tokens | affected_lemmas)}
 
 
 if __name__ == "__main__":
+    # run from tf_idf/: this file shadows the tf_idf package, so the sibling module is imported directly
+    from builder import build_tf_idf
+    from common.metrics import metrics
+
     PAGES_DIR = Path('../scrapper/saved_pages')
     TOKENS_DIR = Path('../lemmatizer/tokens')
     LEMMAS_DIR = Path('../lemmatizer/lemmas')
     OUTPUT_TOKEN_DIR = Path('tokens')
     OUTPUT_LEMMA_DIR = Path('lemmas')
+    STATE_FILE = Path('df_state.json')
+    MODEL_FILE = Path('model.bin')
 
     OUTPUT_TOKEN_DIR.mkdir(parents=True, exist_ok=True)
     OUTPUT_LEMMA_DIR.mkdir(parents=True, exist_ok=True)
 
-    doc_token_counts, token_df = load_token_data(TOKENS_DIR)
-    doc_lemma_tokens, lemma_doc_set = load_lemma_data(LEMMAS_DIR, doc_token_counts)
-
-    files_count = len({file.name for file in TOKENS_DIR.iterdir()})
-
-    compute_and_write_tf_idf_tokens(doc_token_counts, token_df, files_count, OUTPUT_TOKEN_DIR)
-    compute_and_write_tf_idf_lemmas(doc_token_counts, doc_lemma_tokens, lemma_doc_set, files_count, OUTPUT_LEMMA_DIR)
+    result = build_tf_idf(TOKENS_DIR, LEMMAS_DIR, OUTPUT_TOKEN_DIR, OUTPUT_LEMMA_DIR, MODEL_FILE)
+    save_df_state(STATE_FILE, result["total_docs"], result["token_df"], result["lemma_df"])
+    print(metrics.summary_json())
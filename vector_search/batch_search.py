@@ -0,0 +1,147 @@
+"""Batch search: many queries scored with blocked sparse matrix products, results streamed as JSONL.
+
+All queries are vectorized up front; MatrixSearchEngine.top_batch scores every block of queries
+with one product of the query matrix and the term-document matrix, and the titles of a block's
+hits are fetched from articles.sqlite with one lookup. Every output line is
+
+    {"query": ..., "count": ..., "results": [{"article_id", "cos_similarity", "title", "url", "snippet"}]}
+
+Run from the repository root:
+
+    python -m vector_search.batch_search queries.txt --output results.jsonl [--compare]
+
+--compare then runs the queries one by one through vector_search.find_top_articles (the per-document
+loop over the preloaded vectors) and MatrixSearchEngine.find_top_articles and prints all three rates.
+"""
+import argparse
+import json
+import sys
+import time
+from typing import IO, Any, Dict, Iterator, List, Tuple
+
+from common.article_metadata import open_store
+from common.metrics import metrics
+from common.query_cache import normalize_query
+from common.tfidf_model import TfIdfModel, is_model_file
+from vector_search.matrix_search import BATCH_BLOCK_SIZE, MatrixSearchEngine
+from vector_search import vector_search
+from vector_search.vector_search import article_row, preload_tf_idf_vectors, vectorize_query
+
+
+def load_engine(model_file: str, tf_idf_dir: str) -> MatrixSearchEngine:
+    if is_model_file(model_file):
+        return MatrixSearchEngine.from_model(TfIdfModel(model_file))
+    return MatrixSearchEngine.from_vectors(*preload_tf_idf_vectors(tf_idf_dir))
+
+
+def load_vectors(model_file: str, tf_idf_dir: str) -> Tuple[Dict[str, Dict[str, float]], Dict[str, float]]:
+    """Per-article dicts for vector_search.find_top_articles, from the same source as load_engine."""
+    if is_model_file(model_file):
+        model = TfIdfModel(model_file)
+        return model.articles_vectors(), model.idf_dict()
+    return preload_tf_idf_vectors(tf_idf_dir)
+
+
+def describe_batch(pages_dir: str, tops: List[List[Tuple[str, float]]]) -> List[List[Dict[str, Any]]]:
+    """describe_articles for a block of queries with one metadata lookup, without highlighted snippets."""
+    store = open_store(pages_dir, create=False)
+    article_ids = list(dict.fromkeys(article_id for top in tops for article_id, _ in top))
+    metadata = store.lookup(article_ids) if store is not None else {}
+
+    return [
+        [article_row(pages_dir, article_id, cos_similarity, metadata.get(article_id)) for article_id, cos_similarity in top]
+        for top in tops
+    ]
+
+
+def batch_search(
+        engine: MatrixSearchEngine,
+        queries: List[str],
+        articles_count: int,
+        pages_dir: str = None,
+        block_size: int = BATCH_BLOCK_SIZE
+) -> Iterator[Dict[str, Any]]:
+    """Results of the queries in input order; with pages_dir the hits get titles, URLs and snippets."""
+    with metrics.span("search.batch_vectorize"):
+        query_vectors = [vectorize_query(normalize_query(query), engine.idf) for query in queries]
+
+    results = engine.top_batch(query_vectors, articles_count, block_size)
+    for start in range(0, len(queries), block_size):
+        block = [next(results) for _ in queries[start:start + block_size]]
+        if pages_dir is not None:
+            with metrics.span("search.describe"):
+                described = describe_batch(pages_dir, [top for _, top in block])
+        else:
+            described = [
+                [{"article_id": article_id, "cos_similarity": score} for article_id, score in top]
+                for _, top in block
+            ]
+        for query, (count, _), rows in zip(queries[start:start + block_size], block, described):
+            yield {"query": query, "count": count, "results": rows}
+
+
+def write_jsonl(results: Iterator[Dict[str, Any]], output: IO) -> int:
+    lines = 0
+    for result in results:
+        output.write(json.dumps(result, ensure_ascii=False) + "\n")
+        lines += 1
+    return lines
+
+
+def read_queries(path: str) -> List[str]:
+    with open(path, "r", encoding="utf-8") as file:
+        return [line.strip() for line in file if line.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch search over a file of queries, one per line")
+    parser.add_argument("queries", help="file with one query per line")
+    parser.add_argument("--output", default="-", help="JSONL output file, - for stdout")
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--block", type=int, default=BATCH_BLOCK_SIZE, help="queries per matrix product")
+    parser.add_argument("--model", default="tf_idf/model.bin")
+    parser.add_argument("--tf-idf", default="tf_idf/lemmas", help="used when there is no model file")
+    parser.add_argument("--pages", default="scrapper/saved_pages")
+    parser.add_argument("--no-titles", action="store_true", help="only article ids and scores")
+    parser.add_argument("--compare", action="store_true",
+                        help="also run every query through vector_search.find_top_articles and "
+                             "MatrixSearchEngine.find_top_articles")
+    args = parser.parse_args()
+
+    queries = read_queries(args.queries)
+    engine = load_engine(args.model, args.tf_idf)
+    pages_dir = None if args.no_titles else args.pages
+
+    start = time.perf_counter()
+    output = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    try:
+        write_jsonl(batch_search(engine, queries, args.top, pages_dir, args.block), output)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    batch_seconds = time.perf_counter() - start
+    print(f"batch: {len(queries)} запросов за {batch_seconds:.2f} сек. ({len(queries) / batch_seconds:.0f} запросов/сек)",
+          file=sys.stderr)
+
+    if args.compare:
+        articles_vectors, idf = load_vectors(args.model, args.tf_idf)
+        searches = [
+            ("vector_search.find_top_articles",
+             lambda query: vector_search.find_top_articles(query, articles_vectors, idf, args.pages, args.top)),
+            ("MatrixSearchEngine.find_top_articles",
+             lambda query: engine.find_top_articles(query, args.pages, args.top)),
+        ]
+        for name, search in searches:
+            start = time.perf_counter()
+            for query in queries:
+                search(query)
+            single_seconds = time.perf_counter() - start
+            print(
+                f"{name} по одному: {len(queries)} запросов за {single_seconds:.2f} сек. "
+                f"({len(queries) / single_seconds:.0f} запросов/сек), batch быстрее в {single_seconds / batch_seconds:.1f}x",
+                file=sys.stderr,
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+import math
+import time
+from typing import Any, Dict, Iterator, List, Tuple
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from common.metrics import metrics
+from common.query_cache import QueryCache, freeze_rows, thaw_rows
+from common.tfidf_model import TfIdfModel
+from inverted_index.positional_index import PositionalIndex
+from vector_search.vector_search import cached_query_vector, describe_articles, elapsed_seconds
+
+
+# Queries scored together in MatrixSearchEngine.top_batch: one block's score matrix is held in memory.
+BATCH_BLOCK_SIZE = 256
+
+
+def top_k(docs: np.ndarray, scores: np.ndarray, k: int) -> np.ndarray:
+    """Positions of the k best scores, ordered by score and then by the lower document number."""
+    candidates = np.arange(len(scores))
+    if len(scores) > k > 0:
+        kth = np.partition(scores, len(scores) - k)[len(scores) - k]
+        candidates = np.flatnonzero(scores >= kth)
+    order = np.lexsort((docs[candidates], -scores[candidates]))
+    return candidates[order][:k]
+
+
+class SearchEngine:
+    """find_top_articles on top of an engine-specific top(query_vector, articles_count)."""
+
+    idf: Dict[str, float]
+
+    def top(self, query_vector: Dict[str, float], articles_count: int) -> Tuple[int, List[Tuple[str, float]]]:
+        raise NotImplementedError
+
+    def find_top_articles(
+            self,
+            query: str,
+            pages_dir: str,
+            articles_count: int,
+            result_cache: QueryCache = None,
+            positional_index: PositionalIndex = None,
+            query_vector_cache: QueryCache = None
+    ) -> Tuple[int, List[Dict[str, Any]], float]:
+        """Both caches must belong to this engine: they are created together with it, never shared."""
+        start_ns = time.perf_counter_ns()
+
+        with metrics.span("search.vectorize"):
+            query_vector = cached_query_vector(query, self.idf, query_vector_cache)
+        if not query_vector:
+            return 0, [], elapsed_seconds(start_ns)
+
+        cache_key = (tuple(sorted(query_vector.items())), articles_count)
+        if result_cache is not None:
+            cached = result_cache.get(cache_key)
+            if cached is not None:
+                metrics.count("search.result_cache_hits")
+                count, rows = cached
+                return count, thaw_rows(rows), elapsed_seconds(start_ns)
+
+        count, top = self.top(query_vector, articles_count)
+
+        with metrics.span("search.describe"):
+            results = describe_articles(pages_dir, top, list(query_vector), positional_index)
+
+        if result_cache is not None:
+            result_cache.put(cache_key, (count, freeze_rows(results)))
+
+        return count, results, elapsed_seconds(start_ns)
+
+
+class MatrixSearchEngine(SearchEngine):
+    """Vectorized cosine search over a sparse term-document matrix.
+
+    The matrix is stored term-major together with precomputed document norms, so scoring a query
+    is one sparse product over the query terms' rows and top-k is picked with argpartition.
+    vector_search.find_top_articles stays as the reference implementation.
+    """
+
+    def __init__(
+            self,
+            article_ids: List[str],
+            idf: Dict[str, float],
+            term_ids: Dict[str, int],
+            term_doc: csr_matrix,
+            doc_norms: np.ndarray
+    ):
+        self.article_ids = article_ids
+        self.idf = idf
+        self.term_ids = term_ids
+        self.term_doc = term_doc
+        self.doc_norms = doc_norms
+
+    @classmethod
+    def from_vectors(cls, articles_vectors: Dict[str, Dict[str, float]], idf: Dict[str, float]):
+        term_ids = {term: term_id for term_id, term in enumerate(idf)}
+
+        indptr = [0]
+        indices = []
+        data = []
+        for vector in articles_vectors.values():
+            for term, weight in vector.items():
+                if term in term_ids:
+                    indices.append(term_ids[term])
+                    data.append(weight)
+            indptr.append(len(indices))
+
+        doc_term = csr_matrix(
+            (np.array(data, dtype=np.float64), np.array(indices, dtype=np.int32), np.array(indptr, dtype=np.int64)),
+            shape=(len(articles_vectors), len(term_ids)),
+        )
+        doc_norms = np.sqrt(np.asarray(doc_term.multiply(doc_term).sum(axis=1)).ravel())
+        return cls(list(articles_vectors), idf, term_ids, doc_term.T.tocsr(), doc_norms)
+
+    @classmethod
+    def from_model(cls, model: TfIdfModel):
+        """Scores straight from the memory-mapped term-major arrays of a model file."""
+        term_doc = csr_matrix(
+            (model.term_data, model.term_indices, model.term_indptr),
+            shape=(len(model.vocabulary), len(model.article_ids)),
+            copy=False,
+        )
+        return cls(model.article_ids, model.idf_dict(), model.term_ids, term_doc, model.norms)
+
+    def score(self, query_vector: Dict[str, float]) -> np.ndarray:
+        """Cosine similarity of the query with every document."""
+        terms = [term for term in query_vector if term in self.term_ids]
+        query_norm = math.sqrt(sum(v ** 2 for v in query_vector.values()))
+        if not terms or not query_norm:
+            return np.zeros(len(self.article_ids))
+
+        rows = self.term_doc[[self.term_ids[term] for term in terms]]
+        weights = np.array([query_vector[term] for term in terms]) / query_norm
+        products = rows.T @ weights
+        return np.divide(products, self.doc_norms, out=np.zeros_like(products), where=self.doc_norms > 0)
+
+    def top_rows(self, query_vector: Dict[str, float], articles_count: int) -> Tuple[int, np.ndarray, np.ndarray]:
+        """Number of matching documents, rows and scores of the best ones; ties go to the lower row."""
+        with metrics.span("search.score"):
+            scores = self.score(query_vector)
+        with metrics.span("search.sort"):
+            matched = np.flatnonzero(scores > 0)
+            order = matched[top_k(matched, scores[matched], articles_count)]
+            return len(matched), order, scores[order]
+
+    def query_matrix(self, query_vectors: List[Dict[str, float]]) -> csr_matrix:
+        """Query vectors as the rows of a sparse matrix over the vocabulary, each divided by its norm."""
+        indptr = [0]
+        indices, data = [], []
+        for query_vector in query_vectors:
+            query_norm = math.sqrt(sum(v ** 2 for v in query_vector.values()))
+            if query_norm:
+                for term, weight in query_vector.items():
+                    term_id = self.term_ids.get(term)
+                    if term_id is not None:
+                        indices.append(term_id)
+                        data.append(weight / query_norm)
+            indptr.append(len(indices))
+        return csr_matrix(
+            (np.array(data, dtype=np.float64), np.array(indices, dtype=np.int32), np.array(indptr, dtype=np.int64)),
+            shape=(len(query_vectors), len(self.term_ids)),
+        )
+
+    def top_batch(
+            self,
+            query_vectors: List[Dict[str, float]],
+            articles_count: int,
+            block_size: int = BATCH_BLOCK_SIZE
+    ) -> Iterator[Tuple[int, List[Tuple[str, float]]]]:
+        """top() of many queries: every block of queries is scored with one sparse matrix-matrix product.
+
+        Scores agree with top() up to float rounding: the product sums the query terms in another order.
+        """
+        for start in range(0, len(query_vectors), block_size):
+            with metrics.span("search.batch_score"):
+                scores = (self.query_matrix(query_vectors[start:start + block_size]) @ self.term_doc).tocsr()
+                norms = self.doc_norms[scores.indices]
+                np.divide(scores.data, norms, out=scores.data, where=norms > 0)
+
+            with metrics.span("search.batch_sort"):
+                block = []
+                for row in range(scores.shape[0]):
+                    row_start, row_end = scores.indptr[row], scores.indptr[row + 1]
+                    docs, row_scores = scores.indices[row_start:row_end], scores.data[row_start:row_end]
+                    matched = row_scores > 0
+                    docs, row_scores = docs[matched], row_scores[matched]
+                    best = top_k(docs, row_scores, articles_count)
+                    block.append((len(docs), [
+                        (self.article_ids[doc], score)
+                        for doc, score in zip(docs[best].tolist(), row_scores[best].tolist())
+                    ]))
+            yield from block
+
+    def top(self, query_vector: Dict[str, float], articles_count: int) -> Tuple[int, List[Tuple[str, float]]]:
+        count, rows, scores = self.top_rows(query_vector, articles_count)
+        return count, [(self.article_ids[row], score) for row, score in zip(rows.tolist(), scores.tolist())]
+
+    def nbytes(self) -> int:
+        return (self.term_doc.data.nbytes + self.term_doc.indices.nbytes + self.term_doc.indptr.nbytes
+                + self.doc_norms.nbytes)
@@ -0,0 +1,159 @@
+"""Precomputed "more like this": the most similar articles of every article by cosine of TF-IDF vectors.
+
+The document vectors are normalized and multiplied with their transpose in blocks of rows, so only
+one block of the similarity matrix exists at a time. With --max-df, candidate pairs have to share
+a high-IDF term, one found in at most max-df documents (a share of them if below 1): the product runs
+over these rare terms only, so its cost grows with the corpus size times max-df instead of the
+square of the corpus size. The common terms' part of the cosine is then added for the candidate
+pairs alone, so candidate scores stay exact. The result is a table of
+k neighbour rows and scores per article, memory-mapped by demo/server.py for /related/<article>.
+Built from the repository root with:
+
+    python -m vector_search.neighbours --top 10 [--max-df 200]
+"""
+import argparse
+import os
+import time
+from typing import List, Optional, Tuple
+
+import numpy as np
+from scipy.sparse import csr_matrix, diags
+
+from common.array_file import read_array_file, write_array_file
+from common.metrics import metrics
+from common.tfidf_model import TfIdfModel, is_model_file
+from vector_search.matrix_search import MatrixSearchEngine, top_k
+from vector_search.vector_search import preload_tf_idf_vectors
+
+MAGIC = b"NEIGHB01"
+ARRAYS = {"rows": np.int32, "scores": np.float32}
+
+# Entries of one block of the similarity matrix; the block size is derived from it and the corpus size.
+BLOCK_ENTRIES = 2 ** 24
+# Candidate pairs whose common-term products are computed at once.
+PAIR_CHUNK = 2 ** 18
+
+
+def load_documents(model_file: str, tf_idf_dir: str) -> Tuple[List[str], csr_matrix]:
+    """Article ids and the document-term matrix."""
+    if is_model_file(model_file):
+        model = TfIdfModel(model_file)
+        doc_term = csr_matrix(
+            (model.doc_data, model.doc_indices, model.doc_indptr),
+            shape=(len(model.article_ids), len(model.vocabulary)),
+        )
+        return model.article_ids, doc_term
+
+    articles_vectors, idf = preload_tf_idf_vectors(tf_idf_dir)
+    engine = MatrixSearchEngine.from_vectors(articles_vectors, idf)
+    return engine.article_ids, engine.term_doc.T.tocsr()
+
+
+def normalize_rows(doc_term: csr_matrix) -> csr_matrix:
+    doc_term = csr_matrix(doc_term, dtype=np.float32)
+    norms = np.sqrt(np.asarray(doc_term.multiply(doc_term).sum(axis=1)).ravel())
+    inverse = np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0)
+    return (diags(inverse.astype(np.float32)) @ doc_term).tocsr()
+
+
+def build_neighbours(
+        doc_term: csr_matrix,
+        neighbours_count: int,
+        max_df: float = None,
+        block_size: int = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Rows and cosine scores of every document's neighbours, -1 where it has fewer of them."""
+    vectors = normalize_rows(doc_term)
+    docs, terms = vectors.shape
+    if max_df is not None:
+        df = np.bincount(vectors.indices, minlength=terms)
+        rare = df <= (max_df if max_df >= 1 else max_df * docs)
+        candidates, common = vectors[:, rare].tocsr(), vectors[:, ~rare].tocsr()
+    else:
+        candidates, common = vectors, None
+    candidates_t = candidates.T.tocsr()
+    block_size = block_size or max(1, min(docs, BLOCK_ENTRIES // max(docs, 1)))
+
+    rows = np.full((docs, neighbours_count), -1, dtype=np.int32)
+    scores = np.zeros((docs, neighbours_count), dtype=np.float32)
+    for start in range(0, docs, block_size):
+        with metrics.span("neighbours.product"):
+            block = (candidates[start:start + block_size] @ candidates_t).tocsr()
+            block_rows = np.repeat(np.arange(block.shape[0]), np.diff(block.indptr)) + start
+            if common is not None:
+                # the common terms' share of the cosine, for the candidate pairs only
+                for pairs in range(0, block.nnz, PAIR_CHUNK):
+                    chunk = slice(pairs, pairs + PAIR_CHUNK)
+                    products = common[block_rows[chunk]].multiply(common[block.indices[chunk]])
+                    block.data[chunk] += np.asarray(products.sum(axis=1)).ravel()
+
+        with metrics.span("neighbours.select"):
+            for row in range(block.shape[0]):
+                row_start, row_end = block.indptr[row], block.indptr[row + 1]
+                others, similarities = block.indices[row_start:row_end], block.data[row_start:row_end]
+                keep = (others != start + row) & (similarities > 0)
+                others, similarities = others[keep], similarities[keep]
+                best = top_k(others, similarities, neighbours_count)
+                rows[start + row, :len(best)] = others[best]
+                scores[start + row, :len(best)] = similarities[best]
+    metrics.count("neighbours.documents", docs)
+    return rows, scores
+
+
+def write_neighbours(path: str, article_ids: List[str], rows: np.ndarray, scores: np.ndarray):
+    """The row and score matrices flattened row by row; the meta keeps the number of neighbours per row."""
+    meta = {"article_ids": article_ids, "neighbours": int(rows.shape[1])}
+    write_array_file(path, MAGIC, meta, {"rows": rows, "scores": scores}, ARRAYS)
+
+
+class NeighbourTable:
+    """Read-only view of a neighbour file: the neighbours of an article are one slice of the mapped arrays."""
+
+    def __init__(self, path: str):
+        self.path = path
+        meta, arrays = read_array_file(path, MAGIC, ARRAYS, "a neighbour table")
+        self.article_ids = meta["article_ids"]
+        self.rows_of = {article_id: row for row, article_id in enumerate(self.article_ids)}
+        self.neighbours = meta["neighbours"]
+        for name, array in arrays.items():
+            setattr(self, name, array.reshape(-1, self.neighbours) if self.neighbours else array)
+
+    def related(self, article_id: str, count: int = None) -> Optional[List[Tuple[str, float]]]:
+        """(article id, cosine) of the most similar articles; None for an unknown article."""
+        row = self.rows_of.get(article_id)
+        if row is None:
+            return None
+        count = self.neighbours if count is None else min(count, self.neighbours)
+        return [
+            (self.article_ids[neighbour], score)
+            for neighbour, score in zip(self.rows[row, :count].tolist(), self.scores[row, :count].tolist())
+            if neighbour >= 0
+        ]
+
+
+def load_neighbour_table(path: str = "neighbours.bin") -> Optional[NeighbourTable]:
+    return NeighbourTable(path) if os.path.exists(path) else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute the most similar articles of every article")
+    parser.add_argument("--top", type=int, default=10, help="neighbours per article")
+    parser.add_argument("--max-df", type=float, default=None,
+                        help="candidates must share a term found in at most this many documents (a share if below 1)")
+    parser.add_argument("--block", type=int, default=None, help="documents per block of the similarity product")
+    parser.add_argument("--model", default="tf_idf/model.bin")
+    parser.add_argument("--tf-idf", default="tf_idf/lemmas", help="used when there is no model file")
+    parser.add_argument("--output", default="tf_idf/neighbours.bin")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    article_ids, doc_term = load_documents(args.model, args.tf_idf)
+    rows, scores = build_neighbours(doc_term, args.top, args.max_df, args.block)
+    write_neighbours(args.output, article_ids, rows, scores)
+    print(f"{len(article_ids)} articles, {args.top} neighbours each, written to {args.output} "
+          f"in {time.perf_counter() - start:.2f} s")
+    print(metrics.summary_json())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+import math
+import os
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from common.metrics import metrics
+from vector_search.matrix_search import SearchEngine
+
+# Slack for float rounding when comparing partial scores with upper bounds.
+PRUNING_EPSILON = 1e-12
+
+
+class PostingsSearchEngine(SearchEngine):
+    """Term-at-a-time cosine search with MaxScore pruning.
+
+    Every term keeps its postings as (doc, tf-idf weight) sorted by doc, together with the
+    largest weight / document norm among them, which bounds the term's contribution to any
+    cosine score. Query terms are processed from the largest bound down. Once the k-th best
+    partial score exceeds the sum of the remaining bounds, documents not seen yet cannot reach
+    top-k: the remaining terms only update the surviving candidates.
+    """
+
+    def __init__(
+            self,
+            article_ids: List[str],
+            term_postings: Dict[str, Tuple[List[int], List[float]]],
+            idf: Dict[str, float]
+    ):
+        self.article_ids = article_ids
+        self.idf = idf
+
+        squares = np.zeros(len(article_ids))
+        self.postings = {}
+        for term, (docs, weights) in term_postings.items():
+            docs = np.array(docs, dtype=np.int64)
+            weights = np.array(weights, dtype=np.float64)
+            order = np.argsort(docs, kind="stable")
+            docs, weights = docs[order], weights[order]
+            np.add.at(squares, docs, weights ** 2)
+            self.postings[term] = (docs, weights)
+
+        self.doc_norms = np.sqrt(squares)
+        self.max_weights = {}
+        for term, (docs, weights) in list(self.postings.items()):
+            positive = weights > 0
+            docs, weights = docs[positive], weights[positive]
+            if len(docs) == 0:
+                del self.postings[term]
+                continue
+            self.postings[term] = (docs, weights)
+            self.max_weights[term] = float(np.max(weights / self.doc_norms[docs]))
+
+    @classmethod
+    def from_vectors(cls, articles_vectors: Dict[str, Dict[str, float]], idf: Dict[str, float]):
+        term_postings = defaultdict(lambda: ([], []))
+        for doc, vector in enumerate(articles_vectors.values()):
+            for term, weight in vector.items():
+                docs, weights = term_postings[term]
+                docs.append(doc)
+                weights.append(weight)
+        return cls(list(articles_vectors), term_postings, idf)
+
+    @classmethod
+    def from_tf_idf_dir(cls, tf_idf_dir: str):
+        """Builds postings straight from tf_idf/lemmas files without per-document dicts."""
+        article_ids = os.listdir(tf_idf_dir)
+        term_postings = defaultdict(lambda: ([], []))
+        idf = {}
+
+        for doc, filename in enumerate(article_ids):
+            with open(os.path.join(tf_idf_dir, filename), "r", encoding="utf-8") as f:
+                for line in f:
+                    term, idf_val, tf_idf_val = line.split()
+                    docs, weights = term_postings[term]
+                    docs.append(doc)
+                    weights.append(float(tf_idf_val))
+                    idf.setdefault(term, float(idf_val))
+
+        return cls(article_ids, term_postings, idf)
+
+    def count_matches(self, terms: List[str]) -> int:
+        if len(terms) == 1:
+            return len(self.postings[terms[0]][0])
+        return len(np.unique(np.concatenate([self.postings[term][0] for term in terms])))
+
+    def top(self, query_vector: Dict[str, float], articles_count: int) -> Tuple[int, List[Tuple[str, float]]]:
+        terms = [term for term in query_vector if term in self.postings and query_vector[term] > 0]
+        query_norm = math.sqrt(sum(v ** 2 for v in query_vector.values()))
+        if not terms or not query_norm or articles_count <= 0:
+            return 0, []
+
+        with metrics.span("search.score"):
+            bounds = {term: query_vector[term] * self.max_weights[term] / query_norm for term in terms}
+            terms.sort(key=bounds.get, reverse=True)
+            remaining_bound = sum(bounds.values())
+
+            dot_products = np.zeros(len(self.article_ids))
+            processed = 0
+            candidates = None
+            threshold = 0.0
+
+            # OR phase: every document in the postings may still enter top-k.
+            while processed < len(terms):
+                term = terms[processed]
+                docs, weights = self.postings[term]
+                dot_products[docs] += query_vector[term] * weights
+                remaining_bound -= bounds[term]
+                processed += 1
+
+                if processed == len(terms):
+                    break
+                seen = np.flatnonzero(dot_products)
+                if len(seen) < articles_count:
+                    continue
+                scores = dot_products[seen] / (self.doc_norms[seen] * query_norm)
+                threshold = np.partition(scores, len(scores) - articles_count)[len(scores) - articles_count]
+                if threshold > remaining_bound + PRUNING_EPSILON:
+                    candidates = seen[scores + remaining_bound >= threshold - PRUNING_EPSILON]
+                    break
+
+            # AND phase: only candidates that can still reach the threshold are updated.
+            for term in terms[processed:]:
+                docs, weights = self.postings[term]
+                positions = np.searchsorted(docs, candidates)
+                positions[positions == len(docs)] = 0
+                hits = docs[positions] == candidates
+                dot_products[candidates[hits]] += query_vector[term] * weights[positions[hits]]
+
+            if candidates is None:
+                candidates = np.flatnonzero(dot_products)
+            scores = dot_products[candidates] / (self.doc_norms[candidates] * query_norm)
+
+        with metrics.span("search.sort"):
+            order = np.lexsort((candidates, -scores))[:articles_count]
+            top = [(self.article_ids[candidates[i]], float(scores[i])) for i in order]
+        return self.count_matches(terms), top
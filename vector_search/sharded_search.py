@@ -0,0 +1,102 @@
+"""Scatter-gather search over the shards written by common/shards.py.
+
+Every shard is served by its own process, which maps only that shard's model, inverted index and
+positional index. The coordinator vectorizes a query with the global IDF (the shards keep the IDF of
+the full model, so the union of their vocabularies gives it back), sends it to all shards at once and
+merges their top-k lists by (score, row in the full model): results and scores are the ones of
+MatrixSearchEngine over the unsharded model. Boolean queries run on every shard's QueryEngine and
+the sorted per-shard results are merged, like QueryEngine over the full index would return them.
+"""
+import heapq
+import itertools
+import os
+from multiprocessing import Pool
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from common.metrics import metrics
+from common.shards import INDEX_FILE, MODEL_FILE, POSITIONS_FILE, ROWS_FILE, shard_dirs
+from common.tfidf_model import TfIdfModel
+from inverted_index.binary_index import BinaryIndex
+from inverted_index.positional_index import load_positional_index
+from inverted_index.query_engine import QueryEngine
+from vector_search.matrix_search import MatrixSearchEngine, SearchEngine
+
+
+class ShardIndex:
+    """Indexes of one shard, loaded in the shard's process."""
+
+    def __init__(self, shard_dir: str):
+        self.engine = MatrixSearchEngine.from_model(TfIdfModel(os.path.join(shard_dir, MODEL_FILE)))
+        self.rows = np.load(os.path.join(shard_dir, ROWS_FILE))
+        self.query_engine = QueryEngine(
+            BinaryIndex(os.path.join(shard_dir, INDEX_FILE)),
+            load_positional_index(os.path.join(shard_dir, POSITIONS_FILE)),
+        )
+
+
+shard = None
+
+
+def init_shard(shard_dir: str):
+    """Pool initializer: every shard process loads its own shard once."""
+    global shard
+    shard = ShardIndex(shard_dir)
+
+
+def shard_idf() -> Dict[str, float]:
+    return shard.engine.idf
+
+
+def shard_top(query_vector: Dict[str, float], articles_count: int) -> Tuple[int, List[Tuple[float, int, str]]]:
+    """Matching documents of the shard and its best ones as (score, global row, article id)."""
+    count, rows, scores = shard.engine.top_rows(query_vector, articles_count)
+    hits = [
+        (score, int(shard.rows[row]), shard.engine.article_ids[row])
+        for row, score in zip(rows.tolist(), scores.tolist())
+    ]
+    return count, hits
+
+
+def shard_search(rpn: List[str]) -> List[int]:
+    return shard.query_engine.search(rpn)
+
+
+class ShardedSearchEngine(SearchEngine):
+    """Coordinator: one single-process pool per shard, queries are fanned out to all of them in parallel.
+
+    Pools accept tasks from several threads at once, so concurrent queries queue up on every shard
+    instead of waiting for each other in the coordinator.
+    """
+
+    def __init__(self, shards_dir: str):
+        self.pools = [Pool(1, initializer=init_shard, initargs=(shard_dir,)) for shard_dir in shard_dirs(shards_dir)]
+        self.idf = {}
+        for idf in self.scatter(shard_idf):
+            self.idf.update(idf)
+
+    def scatter(self, task, *args) -> list:
+        pending = [pool.apply_async(task, args) for pool in self.pools]
+        return [result.get() for result in pending]
+
+    def top(self, query_vector: Dict[str, float], articles_count: int) -> Tuple[int, List[Tuple[str, float]]]:
+        with metrics.span("search.scatter"):
+            results = self.scatter(shard_top, query_vector, articles_count)
+        with metrics.span("search.merge"):
+            # every shard list is ordered by (-score, row) already
+            merged = heapq.merge(*(hits for _, hits in results), key=lambda hit: (-hit[0], hit[1]))
+            top = [(article_id, score) for score, _, article_id in itertools.islice(merged, articles_count)]
+        return sum(count for count, _ in results), top
+
+    def search(self, rpn: List[str]) -> List[int]:
+        """Boolean query in RPN, as QueryEngine.search; usable with searcher.engine_search."""
+        with metrics.span("search.scatter"):
+            results = self.scatter(shard_search, rpn)
+        with metrics.span("search.merge"):
+            return list(heapq.merge(*results))
+
+    def close(self):
+        for pool in self.pools:
+            pool.terminate()
+            pool.join()
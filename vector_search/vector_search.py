@@ -1,11 +1,20 @@
 import os
 import math
 from collections import Counter, defaultdict
-from bs4 import BeautifulSoup
 from nltk import word_tokenize
 import time
 from typing import Dict, List, Tuple, Any
 
+from common.article_metadata import ArticleMetadata, open_store
+from common.metrics import metrics
+from common.html_cleaner import load_page
+from common.query_cache import QueryCache, freeze_rows, normalize_query, thaw_rows
+from common.tfidf_model import TfIdfModel, is_model_file
+from inverted_index.indexer import document_number
+from inverted_index.positional_index import PositionalIndex
+
+QUERY_VECTOR_CACHE_SIZE = 4096
+
 
 def preload_tf_idf_vectors(tf_idf_dir: str) -> Tuple[Dict[str, Dict[str, float]], Dict[str, float]]:
     articles_vectors = {}
@@ -36,6 +45,20 @@ def vectorize_query(query: str, idf: Dict[str, float]) -> Dict[str, float]:
     return {term: (freq / total) * idf.get(term, 0) for term, freq in tf.items() if term in idf}
 
 
+def cached_query_vector(query: str, idf: Dict[str, float], query_vector_cache: QueryCache = None) -> Dict[str, float]:
+    """vectorize_query of the normalized query; query_vector_cache must belong to this idf."""
+    key = normalize_query(query)
+    if query_vector_cache is None:
+        return vectorize_query(key, idf)
+
+    cached = query_vector_cache.get(key)
+    if cached is not None:
+        return dict(cached)
+    query_vector = vectorize_query(key, idf)
+    query_vector_cache.put(key, tuple(query_vector.items()))
+    return query_vector
+
+
 def calculate_cos_similarity(vector_1: Dict[str, float], vector_2: Dict[str, float]) -> float:
     terms_in_common = set(vector_1.keys()) & set(vector_2.keys())
 
@@ -54,28 +77,43 @@ def calculate_cos_similarity(vector_1: Dict[str, float], vector_2: Dict[str, flo
 
 
 def get_article_title(pages_dir: str, article_id: str) -> str:
-    path = os.path.join(pages_dir, article_id)
-    with open(path, 'r', encoding='utf-8') as f:
-        html = f.read()
-    soup = BeautifulSoup(html, "html.parser")
-    return soup.title.string.strip() if soup.title and soup.title.string else "Без заголовка"
+    return load_page(os.path.join(pages_dir, article_id)).title
 
 
-def find_top_articles(
-        query: str,
-        articles_vectors: Dict[str, Dict[str, float]],
-        idf: Dict[str, float],
+def article_row(pages_dir: str, article_id: str, cos_similarity: float, meta: ArticleMetadata = None) -> Dict[str, Any]:
+    """Result row of one hit from its articles.sqlite row; without one the title is parsed from the page."""
+    return {
+        "article_id": article_id,
+        "cos_similarity": cos_similarity,
+        "title": meta.title if meta else get_article_title(pages_dir, article_id),
+        "url": meta.url if meta else "",
+        "snippet": meta.snippet if meta else "",
+    }
+
+
+def describe_articles(
         pages_dir: str,
-        articles_count: int
-) -> Tuple[int, List[Dict[str, Any]], float]:
+        scores: List[Tuple[str, float]],
+        terms: List[str] = (),
+        positional_index: PositionalIndex = None
+) -> List[Dict[str, Any]]:
+    """Result rows for the top hits, joined with articles.sqlite; the page is parsed only if it has no row.
 
-    start_time = time.time()
+    With a positional index every row also gets an HTML snippet with the query terms highlighted.
+    """
+    store = open_store(pages_dir, create=False)
+    metadata = store.lookup([article_id for article_id, _ in scores]) if store is not None else {}
 
-    query_vector = vectorize_query(query, idf)
+    results = []
+    for article_id, cos_similarity in scores:
+        row = article_row(pages_dir, article_id, cos_similarity, metadata.get(article_id))
+        row["highlight"] = positional_index.snippet(document_number(article_id), terms) if positional_index else ""
+        results.append(row)
+    return results
 
-    if not query_vector:
-        return 0, [], round(time.time() - start_time, 2)
 
+def score_articles(query_vector: Dict[str, float], articles_vectors: Dict[str, Dict[str, float]]) -> List[Tuple[str, float]]:
+    """(article id, cosine) of every matching article, unsorted."""
     scores = []
     for article_id, vec in articles_vectors.items():
         if not any(term in vec for term in query_vector):
@@ -85,35 +123,97 @@ def find_top_articles(
 
         if cos_similarity > 0:
             scores.append((article_id, cos_similarity))
+    return scores
+
 
+def sort_scores(scores: List[Tuple[str, float]]) -> List[Tuple[str, float]]:
     scores.sort(key=lambda x: x[1], reverse=True)
+    return scores
 
-    results = []
-    for article_id, cos_similarity in scores[:articles_count]:
-        results.append({
-            "article_id": article_id,
-            "cos_similarity": cos_similarity,
-            "title": get_article_title(pages_dir, article_id)
-        })
 
-    elapsed_time = round(time.time() - start_time, 2)
-    return len(scores), results, elapsed_time
+def rank_articles(query_vector: Dict[str, float], articles_vectors: Dict[str, Dict[str, float]]) -> List[Tuple[str, float]]:
+    return sort_scores(score_articles(query_vector, articles_vectors))
 
 
-def launch_searcher_cli(pages_dir: str, tf_idf_dir: str, articles_count: int):
-    articles_tf_idf_vectors, idf = preload_tf_idf_vectors(tf_idf_dir)
+def elapsed_seconds(start_ns: int) -> float:
+    """Seconds since start_ns; also recorded as the search.total span."""
+    duration_ns = time.perf_counter_ns() - start_ns
+    metrics.observe_ns("search.total", duration_ns)
+    return round(duration_ns / 1e9, 4)
 
-    while True:
-        query_str = input("Введите запрос > ").strip()
 
-        count, results, elapsed_time = find_top_articles(
-            query=query_str,
+def find_top_articles(
+        query: str,
+        articles_vectors: Dict[str, Dict[str, float]],
+        idf: Dict[str, float],
+        pages_dir: str,
+        articles_count: int,
+        result_cache: QueryCache = None,
+        positional_index: PositionalIndex = None,
+        query_vector_cache: QueryCache = None
+) -> Tuple[int, List[Dict[str, Any]], float]:
+    """Reference search over the per-article dicts; both caches must belong to these vectors and idf."""
+    start_ns = time.perf_counter_ns()
+
+    with metrics.span("search.vectorize"):
+        query_vector = cached_query_vector(query, idf, query_vector_cache)
+
+    if not query_vector:
+        return 0, [], elapsed_seconds(start_ns)
+
+    cache_key = (tuple(sorted(query_vector.items())), articles_count)
+    if result_cache is not None:
+        cached = result_cache.get(cache_key)
+        if cached is not None:
+            metrics.count("search.result_cache_hits")
+            count, rows = cached
+            return count, thaw_rows(rows), elapsed_seconds(start_ns)
+
+    # sibling spans, as in the engines: search.score is the cosine of the matches, search.sort the ranking
+    with metrics.span("search.score"):
+        scores = score_articles(query_vector, articles_vectors)
+    with metrics.span("search.sort"):
+        scores = sort_scores(scores)
+
+    with metrics.span("search.describe"):
+        results = describe_articles(pages_dir, scores[:articles_count], list(query_vector), positional_index)
+
+    if result_cache is not None:
+        result_cache.put(cache_key, (len(scores), freeze_rows(results)))
+
+    return len(scores), results, elapsed_seconds(start_ns)
+
+
+def launch_searcher_cli(pages_dir: str, model_file: str, tf_idf_dir: str, articles_count: int):
+    """model.bin is memory-mapped and searched by MatrixSearchEngine; without it the tf_idf text files
+    are loaded into dicts for find_top_articles."""
+    # matrix_search imports this module
+    from vector_search.matrix_search import MatrixSearchEngine
+
+    result_cache = QueryCache(maxsize=1024)
+    query_vector_cache = QueryCache(maxsize=QUERY_VECTOR_CACHE_SIZE)
+    if is_model_file(model_file):
+        engine = MatrixSearchEngine.from_model(TfIdfModel(model_file))
+        search = lambda query: engine.find_top_articles(
+            query, pages_dir, articles_count, result_cache, query_vector_cache=query_vector_cache
+        )
+    else:
+        articles_tf_idf_vectors, idf = preload_tf_idf_vectors(tf_idf_dir)
+        search = lambda query: find_top_articles(
+            query=query,
             articles_vectors=articles_tf_idf_vectors,
             idf=idf,
             pages_dir=pages_dir,
             articles_count=articles_count,
+            result_cache=result_cache,
+            query_vector_cache=query_vector_cache,
         )
 
+    while True:
+        query_str = input("Введите запрос > ").strip()
+
+        count, results, elapsed_time = search(query_str)
+
         if not results:
             print("\nПо вашему запросу ничего не найдено.\n")
             continue
@@ -127,5 +227,6 @@ def launch_searcher_cli(pages_dir: str, tf_idf_dir: str, articles_count: int):
 
 
 if __name__ == '__main__':
+    # run from the repository root as a module: the vector_search package is shadowed by this script otherwise
     top_articles_count = 10
-    launch_searcher_cli("../scrapper/saved_pages", "../tf_idf/lemmas", top_articles_count)
+    launch_searcher_cli("scrapper/saved_pages", "tf_idf/model.bin", "tf_idf/lemmas", top_articles_count)